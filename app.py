@@ -1,15 +1,76 @@
-from flask import Flask, render_template, request, send_file
-from excel_utils import leer_items_y_descripciones_excel
-from pdf_utils import generar_pdf
-from match_utils import aplicar_match_a_filas
+from flask import Flask, Request, render_template, request, send_file
+from excel_utils import (
+    GrupoLote,
+    estimar_items_por_lote,
+    filas_desde_registros,
+    iterar_lotes_excel,
+    separador_csv,
+    texto_csv,
+)
+from match_utils import iterar_match_a_filas
+from cache_utils import CacheLRU, clave_resultado, hash_archivo, hash_bytes
+from planificador import Planificador, Saturado, costo_estimado
+from pool_render import PoolRender, generar_pdf_desglose, generar_pdf_y_xlsx_desglose, generar_preview_desglose
+from upload_utils import (
+    MAX_EXCEL_BYTES,
+    MAX_LOGO_BYTES,
+    UMBRAL_MEMORIA_BYTES,
+    AlmacenUploads,
+    ReceptorUpload,
+    UploadDemasiadoGrande,
+    recibir_upload,
+)
 from pathlib import Path
-import time
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+
+
+
+class RequestUploads(Request):
+    """
+    Request cuyos archivos multipart se reciben en ReceptorUpload mientras llegan
+    (hash + memoria o temporal en uploads/excel/), en vez del buffer/temporal de
+    werkzeug que después recibir_upload volvía a copiar. Al cerrar el request se
+    borran los que ninguna vista tomó.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        receptor = ReceptorUpload(
+            ALMACEN_UPLOADS.dir_excel, filename,
+            umbral_memoria=UMBRAL_MEMORIA_BYTES,
+            max_bytes=max(MAX_EXCEL_BYTES, MAX_LOGO_BYTES),
+            almacen=ALMACEN_UPLOADS,
+        )
+        self.__dict__.setdefault("_receptores", []).append(receptor)
+        return receptor
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            # También los que quedaron fuera de request.files (error a mitad del parseo).
+            for receptor in self.__dict__.pop("_receptores", ()):
+                receptor.close()
+
 
 app = Flask(__name__)
+app.request_class = RequestUploads
+
+# Límite global del request (Excel + logo + margen para el resto del form).
+# Flask corta con 413 antes de leer el cuerpo si se supera.
+app.config["MAX_CONTENT_LENGTH"] = MAX_EXCEL_BYTES + MAX_LOGO_BYTES + 1024 * 1024
 
 UPLOADS = Path("uploads")
 UPLOADS.mkdir(exist_ok=True)
 
+# Ciclo de vida de uploads/: TTL por archivo, cuota total (LRU) y barrido en segundo plano.
+# Los Excel van a uploads/excel/ y los logos a uploads/logos/<hash>.<ext> (deduplicados).
+ALMACEN_UPLOADS = AlmacenUploads(UPLOADS)
+
 # Archivo de coincidencias (match.xlsx)
 # Ubicarlo en la misma carpeta que app.py (pdf_generator/match.xlsx)
 MATCH_XLSX = Path(__file__).resolve().parent / "match.xlsx"
@@ -17,79 +78,547 @@ MATCH_XLSX = Path(__file__).resolve().parent / "match.xlsx"
 # Logo por defecto (se usa si el usuario no sube uno)
 DEFAULT_LOGO = Path(__file__).resolve().parent / "logo_default.png"
 
+# Template del desglose: misma ruta que pdf_utils.TEMPLATE. Se define acá para
+# calcular la clave del cache sin importar pdf_utils (y con él PyMuPDF): un hit
+# del cache no necesita cargar fitz.
+TEMPLATE = Path("template_desglose.pdf")
+
+# Cache de resultados (PDF ya generados), direccionado por contenido.
+# Si el usuario reenvía el mismo Excel + fecha + logo, servimos el PDF guardado
+# sin volver a leer el Excel ni renderizar.
+CACHE_RESULTADOS = CacheLRU(Path(__file__).resolve().parent / "cache" / "resultados")
+
+# Cache de vistas previas (PNG), misma idea que el de resultados.
+CACHE_PREVIEWS = CacheLRU(
+    Path(__file__).resolve().parent / "cache" / "previews", max_bytes=64 * 1024 * 1024, extension=".png"
+)
+
+# Renders en procesos aparte (pool_render.py; DESGLOSE_PROCESOS_RENDER, 0 = en el
+# hilo del request). Los procesos se crean con el primer render, no al importar.
+POOL_RENDER = PoolRender(match_path=MATCH_XLSX, logo_path=DEFAULT_LOGO)
+
+# Orden de los renders (planificador.py): primero los más cortos, con envejecimiento,
+# y 429 + Retry-After si la cola estimada es demasiado larga.
+PLANIFICADOR = Planificador(
+    capacidad=int(os.environ.get("DESGLOSE_RENDERS_SIMULTANEOS", str(POOL_RENDER.procesos or 1)))
+)
+
+
+def _respuesta_saturado(e):
+    """429 con Retry-After para un trabajo que el planificador no admitió."""
+    return (
+        f"Hay demasiados desgloses en cola. Reintentar en {e.reintentar_en} s.",
+        429,
+        {"Retry-After": str(e.reintentar_en)},
+    )
+
+def _generar_pdf_en_cache(clave, entrada, fecha, ruta_logo):
+    """
+    Genera el PDF de *entrada* (fuente del Excel, o lista de GrupoLote ya leídos)
+    en UN documento y lo guarda en el cache de resultados bajo *clave*.
+    Lectura, match y render corren en el pool (pool_render.generar_pdf_desglose).
+    Devuelve el PDF ya abierto (para send_file): abierto antes de entrar al cache,
+    así la expulsión LRU no lo puede borrar antes de enviarlo.
+    """
+    # Salida única por request (output.pdf fijo se pisaba entre requests concurrentes).
+    salida = CACHE_RESULTADOS.ruta_temporal()
+    try:
+        pdf = POOL_RENDER.ejecutar(generar_pdf_desglose, entrada, fecha, ruta_logo, salida, MATCH_XLSX)
+    except Exception:
+        salida.unlink(missing_ok=True)
+        raise
+
+    abierto = open(pdf, "rb")
+    CACHE_RESULTADOS.put(clave, pdf, mover=True)
+    return abierto
+
+
+def _generar_zip_pdf_y_xlsx(entrada, fecha, ruta_logo):
+    """
+    PDF y planilla del desglose de *entrada* en una sola pasada (en el pool:
+    pool_render.generar_pdf_y_xlsx_desglose), empaquetados en un .zip (bytes).
+    No pasa por el cache de resultados.
+    """
+    salida_pdf = CACHE_RESULTADOS.ruta_temporal()
+    salida_xlsx = CACHE_RESULTADOS.ruta_temporal()
+    try:
+        POOL_RENDER.ejecutar(
+            generar_pdf_y_xlsx_desglose, entrada, fecha, ruta_logo, salida_pdf, salida_xlsx, MATCH_XLSX,
+        )
+        buf = io.BytesIO()
+        # PDF y xlsx ya vienen comprimidos: se guardan tal cual.
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as z:
+            z.write(salida_pdf, "output.pdf")
+            z.write(salida_xlsx, "desglose.xlsx")
+        return buf.getvalue()
+    finally:
+        salida_pdf.unlink(missing_ok=True)
+        salida_xlsx.unlink(missing_ok=True)
+
+
+def _recibir_excel_y_logo():
+    """
+    Recibe el Excel (obligatorio) y el logo (opcional) del form.
+
+    Devuelve (excel, logo, error): en caso de error, *error* es la respuesta
+    (mensaje, status) y los uploads ya recibidos se descartaron.
+    """
+    # =============================
+    # EXCEL SUBIDO
+    # =============================
+    archivo = request.files.get("excel")
+    if not archivo:
+        return None, None, ("No se subió ningún archivo Excel", 400)
+
+    nombre_excel = (archivo.filename or "").lower()
+    # El formato real se detecta por la cabecera del archivo (excel_utils.detectar_formato);
+    # la extensión es solo una validación rápida.
+    if not nombre_excel.endswith((".xlsx", ".xlsm", ".xls", ".csv")):
+        return None, None, ("El archivo debe ser un Excel (.xlsx/.xlsm/.xls) o CSV (.csv)", 400)
+
+    # Ya se recibió mientras llegaba (RequestUploads -> ReceptorUpload), con hash
+    # en la misma pasada. Si es chico quedó en memoria (no se escribe a disco); si
+    # no, en un temporal con nombre único dentro de uploads/excel/, retenido (el
+    # barrido no lo borra) hasta excel.descartar(). Acá se aplica el límite del Excel.
+    try:
+        excel = ALMACEN_UPLOADS.retener_upload(recibir_upload(
+            archivo, ALMACEN_UPLOADS.dir_excel, MAX_EXCEL_BYTES,
+            umbral_memoria=UMBRAL_MEMORIA_BYTES, prefijo="excel_",
+        ))
+    except UploadDemasiadoGrande as e:
+        return None, None, (f"El archivo Excel es demasiado grande: {e}", 413)
+
+    # =============================
+    # LOGO (OPCIONAL)
+    # =============================
+    # Si el usuario sube un logo, lo usamos en vez del logo_default.png
+    logo_file = request.files.get("logo")
+    logo = None
+    if logo_file and getattr(logo_file, "filename", ""):
+        nombre = (logo_file.filename or "").lower()
+        # validación simple por extensión
+        if nombre.endswith((".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff", ".gif")):
+            # guardar_logo lo deja en uploads/logos/<hash> (pdf_utils inserta el logo desde archivo).
+            try:
+                logo = recibir_upload(logo_file, ALMACEN_UPLOADS.dir_logos, MAX_LOGO_BYTES, prefijo=".logo_")
+            except UploadDemasiadoGrande as e:
+                excel.descartar()
+                return None, None, (f"El logo es demasiado grande: {e}", 413)
+        else:
+            excel.descartar()
+            return None, None, ("El logo debe ser una imagen (png/jpg/jpeg/webp/bmp/tif/tiff)", 400)
+
+    return excel, logo, None
+
+
+@app.before_request
+def _arrancar_barrido():
+    """
+    Todo POST puede dejar archivos en uploads/ (el multipart se recibe ahí,
+    RequestUploads): el barrido de ESTE proceso arranca con el primero, sea cual
+    sea la ruta. Idempotente.
+    """
+    if request.method == "POST":
+        ALMACEN_UPLOADS.asegurar_barrido()
+
+
+@app.route("/salud")
+def salud():
+    """Chequeo liviano para el balanceador / gunicorn: no toca Excel ni PDF."""
+    return {"estado": "ok", "pid": os.getpid(), "renders": PLANIFICADOR.estado()}
+
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
-
         # =============================
         # FECHA INGRESADA EN EL FORM
         # =============================
         fecha = request.form.get("fecha", "").strip()
 
-        # =============================
-        # EXCEL SUBIDO
-        # =============================
-        archivo = request.files.get("excel")
-        if not archivo:
-            return "No se subió ningún archivo Excel", 400
-
-        nombre_excel = (archivo.filename or "").lower()
-        if not nombre_excel.endswith((".xlsx", ".xlsm", ".xls")):
-            return "El archivo debe ser un Excel (.xlsx/.xlsm/.xls)", 400
-
-        ruta_excel = UPLOADS / archivo.filename
-        archivo.save(ruta_excel)
+        excel, logo, error = _recibir_excel_y_logo()
+        if error is not None:
+            return error
 
         # =============================
-        # LOGO (OPCIONAL)
+        # CACHE DE RESULTADOS
         # =============================
-        # Si el usuario sube un logo, lo usamos en vez del logo_default.png
-        logo_file = request.files.get("logo")
-        ruta_logo = None
-        if logo_file and getattr(logo_file, "filename", ""):
-            nombre = (logo_file.filename or "").lower()
-            # validación simple por extensión
-            if nombre.endswith((".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff", ".gif")):
-                # guardamos con timestamp para evitar colisiones
-                ts = int(time.time())
-                ext = Path(nombre).suffix
-                ruta_logo = UPLOADS / f"logo_{ts}{ext}"
-                logo_file.save(ruta_logo)
-            else:
-                return "El logo debe ser una imagen (png/jpg/jpeg/webp/bmp/tif/tiff)", 400
+        # Clave = hash(excel, fecha, logo, match.xlsx, template, código).
+        # En un hit no se parsea ni se renderiza nada.
+        clave = clave_resultado(
+            excel.hash,
+            fecha,
+            logo.hash if logo is not None else hash_archivo(DEFAULT_LOGO),
+            MATCH_XLSX,
+            TEMPLATE,
+        )
+        cacheado = CACHE_RESULTADOS.get(clave)
+        if cacheado is not None:
+            excel.descartar()
+            if logo is not None:
+                logo.descartar()
+            return send_file(cacheado, as_attachment=True, download_name="output.pdf")
 
         # =============================
-        # LEER EXCEL (título + filas)
+        # COSTO ESTIMADO (para el planificador)
         # =============================
-        titulo_llamado, texto_lote, filas = leer_items_y_descripciones_excel(ruta_excel)
+        # Cota de ítems por lote con solo los encabezados de cada hoja (debajo, las
+        # celdas con valor de la columna Ítem): la lectura completa es la del render.
+        try:
+            costo = costo_estimado(estimar_items_por_lote(excel.fuente()))
+        except ValueError as e:
+            excel.descartar()
+            if logo is not None:
+                logo.descartar()
+            return str(e), 400
 
-        # =============================
-        # MATCH (Herramientas/Materiales) - SOLO textos
-        # =============================
-        # Agrega a cada fila:
-        #   - texto_equipos
-        #   - texto_mano_obra
-        #   - texto_materiales
-        #   - texto_transporte
-        # (No altera la parte numérica del PDF)
-        filas = aplicar_match_a_filas(filas, MATCH_XLSX)
+        # Logo deduplicado por contenido: logos/<hash><ext> (se guarda una sola vez),
+        # retenido hasta el final del render.
+        ruta_logo = ALMACEN_UPLOADS.guardar_logo(logo, retener=True) if logo is not None else DEFAULT_LOGO
 
         # =============================
-        # GENERACIÓN DEL PDF (NO ROMPER LO EXISTENTE)
+        # LEER EXCEL + MATCH + PDF (NO ROMPER LO EXISTENTE)
         # =============================
+        # pool_render.generar_pdf_desglose, en un proceso del pool:
+        # - Se recorren TODAS las hojas: cada hoja con encabezados es un lote con su
+        #   propio título/lote. Un libro de una sola hoja da un único grupo (como antes).
+        # - Streaming: las filas son generadores, el Excel se lee a medida que se renderiza.
+        # - Match (Herramientas/Materiales): solo textos (texto_equipos, texto_mano_obra,
+        #   texto_materiales, texto_transporte); no altera la parte numérica del PDF.
         # Si no se sube logo, usamos el default.
-        pdf = generar_pdf(
-            filas,
-            fecha,
-            titulo_llamado=titulo_llamado,
-            texto_lote=texto_lote,
-            logo_path=(ruta_logo if ruta_logo else DEFAULT_LOGO),
-        )
+        try:
+            with PLANIFICADOR.turno(costo):
+                cacheado = _generar_pdf_en_cache(clave, excel.fuente(), fecha, ruta_logo)
+        except Saturado as e:
+            return _respuesta_saturado(e)
+        except ValueError as e:
+            # Sin encabezados reconocibles (se detecta al leer, ya en el render).
+            return str(e), 400
+        finally:
+            # El Excel ya se consumió: no hace falta conservarlo.
+            excel.descartar()
+            ALMACEN_UPLOADS.soltar(ruta_logo)
 
-        return send_file(pdf, as_attachment=True)
+        return send_file(cacheado, as_attachment=True, download_name="output.pdf")
 
     return render_template("index.html")
 
 
+@app.route("/preview", methods=["POST"])
+def preview():
+    """
+    Vista previa: PNG (baja resolución) de las primeras hojas del primer lote.
+
+    Mismo form que "/" (excel, fecha, logo) más, opcionales:
+      - items: cuántos ítems mostrar (default PREVIEW_ITEMS = la primera hoja,
+               máximo PREVIEW_ITEMS_MAX)
+      - dpi:   resolución (default PREVIEW_DPI, máximo PREVIEW_DPI_MAX)
+    Valores no numéricos o negativos -> 400; los que pasan el máximo se recortan.
+
+    No arma el documento completo: solo lee del Excel los ítems que se muestran.
+    El PNG se guarda en cache por hash del upload (+ fecha, logo, items, dpi, y las
+    mismas versiones de match/template/código que el PDF): refrescar la vista
+    previa del mismo archivo no vuelve a renderizar.
+    """
+    fecha = request.form.get("fecha", "").strip()
+    items_txt = request.values.get("items", "").strip()
+    dpi_txt = request.values.get("dpi", "").strip()
+    # isascii: "²" o "٣" pasan isdigit pero no son enteros para int().
+    if not all(v.isascii() and v.isdigit() for v in (items_txt, dpi_txt) if v):
+        return "items y dpi deben ser números enteros", 400
+
+    excel, logo, error = _recibir_excel_y_logo()
+    if error is not None:
+        return error
+
+    clave = hash_bytes(
+        "\n".join([
+            clave_resultado(
+                excel.hash,
+                fecha,
+                logo.hash if logo is not None else hash_archivo(DEFAULT_LOGO),
+                MATCH_XLSX,
+                TEMPLATE,
+            ),
+            f"items={items_txt}",
+            f"dpi={dpi_txt}",
+        ]).encode("utf-8")
+    )
+    cacheado = CACHE_PREVIEWS.get(clave)
+    if cacheado is not None:
+        excel.descartar()
+        if logo is not None:
+            logo.descartar()
+        return send_file(cacheado, mimetype="image/png")
+
+    # Import diferido: un hit no carga PyMuPDF (el render corre en el pool).
+    from pdf_utils import PREVIEW_DPI, PREVIEW_DPI_MAX, PREVIEW_ITEMS, PREVIEW_ITEMS_MAX
+
+    n_items = min(int(items_txt), PREVIEW_ITEMS_MAX) if items_txt else PREVIEW_ITEMS
+    dpi = min(int(dpi_txt), PREVIEW_DPI_MAX) if dpi_txt else PREVIEW_DPI
+    ruta_logo = ALMACEN_UPLOADS.guardar_logo(logo, retener=True) if logo is not None else DEFAULT_LOGO
+
+    try:
+        with PLANIFICADOR.turno(costo_estimado([n_items])):
+            png = POOL_RENDER.ejecutar(
+                generar_preview_desglose, excel.fuente(), fecha, ruta_logo, MATCH_XLSX, n_items, dpi,
+            )
+    except Saturado as e:
+        return _respuesta_saturado(e)
+    except ValueError as e:
+        return str(e), 400
+    finally:
+        excel.descartar()
+        ALMACEN_UPLOADS.soltar(ruta_logo)
+
+    CACHE_PREVIEWS.put_bytes(clave, png)
+    return send_file(io.BytesIO(png), mimetype="image/png")
+
+
+# Campos numéricos de un registro de la API.
+CAMPOS_NUMERICOS_API = ("cantidad", "precio_unitario_iva_incl", "precio_total_iva_incl")
+
+# Número en el formato del Excel (Gs.): "1500", "1.234.567", "2,5", "1.234,5".
+_NUMERO_GS = re.compile(r"-?(\d+|\d{1,3}(\.\d{3})+)(,\d+)?")
+
+
+def _numero_json(valor, campo):
+    """
+    Valor numérico de un registro JSON: un número JSON se toma tal cual. Un texto
+    solo se acepta si no es ambiguo en el formato del Excel (Gs.), donde "." separa
+    miles: "1500", "1.234.567", "2,5". "2.5" o "1.234" (¿decimal o miles?) -> ValueError.
+    """
+    if valor is None or isinstance(valor, float) or (isinstance(valor, int) and not isinstance(valor, bool)):
+        return valor
+    if not isinstance(valor, str):
+        raise ValueError(f"{campo}: se esperaba un número, no {json.dumps(valor)}")
+    txt = valor.strip()
+    if txt == "":
+        return None
+    if txt.count(".") == 1 and "," not in txt:
+        raise ValueError(f'{campo}: "{valor}" es ambiguo ("." es separador de miles); enviarlo como número JSON')
+    if not _NUMERO_GS.fullmatch(txt.replace(" ", "")):
+        raise ValueError(f'{campo}: "{valor}" no es un número')
+    return txt   # filas_desde_registros lo convierte (excel_utils._to_number)
+
+
+def _numeros_json(registro):
+    """*registro* con cantidad y precios validados (_numero_json). ValueError si alguno no sirve."""
+    return {
+        k: _numero_json(v, k) if k in CAMPOS_NUMERICOS_API else v
+        for k, v in registro.items()
+    }
+
+
+def _leer_registros_api():
+    """
+    Lee (titulo, lote, fecha, registros, cuerpo_bytes) del request de la API.
+
+    Formatos aceptados:
+      - JSON (Content-Type: application/json):
+          {"titulo": "...", "lote": "...", "fecha": "dd/mm/yyyy",
+           "items": [{"item": 1, "descripcion": "...", "unidad_medida": "...",
+                      "presentacion": "...", "cantidad": 2,
+                      "precio_unitario_iva_incl": 1000, "precio_total_iva_incl": 2000}, ...]}
+          cantidad y precios van como números JSON (ver _numero_json).
+      - CSV (Content-Type: text/csv, o multipart con el archivo en el campo "items"):
+          encabezado con los mismos nombres de campo; separador "," o ";" (el de
+          la fila de encabezados, igual que al subir un .csv: excel_utils.separador_csv).
+          Los números siguen el formato del Excel (Gs.): "." es separador de miles
+          y "," el decimal ("1.234.567", "2,5").
+          titulo / lote / fecha van como parámetros (query string o campos del form).
+
+    Lanza ValueError si el cuerpo no se puede interpretar.
+    """
+    if request.is_json:
+        cuerpo = request.get_data()
+        try:
+            datos = json.loads(cuerpo.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"JSON inválido: {e}")
+        if not isinstance(datos, dict) or not isinstance(datos.get("items"), list):
+            raise ValueError('El JSON debe ser un objeto con una lista "items"')
+        registros = [_numeros_json(r) for r in datos["items"] if isinstance(r, dict)]
+        return (
+            str(datos.get("titulo", "") or "").strip(),
+            str(datos.get("lote", "") or "").strip(),
+            str(datos.get("fecha", "") or "").strip(),
+            registros,
+            cuerpo,
+        )
+
+    archivo_csv = request.files.get("items")
+    if archivo_csv is not None:
+        cuerpo = archivo_csv.read()
+    elif (request.mimetype or "") in ("text/csv", "text/plain"):
+        cuerpo = request.get_data()
+    else:
+        raise ValueError("Formato no soportado: enviar JSON (application/json) o CSV (text/csv)")
+
+    texto = texto_csv(cuerpo)
+    lector = csv.DictReader(io.StringIO(texto, newline=""), delimiter=separador_csv(texto))
+    registros = [{(k or "").strip(): v for k, v in r.items()} for r in lector]
+
+    parametros = request.values
+    titulo = parametros.get("titulo", "").strip()
+    lote = parametros.get("lote", "").strip()
+    fecha = parametros.get("fecha", "").strip()
+    # Los parámetros también forman parte de la clave del cache.
+    cuerpo = cuerpo + f"\n{titulo}\n{lote}".encode("utf-8")
+    return titulo, lote, fecha, registros, cuerpo
+
+
+@app.route("/api/desglose", methods=["POST"])
+def api_desglose():
+    """
+    API para sistemas (ERP) que ya tienen los ítems como datos estructurados.
+
+    Recibe JSON o CSV (ver _leer_registros_api) y devuelve el PDF, sin pasar por
+    un .xlsx ni por openpyxl: los registros van directo a match + generar_pdf.
+    Usa el logo por defecto y el mismo cache de resultados que el formulario.
+
+    ?formato=zip: .zip con el PDF (output.pdf) y la planilla del desglose
+    (desglose.xlsx, exportar.py) generados en la misma pasada, sin cache.
+    """
+    formato = request.args.get("formato", "pdf").strip().lower()
+    if formato not in ("pdf", "zip"):
+        return "formato debe ser pdf o zip", 400
+
+    try:
+        titulo_llamado, texto_lote, fecha, registros, cuerpo = _leer_registros_api()
+    except ValueError as e:
+        return str(e), 400
+
+    filas = list(filas_desde_registros(registros))
+    if not filas:
+        return "No se recibió ningún ítem válido (item numérico + descripción)", 400
+
+    if formato == "zip":
+        grupo = GrupoLote("api", titulo_llamado, texto_lote, filas)
+        try:
+            with PLANIFICADOR.turno(costo_estimado([len(filas)])):
+                paquete = _generar_zip_pdf_y_xlsx([grupo], fecha, DEFAULT_LOGO)
+        except Saturado as e:
+            return _respuesta_saturado(e)
+        return send_file(
+            io.BytesIO(paquete), mimetype="application/zip", as_attachment=True, download_name="desglose.zip",
+        )
+
+    clave = clave_resultado(hash_bytes(cuerpo), fecha, hash_archivo(DEFAULT_LOGO), MATCH_XLSX, TEMPLATE)
+    cacheado = CACHE_RESULTADOS.get(clave)
+    if cacheado is None:
+        grupo = GrupoLote("api", titulo_llamado, texto_lote, filas)
+        try:
+            with PLANIFICADOR.turno(costo_estimado([len(filas)])):
+                cacheado = _generar_pdf_en_cache(clave, [grupo], fecha, DEFAULT_LOGO)
+        except Saturado as e:
+            return _respuesta_saturado(e)
+
+    return send_file(cacheado, as_attachment=True, download_name="output.pdf")
+
+
+def _lotes_calculo():
+    """
+    Generador de (hoja, titulo, lote, filas con match) de la entrada de /api/calculo:
+    un Excel en el campo "excel" (multipart, como el form) o JSON/CSV como /api/desglose.
+
+    Las filas son generadores (el Excel se lee a medida que se consumen); el upload
+    se descarta al terminar. Lanza ValueError si la entrada no se puede interpretar.
+    """
+    if "excel" in request.files:
+        excel, logo, error = _recibir_excel_y_logo()
+        if error is not None:
+            raise ValueError(error[0])
+        if logo is not None:
+            logo.descartar()
+        try:
+            for g in iterar_lotes_excel(excel.fuente()):
+                yield g.hoja, g.titulo_llamado, g.texto_lote, iterar_match_a_filas(g.filas, MATCH_XLSX)
+        finally:
+            excel.descartar()
+        return
+
+    titulo_llamado, texto_lote, _, registros, _ = _leer_registros_api()
+    yield "api", titulo_llamado, texto_lote, iterar_match_a_filas(filas_desde_registros(registros), MATCH_XLSX)
+
+
+@app.route("/api/calculo", methods=["POST"])
+def api_calculo():
+    """
+    Solo los números del desglose (resumen, partes A/B/D/E/F y detalles), sin PDF.
+
+    Misma entrada que /api/desglose (JSON o CSV), o un Excel en el campo "excel"
+    (el form lo usa para "Descargar Excel").
+    No importa pdf_utils ni PyMuPDF: usa calculo.py, el mismo cálculo que dibuja el PDF.
+
+    Salida (?formato=json por defecto):
+      - json: {"lotes": [{"hoja", "titulo", "lote", "items": [CalculoItem.a_dict(), ...]}]}
+      - csv:  una fila por ítem con las columnas de calculo.COLUMNAS_CSV (separador ",").
+      - xlsx: una hoja por lote (exportar.py), escrita fila por fila (write-only).
+    """
+    from calculo import COLUMNAS_CSV, calcular_filas
+
+    formato = request.values.get("formato", "json").strip().lower()
+    if formato not in ("json", "csv", "xlsx"):
+        return "formato debe ser json, csv o xlsx", 400
+
+    try:
+        if formato == "xlsx":
+            from exportar import EscritorXlsx
+
+            escritor = EscritorXlsx()
+            for hoja, titulo_llamado, texto_lote, filas in _lotes_calculo():
+                for _ in escritor.registrar(hoja, titulo_llamado, texto_lote, calcular_filas(filas)):
+                    pass
+            cantidad = escritor.items
+            if cantidad:
+                cuerpo = escritor.guardar()
+        elif formato == "csv":
+            salida = io.StringIO()
+            w = csv.writer(salida)
+            w.writerow(COLUMNAS_CSV)
+            cantidad = 0
+            for hoja, _, texto_lote, filas in _lotes_calculo():
+                for c in calcular_filas(filas):
+                    w.writerow([hoja, texto_lote] + c.a_fila_csv())
+                    cantidad += 1
+        else:
+            lotes = [
+                {
+                    "hoja": hoja,
+                    "titulo": titulo_llamado,
+                    "lote": texto_lote,
+                    "items": [c.a_dict() for c in calcular_filas(filas)],
+                }
+                for hoja, titulo_llamado, texto_lote, filas in _lotes_calculo()
+            ]
+            cantidad = sum(len(lote["items"]) for lote in lotes)
+    except ValueError as e:
+        return str(e), 400
+
+    if not cantidad:
+        return "No se recibió ningún ítem válido (item numérico + descripción)", 400
+
+    if formato == "xlsx":
+        return send_file(
+            io.BytesIO(cuerpo),
+            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            as_attachment=True,
+            download_name="desglose.xlsx",
+        )
+    if formato == "csv":
+        return app.response_class(salida.getvalue(), mimetype="text/csv")
+    # json.dumps directo: conserva el orden de las claves (CDT, GG, ... como en el PDF).
+    return app.response_class(json.dumps({"lotes": lotes}, ensure_ascii=False), mimetype="application/json")
+
+
+# Precarga opcional (DESGLOSE_PRECARGA=1): template, tabla match, logo por defecto y
+# métricas de fuente quedan en memoria al importar la app. Con gunicorn --preload
+# esto ocurre UNA vez en el proceso maestro y los workers lo heredan al hacer fork.
+if os.environ.get("DESGLOSE_PRECARGA", "") not in ("", "0"):
+    from arranque import precargar
+    precargar(MATCH_XLSX, DEFAULT_LOGO)
+
+
 if __name__ == "__main__":
     app.run(debug=True)
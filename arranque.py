@@ -0,0 +1,104 @@
+"""
+arranque.py
+
+Arranque rápido del servidor y precarga de recursos compartidos.
+
+Medido en este proyecto (python -X importtime -c "import app"):
+  - flask     ~170 ms
+  - fitz      ~105 ms  (PyMuPDF)
+  - openpyxl  ~100 ms
+Antes app.py importaba los tres al inicio; ahora fitz y openpyxl se cargan
+recién cuando hacen falta (primer PDF / primer .xlsx). Un hit del cache de
+resultados no los necesita nunca.
+
+Precarga (precargar):
+- Importa los módulos pesados y deja en memoria lo que todo request usa:
+    * bytes del template (pdf_utils._template_bytes)
+    * tabla de coincidencias ya parseada (match_utils.cargar_match_table)
+    * logo por defecto decodificado (pdf_utils._cargar_logo)
+    * métricas de la fuente helv (pdf_utils.precargar_metricas)
+- Pensado para llamarse en el proceso maestro de gunicorn ANTES del fork
+  (preload_app): los workers heredan todo por copy-on-write y el primer
+  request de cada uno ya no paga la carga.
+- app.py la llama al importarse si DESGLOSE_PRECARGA=1.
+
+Uso por consola (para comparar tiempos entre versiones):
+    python arranque.py
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+log = logging.getLogger("desglose.arranque")
+
+# Módulos de terceros que más tardan en importarse.
+MODULOS_PESADOS = ["fitz", "openpyxl"]
+
+
+def _ms(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def medir_imports(modulos: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """
+    Importa cada módulo y devuelve {nombre: ms}.
+
+    Solo mide de verdad si el módulo no estaba importado (si ya estaba, da ~0):
+    para medir en frío, llamar en un proceso nuevo (python arranque.py).
+    """
+    tiempos = {}
+    for nombre in (modulos or MODULOS_PESADOS):
+        t0 = time.perf_counter()
+        importlib.import_module(nombre)
+        tiempos[nombre] = _ms(t0)
+    return tiempos
+
+
+def precargar(match_path=None, logo_path=None) -> Dict[str, float]:
+    """
+    Carga una vez todo lo compartido entre requests. Devuelve {paso: ms}.
+
+    Cada paso es independiente: si un archivo falta (por ejemplo no hay
+    match.xlsx en un entorno de prueba) se registra y se sigue con el resto.
+    """
+    tiempos = medir_imports(MODULOS_PESADOS + ["pdf_utils", "excel_utils", "match_utils"])
+
+    import match_utils
+    import pdf_utils
+
+    pasos = [
+        ("template", pdf_utils._template_bytes),
+        ("metricas_fuente", pdf_utils.precargar_metricas),
+    ]
+    if match_path is not None:
+        pasos.append(("match", lambda: match_utils.cargar_match_table(Path(match_path))))
+    if logo_path is not None:
+        pasos.append(("logo_default", lambda: pdf_utils._cargar_logo(logo_path)))
+
+    for nombre, paso in pasos:
+        t0 = time.perf_counter()
+        try:
+            paso()
+        except Exception as e:
+            log.warning("precarga de %s falló: %s", nombre, e)
+            continue
+        tiempos[nombre] = _ms(t0)
+
+    log.info("precarga lista: %s", tiempos)
+    return tiempos
+
+
+if __name__ == "__main__":
+    base = Path(__file__).resolve().parent
+
+    t0 = time.perf_counter()
+    import app  # noqa: F401  (import en frío de la app, sin los módulos pesados)
+    print(f"import app: {_ms(t0)} ms")
+
+    for paso, ms in precargar(base / "match.xlsx", base / "logo_default.png").items():
+        print(f"  {paso:<16} {ms:>8.1f} ms")
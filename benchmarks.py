@@ -0,0 +1,303 @@
+"""
+benchmarks.py
+
+Mediciones de rendimiento reproducibles del generador.
+
+Usa siempre el mismo corpus (libros sintéticos de libros_sinteticos, o la
+planilla de ejemplo), así los números son comparables entre commits.
+Para verificar que la salida NO cambió, ver regresion.py.
+
+    python benchmarks.py guardado                 # tamaño y tiempo por optimización de salida
+    python benchmarks.py guardado --items 20,212
+    python benchmarks.py guardado --json guardado.json
+    python benchmarks.py texto                    # hojas/seg: texto por llamada vs. por página
+    python benchmarks.py detalles --items 100000  # ítems/seg del cálculo de detalles (sin fitz)
+    python benchmarks.py costo --guardar          # seg/hoja del pipeline de app.py (planificador.py)
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+BASE_DIR = Path(__file__).resolve().parent
+MATCH_XLSX = BASE_DIR / "match.xlsx"
+DEFAULT_LOGO = BASE_DIR / "logo_default.png"
+FECHA = "01/02/2026"
+
+
+# ==========================================================
+# Corpus
+# ==========================================================
+
+def lote_sintetico(n_items: int):
+    """(titulo, lote, filas con match) de un libro sintético de *n_items* ítems."""
+    from excel_utils import iterar_lotes_excel
+    from libros_sinteticos import generar_libro
+    from match_utils import aplicar_match_a_filas
+
+    g = next(iter(iterar_lotes_excel(io.BytesIO(generar_libro(n_items, semilla=n_items)))))
+    return g.titulo_llamado, g.texto_lote, aplicar_match_a_filas(list(g.filas), MATCH_XLSX)
+
+
+def documento_sin_guardar(n_items: int) -> bytes:
+    """Renderiza *n_items* ítems y devuelve el documento tal cual (save sin opciones)."""
+    import fitz
+    import pdf_utils
+
+    titulo, lote, filas = lote_sintetico(n_items)
+    template_doc = pdf_utils._abrir_template()
+    doc = fitz.open()
+    pdf_utils._agregar_paginas(doc, template_doc, filas, FECHA, titulo, lote, DEFAULT_LOGO)
+    datos = doc.tobytes()
+    doc.close()
+    template_doc.close()
+    return datos
+
+
+# ==========================================================
+# Benchmarks
+# ==========================================================
+
+def bench_guardado(items: Sequence[int] = (20, 212), modos: Optional[Sequence[str]] = None) -> List[Dict]:
+    """Tamaño y tiempo de guardado de cada optimización (pdf_utils.OPTIMIZACIONES) por tamaño de licitación."""
+    import fitz
+    import pdf_utils
+
+    modos = list(modos or pdf_utils.OPTIMIZACIONES)
+    resultados = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in items:
+            crudo = documento_sin_guardar(n)
+            for modo in modos:
+                doc = fitz.open("pdf", crudo)
+                salida = Path(tmp) / f"{n}_{modo}.pdf"
+                t0 = time.perf_counter()
+                aplicado = pdf_utils._guardar(doc, salida, optimizacion=modo)
+                segundos = time.perf_counter() - t0
+                paginas = doc.page_count
+                doc.close()
+                resultados.append({
+                    "items": n,
+                    "paginas": paginas,
+                    "paginas_estimadas": estimadas,
+                    "modo": modo,
+                    "aplicado": aplicado,
+                    "bytes": salida.stat().st_size,
+                    "segundos": round(segundos, 3),
+                })
+    return resultados
+
+
+def bench_texto(items: Sequence[int] = (20, 212), repeticiones: int = 1) -> List[Dict]:
+    """
+    Hojas por segundo del render (sin guardar) con cada forma de emitir el texto:
+    "por_llamada" (un stream por insert_text, como antes) y "por_pagina"
+    (pdf_utils.TEXTO_POR_PAGINA: un Shape por hoja). Se toma el mejor de
+    *repeticiones* corridas.
+    """
+    import fitz
+    import pdf_utils
+
+    original = pdf_utils.TEXTO_POR_PAGINA
+    resultados = []
+    try:
+        for n in items:
+            titulo, lote, filas = lote_sintetico(n)
+            for modo, por_pagina in (("por_llamada", False), ("por_pagina", True)):
+                pdf_utils.TEXTO_POR_PAGINA = por_pagina
+                mejor = None
+                for _ in range(repeticiones):
+                    template_doc = pdf_utils._abrir_template()
+                    doc = fitz.open()
+                    t0 = time.perf_counter()
+                    pdf_utils._agregar_paginas(doc, template_doc, filas, FECHA, titulo, lote, DEFAULT_LOGO)
+                    segundos = time.perf_counter() - t0
+                    paginas = doc.page_count
+                    doc.close()
+                    template_doc.close()
+                    mejor = segundos if mejor is None else min(mejor, segundos)
+                resultados.append({
+                    "items": n,
+                    "paginas": paginas,
+                    "paginas_estimadas": estimadas,
+                    "modo": modo,
+                    "segundos": round(mejor, 3),
+                    "paginas_por_seg": round(paginas / mejor, 2),
+                })
+    finally:
+        pdf_utils.TEXTO_POR_PAGINA = original
+    return resultados
+
+
+def entradas_detalles(n_items: int) -> List[tuple]:
+    """(partes, semilla, cantidad) de *n_items* ítems sintéticos, listos para detalles.calcular_detalles_lote."""
+    from calculo import calcular_resumen_desde_total
+    from costos_partes import calcular_partes_desde_cdt
+    from detalles import semilla_item
+    from libros_sinteticos import generar_filas
+
+    entradas = []
+    for item, _, desc, _, _, cantidad, _, total in generar_filas(n_items, semilla=n_items):
+        tipo = "mano_obra" if desc == "Mano de Obra" else "ambiguo"
+        partes = calcular_partes_desde_cdt(calcular_resumen_desde_total(total)["CDT"], tipo)
+        entradas.append((partes, semilla_item(item, desc), cantidad))
+    return entradas
+
+
+def bench_detalles(items: Sequence[int] = (1000, 100000), repeticiones: int = 3) -> List[Dict]:
+    """Ítems por segundo de detalles.calcular_detalles_lote (solo el cálculo; el corpus se arma antes)."""
+    from detalles import calcular_detalles_lote
+
+    resultados = []
+    for n in items:
+        entradas = entradas_detalles(n)
+        mejor = None
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            calcular_detalles_lote(entradas)
+            segundos = time.perf_counter() - t0
+            mejor = segundos if mejor is None else min(mejor, segundos)
+        resultados.append({
+            "items": n,
+            "segundos": round(mejor, 4),
+            "items_por_seg": round(n / mejor),
+        })
+    return resultados
+
+
+def bench_costo(items: Sequence[int] = (20, 212), repeticiones: int = 1) -> List[Dict]:
+    """
+    Segundos por hoja del pipeline de app.py (pool_render.generar_pdf_desglose:
+    lectura + match + render + guardado, en el modo que usa el servidor:
+    DESGLOSE_RENDER_INCREMENTAL), con el cache de hojas vacío.
+    Es el costo por hoja con el que planificador.py estima cada trabajo; también
+    se mide la estimación previa de ítems (excel_utils.estimar_items_por_lote).
+    """
+    import pdf_utils
+    from cache_utils import CacheLRU
+    from excel_utils import contar_items_por_lote, estimar_items_por_lote
+    from libros_sinteticos import generar_libro
+    from planificador import paginas_estimadas
+    from pool_render import generar_pdf_desglose
+
+    original = pdf_utils.CACHE_PAGINAS
+    resultados = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for n in items:
+                libro = generar_libro(n, semilla=n)
+                paginas = paginas_estimadas(contar_items_por_lote(io.BytesIO(libro)))
+                t0 = time.perf_counter()
+                estimadas = paginas_estimadas(estimar_items_por_lote(io.BytesIO(libro)))
+                conteo = time.perf_counter() - t0
+                mejor = None
+                for r in range(repeticiones):
+                    pdf_utils.CACHE_PAGINAS = CacheLRU(Path(tmp) / f"paginas_{n}_{r}")
+                    t0 = time.perf_counter()
+                    generar_pdf_desglose(io.BytesIO(libro), FECHA, DEFAULT_LOGO, Path(tmp) / f"{n}.pdf", MATCH_XLSX)
+                    segundos = time.perf_counter() - t0
+                    mejor = segundos if mejor is None else min(mejor, segundos)
+                resultados.append({
+                    "items": n,
+                    "paginas": paginas,
+                    "paginas_estimadas": estimadas,
+                    "segundos": round(mejor, 3),
+                    "segundos_por_pagina": round(mejor / paginas, 4),
+                    "conteo_seg": round(conteo, 3),
+                })
+    finally:
+        pdf_utils.CACHE_PAGINAS = original
+    return resultados
+
+
+def _imprimir_costo(resultados: List[Dict]):
+    print(f"{'ítems':>6} {'hojas':>6} {'tiempo':>9} {'seg/hoja':>9} {'estimadas':>10} {'estimación':>11}")
+    for r in resultados:
+        print(f"{r['items']:>6} {r['paginas']:>6} {r['segundos']:>8.2f}s {r['segundos_por_pagina']:>9.4f} "
+              f"{r['paginas_estimadas']:>10} {r['conteo_seg']:>10.3f}s")
+
+
+def _imprimir_detalles(resultados: List[Dict]):
+    print(f"{'ítems':>8} {'tiempo':>10} {'ítems/s':>10}")
+    for r in resultados:
+        print(f"{r['items']:>8} {r['segundos']:>9.4f}s {r['items_por_seg']:>10}")
+
+
+def _imprimir_texto(resultados: List[Dict]):
+    print(f"{'ítems':>6} {'hojas':>6}  {'modo':<12} {'tiempo':>9} {'hojas/s':>9}")
+    for r in resultados:
+        print(f"{r['items']:>6} {r['paginas']:>6}  {r['modo']:<12} {r['segundos']:>8.2f}s {r['paginas_por_seg']:>9.2f}")
+
+
+def _imprimir_guardado(resultados: List[Dict]):
+    print(f"{'ítems':>6} {'hojas':>6}  {'modo':<10} {'aplicado':<10} {'tamaño':>10} {'tiempo':>9}")
+    for r in resultados:
+        print(f"{r['items']:>6} {r['paginas']:>6}  {r['modo']:<10} {r['aplicado']:<10} "
+              f"{r['bytes'] / 1024:>8.0f} KB {r['segundos']:>8.2f}s")
+
+
+def _lista_enteros(texto: str) -> List[int]:
+    return [int(x) for x in texto.split(",") if x.strip()]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks del generador (ver docstring del módulo).")
+    sub = ap.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("guardado", help="tamaño/tiempo por optimización de salida")
+    p.add_argument("--items", type=_lista_enteros, default=[20, 212])
+    p.add_argument("--modos", type=lambda s: s.split(","), default=None)
+    p.add_argument("--json", type=Path, help="guardar los resultados en este JSON")
+
+    p = sub.add_parser("texto", help="hojas/seg con texto por llamada vs. por página")
+    p.add_argument("--items", type=_lista_enteros, default=[20, 212])
+    p.add_argument("--repeticiones", type=int, default=1)
+    p.add_argument("--json", type=Path, help="guardar los resultados en este JSON")
+
+    p = sub.add_parser("detalles", help="ítems/seg del cálculo de detalles A/F/B/E")
+    p.add_argument("--items", type=_lista_enteros, default=[1000, 100000])
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.add_argument("--json", type=Path, help="guardar los resultados en este JSON")
+
+    p = sub.add_parser("costo", help="seg/hoja del pipeline de app.py (para planificador.py)")
+    p.add_argument("--items", type=_lista_enteros, default=[20, 212])
+    p.add_argument("--repeticiones", type=int, default=1)
+    p.add_argument("--guardar", action="store_true",
+                   help="escribir el seg/hoja del libro más grande en planificador.ARCHIVO_COSTO")
+    p.add_argument("--json", type=Path, help="guardar los resultados en este JSON")
+
+    args = ap.parse_args(argv)
+
+    if args.comando == "guardado":
+        resultados = bench_guardado(args.items, args.modos)
+        _imprimir_guardado(resultados)
+    elif args.comando == "texto":
+        resultados = bench_texto(args.items, args.repeticiones)
+        _imprimir_texto(resultados)
+    elif args.comando == "detalles":
+        resultados = bench_detalles(args.items, args.repeticiones)
+        _imprimir_detalles(resultados)
+    elif args.comando == "costo":
+        resultados = bench_costo(args.items, args.repeticiones)
+        _imprimir_costo(resultados)
+        if args.guardar:
+            from planificador import ARCHIVO_COSTO
+
+            mayor = max(resultados, key=lambda r: r["paginas"])
+            ARCHIVO_COSTO.write_text(json.dumps(mayor, indent=2, ensure_ascii=False), encoding="utf-8")
+            print(f"{ARCHIVO_COSTO.name}: {mayor['segundos_por_pagina']} seg/hoja")
+
+    if args.json is not None:
+        args.json.write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
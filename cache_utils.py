@@ -0,0 +1,225 @@
+"""
+cache_utils.py
+
+Cache de resultados en disco (direccionado por contenido).
+
+Se encarga de:
+- Calcular una clave estable a partir de TODO lo que influye en el PDF:
+    * bytes del Excel subido
+    * fecha ingresada en el form
+    * bytes del logo (o del logo por defecto)
+    * versión de la tabla de coincidencias (match.xlsx)
+    * versión del template (template_desglose.pdf)
+    * versión del código (fuentes de los módulos que generan el PDF)
+- Guardar/servir el PDF generado desde un directorio local con tamaño máximo.
+  Cuando se supera el tamaño, se eliminan los archivos menos usados (LRU).
+
+IMPORTANTE:
+- Si cambia cualquiera de las entradas, cambia la clave (no hace falta invalidar a mano).
+- El "uso" de cada entrada se registra con el mtime del archivo (se actualiza en cada hit),
+  así el orden LRU sobrevive a reinicios del servidor.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple
+
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Módulos cuyo código fuente define la "versión del código".
+# Si se modifica cualquiera de ellos, todas las claves cambian.
+MODULOS_CODIGO = [
+    "excel_utils.py",
+    "match_utils.py",
+    "pdf_utils.py",
+    "costos_partes.py",
+    "calculo.py",
+    "detalles.py",
+    "pool_render.py",
+    "modelos.py",
+]
+
+# Tamaño máximo por defecto del cache de resultados (bytes).
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Tamaño de bloque para hashear archivos grandes sin cargarlos enteros.
+_CHUNK = 1024 * 1024
+
+
+# ==========================================================
+# Hashes
+# ==========================================================
+
+def hash_bytes(datos: bytes) -> str:
+    """Hash hex (BLAKE2b, 32 bytes) de un bloque de bytes."""
+    return hashlib.blake2b(datos or b"", digest_size=32).hexdigest()
+
+
+# Cache de hashes de archivos por (ruta, mtime, tamaño), para no releer
+# match.xlsx / template / logo por defecto en cada request.
+_hash_archivos: Dict[Tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+
+
+def hash_archivo(ruta) -> str:
+    """
+    Hash hex de un archivo. Si no existe, devuelve "".
+
+    El resultado se memoriza mientras el archivo no cambie (mtime/tamaño).
+    """
+    p = Path(ruta)
+    try:
+        st = p.stat()
+    except OSError:
+        return ""
+
+    k = (str(p.resolve()), st.st_mtime_ns, st.st_size)
+    with _hash_lock:
+        if k in _hash_archivos:
+            return _hash_archivos[k]
+
+    h = hashlib.blake2b(digest_size=32)
+    with open(p, "rb") as f:
+        for bloque in iter(lambda: f.read(_CHUNK), b""):
+            h.update(bloque)
+    digest = h.hexdigest()
+
+    with _hash_lock:
+        _hash_archivos[k] = digest
+    return digest
+
+
+def version_codigo(modulos: Optional[Iterable[str]] = None) -> str:
+    """Versión del código: hash combinado de las fuentes de los módulos del pipeline."""
+    h = hashlib.blake2b(digest_size=16)
+    for nombre in (modulos or MODULOS_CODIGO):
+        h.update(nombre.encode("utf-8"))
+        h.update(hash_archivo(BASE_DIR / nombre).encode("ascii"))
+    return h.hexdigest()
+
+
+def clave_resultado(hash_excel: str, fecha: str, hash_logo: str, match_path, template_path) -> str:
+    """
+    Construye la clave del cache de resultados.
+
+    Recibe los hashes del Excel y del logo (ya calculados) para no tener que
+    volver a leer los bytes; match/template se hashean desde su ruta.
+    """
+    partes = [
+        "excel=" + (hash_excel or ""),
+        "fecha=" + str(fecha or "").strip(),
+        "logo=" + (hash_logo or ""),
+        "match=" + hash_archivo(match_path),
+        "template=" + hash_archivo(template_path),
+        "codigo=" + version_codigo(),
+    ]
+    return hash_bytes("\n".join(partes).encode("utf-8"))
+
+
+# ==========================================================
+# Store LRU en disco
+# ==========================================================
+
+class CacheLRU:
+    """
+    Store clave -> bytes en un directorio, acotado por tamaño total.
+
+    - get(clave): devuelve el archivo ABIERTO (binario, y marca el uso) o None.
+      Se abre acá y no después: la expulsión (otro hilo u otro worker) puede
+      borrar la entrada en cualquier momento, pero un archivo ya abierto se sigue
+      pudiendo leer. Quien lo recibe lo cierra (send_file lo hace solo).
+    - leer(clave): los bytes de la entrada o None.
+    - put(clave, origen): copia/mueve un archivo al store y aplica la expulsión LRU.
+    """
+
+    def __init__(self, directorio, max_bytes: int = CACHE_MAX_BYTES, extension: str = ".pdf"):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self.extension = extension
+        self._lock = threading.Lock()
+
+    def ruta(self, clave: str) -> Path:
+        return self.directorio / f"{clave}{self.extension}"
+
+    def get(self, clave: str) -> Optional[BinaryIO]:
+        p = self.ruta(clave)
+        try:
+            f = open(p, "rb")
+        except OSError:
+            return None
+        try:
+            # Marcamos el uso (LRU) actualizando el mtime.
+            os.utime(p, None)
+        except OSError:
+            pass   # ya expulsada: igual se lee desde el archivo abierto
+        return f
+
+    def leer(self, clave: str) -> Optional[bytes]:
+        f = self.get(clave)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def put_bytes(self, clave: str, datos: bytes) -> Path:
+        destino = self.ruta(clave)
+        tmp = destino.with_name(f".{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(datos)
+        os.replace(tmp, destino)
+        self._expulsar()
+        return destino
+
+    def put(self, clave: str, origen, mover: bool = False) -> Path:
+        """
+        Guarda el archivo *origen* bajo *clave* y devuelve la ruta en el cache.
+
+        Con mover=True el archivo se mueve (os.replace) en vez de copiarse; pensado
+        para salidas generadas con ruta_temporal() (mismo directorio).
+        """
+        if not mover:
+            return self.put_bytes(clave, Path(origen).read_bytes())
+
+        destino = self.ruta(clave)
+        os.replace(origen, destino)
+        self._expulsar()
+        return destino
+
+    def ruta_temporal(self) -> Path:
+        """Ruta única dentro del store para generar un archivo antes de guardarlo con put(mover=True)."""
+        fd, tmp = tempfile.mkstemp(prefix=".gen_", suffix=".tmp", dir=self.directorio)
+        os.close(fd)
+        return Path(tmp)
+
+    def _expulsar(self):
+        """Elimina las entradas menos usadas hasta quedar por debajo de max_bytes."""
+        with self._lock:
+            entradas = []
+            total = 0
+            for p in self.directorio.glob(f"*{self.extension}"):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                entradas.append((st.st_mtime_ns, st.st_size, p))
+                total += st.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            entradas.sort()  # más antiguo (menos usado) primero
+            for _, size, p in entradas:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    p.unlink()
+                    total -= size
+                except OSError:
+                    continue
@@ -0,0 +1,189 @@
+"""calculo.py
+
+Todos los números del desglose de un ítem, SIN generar el PDF (no importa fitz):
+
+- Resumen:  CDT / GG / BEL / CU / IVA / CU+IVA   (desde el precio total IVA incluido)
+- Partes:   A / B / D / E / F (y A+B)             (costos_partes, desde el CDT)
+- Detalles: A / F / B / E                         (detalles, horas y costos)
+
+pdf_utils dibuja exactamente lo que calcula este módulo (calcular_item), así el
+PDF y la API de solo cálculo (/api/calculo en app.py) nunca se desalinean.
+
+Salidas estructuradas:
+- CalculoItem.a_dict(): un ítem como dict (JSON).
+- COLUMNAS_CSV / CalculoItem.a_fila_csv(): un ítem por fila, con los detalles
+  aplanados (A_horas, F_dtm, ...). Números sin separador de miles y con "."
+  decimal (para importar en otro sistema, no para leer en pantalla).
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from costos_partes import calcular_partes_desde_cdt
+from detalles import COLUMNAS, Detalles, calcular_detalles, detalles_a_dict, semilla_item
+from modelos import FilaItem
+
+# ===============================
+# RESUMEN (CDT .. CU+IVA)
+# ===============================
+# Porcentajes base (se pueden ajustar fácilmente):
+PCT_CDT = 0.75  # CDT = CU(sin IVA) * 75%
+PCT_GG = 0.14   # GG teórico = CU(sin IVA) * 14%  (luego se ajusta para cuadrar)
+PCT_BEL = 0.10  # Bel teórico = CU(sin IVA) * 10%
+
+CLAVES_RESUMEN = ["CDT", "GG", "BEL", "CU", "IVA", "CU_IVA"]
+CLAVES_PARTES = ["A", "B", "AB", "D", "E", "F"]
+
+
+def _round_half_up(x) -> int:
+    """
+    Emula el redondeo típico de Excel (ROUND) para 0 decimales,
+    evitando el "bankers rounding" de Python.
+    """
+    return int(Decimal(str(x)).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def _clamp_nonneg_int(x) -> int:
+    """Asegura entero >= 0."""
+    try:
+        xi = int(x)
+    except Exception:
+        xi = 0
+    return xi if xi >= 0 else 0
+
+
+def total_iva_incl(fila: FilaItem):
+    """
+    Monto base del ítem: el TOTAL (IVA incluido), "Precio total".
+    Si no viniera, se reconstruye con precio_unitario_iva_incl * cantidad.
+    """
+    total = fila.precio_total_iva_incl
+    if total is None:
+        pu = fila.precio_unitario_iva_incl
+        qty = fila.cantidad
+        if pu is not None and qty is not None:
+            total = pu * qty
+    return total
+
+
+def calcular_resumen_desde_total(total_iva_incl) -> Dict[str, int]:
+    """
+    Construye los valores del resumen desde el TOTAL (IVA incluido).
+
+    Devuelve dict:
+        {
+          "CDT": ...,
+          "GG": ...,
+          "BEL": ...,
+          "CU": ...,
+          "IVA": ...,
+          "CU_IVA": ...
+        }
+
+    Nota:
+    - No se imprimen decimales.
+    - No se permiten negativos.
+    - GG se ajusta (Opción A) para que CU = CDT + GG + BEL, donde CU = (CU+IVA) - IVA.
+    """
+    if total_iva_incl is None:
+        total_iva_incl = 0
+
+    # Total IVA incluido (entero)
+    cu_iva = _round_half_up(total_iva_incl)
+
+    # IVA y CU (sin IVA)
+    iva = _round_half_up(cu_iva / 11)
+    cu = cu_iva - iva
+
+    # Evitar negativos por cualquier motivo (aunque no debería)
+    iva = _clamp_nonneg_int(iva)
+    cu = _clamp_nonneg_int(cu)
+
+    # CDT y Bel teórico (sobre CU sin IVA)
+    cdt = _round_half_up(cu * PCT_CDT)
+    bel = _round_half_up(cu * PCT_BEL)
+
+    # Clamps para evitar pasar CU por redondeos
+    cdt = min(_clamp_nonneg_int(cdt), cu)
+    bel = min(_clamp_nonneg_int(bel), cu - cdt)
+
+    # Opción A (simplificada): GG absorbe el ajuste para que cierre
+    gg = cu - cdt - bel
+    gg = _clamp_nonneg_int(gg)
+
+    return {
+        "CDT": cdt,
+        "GG": gg,
+        "BEL": bel,          # en el template figura como "Impuestos y retenciones"
+        "CU": cdt + gg + bel,
+        "IVA": iva,
+        "CU_IVA": cu_iva,
+    }
+
+
+# ===============================
+# ÍTEM COMPLETO
+# ===============================
+
+@dataclass
+class CalculoItem:
+    """Números de UN ítem: resumen, partes y tabla de detalles (ver detalles.calcular_detalles)."""
+    fila: FilaItem
+    resumen: Dict[str, int]
+    partes: Dict[str, int]
+    detalles: Detalles
+
+    def a_dict(self) -> dict:
+        f = self.fila
+        return {
+            "item": f.item,
+            "descripcion": f.descripcion,
+            "unidad_medida": f.unidad_medida,
+            "presentacion": f.presentacion,
+            "cantidad": f.cantidad,
+            "tipo_item": f.tipo_item,
+            "resumen": {k: self.resumen[k] for k in CLAVES_RESUMEN},
+            "partes": {k: self.partes.get(k, 0) for k in CLAVES_PARTES},
+            "detalles": detalles_a_dict(self.detalles),
+        }
+
+    def a_fila_csv(self) -> list:
+        """Valores en el orden de COLUMNAS_CSV (sin las columnas de lote)."""
+        f = self.fila
+        fila = [f.item, f.descripcion, f.unidad_medida, f.presentacion, f.cantidad, f.tipo_item]
+        fila += [self.resumen[k] for k in CLAVES_RESUMEN]
+        fila += [self.partes.get(k, 0) for k in CLAVES_PARTES]
+        for parte, valores in detalles_a_dict(self.detalles).items():
+            fila += [""] * len(COLUMNAS[parte]) if valores is None else list(valores.values())
+        return fila
+
+
+COLUMNAS_CSV: List[str] = (
+    ["hoja", "lote", "item", "descripcion", "unidad_medida", "presentacion", "cantidad", "tipo_item"]
+    + CLAVES_RESUMEN
+    + CLAVES_PARTES
+    + [f"{parte}_{col}" for parte, cols in COLUMNAS.items() for col in cols]
+)
+
+
+def calcular_item(fila, rng: Optional[random.Random] = None) -> CalculoItem:
+    """
+    Resumen, partes y detalles de *fila* (FilaItem o dict, ya con tipo_item del match).
+    *rng*: ver detalles.calcular_detalles.
+    """
+    fila = FilaItem.desde(fila)
+    resumen = calcular_resumen_desde_total(total_iva_incl(fila))
+    partes = calcular_partes_desde_cdt(resumen.get("CDT", 0), fila.tipo_item)
+    detalles = calcular_detalles(partes, semilla_item(fila.item, fila.descripcion), fila.cantidad, rng)
+    return CalculoItem(fila, resumen, partes, detalles)
+
+
+def calcular_filas(filas: Iterable) -> Iterator[CalculoItem]:
+    """calcular_item para cada fila (generador; reutiliza un solo Random)."""
+    rng = random.Random()
+    for fila in filas:
+        yield calcular_item(fila, rng)
@@ -0,0 +1,261 @@
+"""detalles.py
+
+Cálculo (SIN dibujar) de las filas de detalle de cada ítem:
+
+- A) Equipos:      horas / costo por hora / costo total (= total A)
+- F) Transporte:   DTM / consumo / costo unitario / costo total (= total F)
+- B) Mano de obra: cantidad / horas / costo / costo total (= total B), solo si B > 0
+- E) Materiales:   consumo / costo unitario / costo total (= total E), solo si E > 0
+
+pdf_utils solo imprime lo que devuelve este módulo. Acá no hay fitz: se puede
+probar y medir por separado (python benchmarks.py detalles).
+
+Aleatorios reproducibles
+- Las horas de A/B y el costo unitario de F son aleatorios, pero el mismo Excel
+  tiene que dar los mismos números en cualquier proceso (workers de gunicorn,
+  reinicios, render en paralelo, cache de hojas, golden).
+- Ítem numérico: la semilla es el número de ítem.
+- Ítem no numérico: BLAKE2b con clave (CLAVE_SEMILLA) de la descripción. Antes
+  era abs(hash(texto)), que cambia en cada proceso (PYTHONHASHSEED).
+- A/F usan Random(semilla) y B/E Random(semilla + 1337), siempre en el mismo
+  orden de sorteos.
+
+Tablas de divisores
+- A prefiere horas que dividan exacto al total A; B, horas tales que
+  cantidad * horas divida exacto al total B. En vez de probar cada hora con %
+  en cada ítem, los candidatos salen de una tabla indexada por el resto del
+  total módulo el mcm del rango de horas (2..10 -> 2520 entradas; 1..3 -> 6).
+- B: cantidad * h divide a total  <=>  cantidad divide a total y h divide a
+  total / cantidad, así la misma tabla sirve para cualquier cantidad.
+- Redondeos de B/E con aritmética entera (mismo resultado que
+  ROUND_HALF_UP sobre la división en float, sin pasar por Decimal).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from math import lcm
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ===============================
+# PARÁMETROS (editables)
+# ===============================
+DET_A_HORAS_MIN = 2
+DET_A_HORAS_MAX = 10
+
+DET_F_COSTO_UNIT_MIN = 8000
+DET_F_COSTO_UNIT_MAX = 11000
+DET_F_CONSUMO = 0.05
+
+DET_B_HORAS_MIN = 1
+DET_B_HORAS_MAX = 3
+
+# Desplazamiento de la semilla de B/E respecto de la de A/F.
+DESPLAZAMIENTO_SEMILLA_BE = 1337
+
+# Cambiar CLAVE_SEMILLA cambia TODOS los detalles de ítems no numéricos.
+CLAVE_SEMILLA = b"desglose-detalles-v1"
+
+# Si el mcm de un rango de horas pasa de esto, no se arma tabla (se prueba con %).
+MAX_TABLA_DIVISORES = 1 << 16
+
+# Tipo de la tabla de un ítem (ver calcular_detalles).
+Detalles = Dict[str, Optional[tuple]]
+
+# Nombre de cada valor de las tuplas de la tabla (mismo orden que en el PDF).
+COLUMNAS = {
+    "A": ("horas", "costo_hora", "costo_total"),
+    "F": ("dtm", "consumo", "costo_unit", "costo_total"),
+    "B": ("cantidad", "horas", "costo", "costo_total"),
+    "E": ("consumo", "costo_unit", "costo_total"),
+}
+
+# Decimales con los que se imprimen DTM y consumo de F.
+DECIMALES_F = 2
+
+
+# ===============================
+# AUXILIARES
+# ===============================
+
+def _round_half_up(x) -> int:
+    """Redondeo 0 decimales tipo Excel (ROUND_HALF_UP)."""
+    try:
+        return int(Decimal(str(x)).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    except Exception:
+        return 0
+
+
+def _clamp_nonneg_int(x) -> int:
+    """Convierte a int y fuerza >= 0."""
+    try:
+        v = int(x)
+    except Exception:
+        v = 0
+    return v if v >= 0 else 0
+
+
+def _dividir_redondeando(a: int, b: int) -> int:
+    """ROUND_HALF_UP(a / b) para enteros a >= 0, b > 0."""
+    return (2 * a + b) // (2 * b)
+
+
+@lru_cache(maxsize=8)
+def _tabla_divisores(h_min: int, h_max: int) -> Tuple[int, Optional[List[tuple]]]:
+    """
+    (m, tabla): tabla[r] = horas h de [h_min, h_max] que dividen a cualquier
+    total con total % m == r (m = mcm del rango). tabla es None si m es muy grande.
+    """
+    horas = [h for h in range(h_min, h_max + 1) if h > 0]
+    if not horas:
+        return 1, [()]
+    m = lcm(*horas)
+    if m > MAX_TABLA_DIVISORES:
+        return m, None
+    return m, [tuple(h for h in horas if r % h == 0) for r in range(m)]
+
+
+def _horas_que_dividen(total: int, h_min: int, h_max: int) -> tuple:
+    """Horas del rango que dividen exacto a *total* (total >= 0)."""
+    m, tabla = _tabla_divisores(h_min, h_max)
+    if tabla is None:
+        return tuple(h for h in range(h_min, h_max + 1) if h > 0 and total % h == 0)
+    return tabla[total % m]
+
+
+# ===============================
+# SEMILLA
+# ===============================
+
+def semilla_item(item_txt, descripcion) -> int:
+    """Semilla estable (entre procesos) de los aleatorios del detalle de un ítem."""
+    item_txt = str(item_txt).strip()
+    if item_txt.isascii() and item_txt.isdigit():
+        return int(item_txt)
+    digest = hashlib.blake2b(str(descripcion).encode("utf-8"), key=CLAVE_SEMILLA, digest_size=8).digest()
+    return int.from_bytes(digest, "big") % 1000000
+
+
+# ===============================
+# CÁLCULO
+# ===============================
+
+def calcular_detalles(partes: Dict[str, int], semilla, cantidad_excel,
+                      rng: Optional[random.Random] = None) -> Detalles:
+    """
+    Tabla de detalle de UN ítem:
+
+        {
+          "A": (horas, costo_hora, total_a),
+          "F": (dtm, consumo, costo_unit, total_f),
+          "B": (cantidad, horas, costo, total_b) o None si total_B == 0,
+          "E": (consumo, costo_unit, total_e) o None si total_E == 0,
+        }
+
+    *partes*: dict de costos_partes.calcular_partes_desde_cdt.
+    *rng*: Random a reutilizar (se vuelve a sembrar); si no, se crea uno.
+    No compartir un mismo *rng* entre hilos.
+    """
+    semilla = int(semilla) if semilla is not None else 0
+    detalles: Detalles = {}
+
+    total_a = _clamp_nonneg_int(partes.get("A", 0))
+    total_f = _clamp_nonneg_int(partes.get("F", 0))
+    total_b = _clamp_nonneg_int(partes.get("B", 0))
+    total_e = _clamp_nonneg_int(partes.get("E", 0))
+
+    # -------------------------
+    # A) Equipos
+    # -------------------------
+    if rng is None:
+        rng = random.Random(semilla)
+    else:
+        rng.seed(semilla)
+
+    # Si existe un divisor del total en el rango lo preferimos (total_a / horas exacto).
+    candidatas = _horas_que_dividen(total_a, DET_A_HORAS_MIN, DET_A_HORAS_MAX)
+    if candidatas:
+        horas = rng.choice(candidatas)
+    else:
+        horas = rng.randint(DET_A_HORAS_MIN, DET_A_HORAS_MAX)
+    horas = horas if horas > 0 else 1
+
+    detalles["A"] = (horas, total_a // horas, total_a)
+
+    # -------------------------
+    # F) Transporte
+    # -------------------------
+    consumo = float(DET_F_CONSUMO)
+    costo_unit = rng.randint(DET_F_COSTO_UNIT_MIN, DET_F_COSTO_UNIT_MAX)
+    costo_unit = costo_unit if costo_unit > 0 else DET_F_COSTO_UNIT_MIN
+
+    denom = consumo * float(costo_unit)
+    dtm = float(total_f) / denom if denom > 0 else 0.0
+
+    detalles["F"] = (dtm, consumo, costo_unit, total_f)
+
+    # Cantidad (Excel): para Mano de obra y como Consumo en Materiales.
+    qty = _clamp_nonneg_int(_round_half_up(cantidad_excel) if cantidad_excel is not None else 0)
+    if qty <= 0:
+        qty = 1
+
+    # -------------------------
+    # B) Mano de obra (solo si total_B > 0)
+    # -------------------------
+    detalles["B"] = None
+    if total_b > 0:
+        rng.seed(semilla + DESPLAZAMIENTO_SEMILLA_BE)
+
+        # Horas con qty * horas divisor exacto de total_b, si existen.
+        if total_b % qty == 0:
+            candidatas = _horas_que_dividen(total_b // qty, DET_B_HORAS_MIN, DET_B_HORAS_MAX)
+        else:
+            candidatas = ()
+        if candidatas:
+            horas = rng.choice(candidatas)
+        else:
+            horas = rng.randint(DET_B_HORAS_MIN, DET_B_HORAS_MAX)
+        horas = horas if horas > 0 else 1
+
+        costo = _dividir_redondeando(total_b, qty * horas) or 1
+        detalles["B"] = (qty, horas, costo, total_b)
+
+    # -------------------------
+    # E) Materiales (solo si total_E > 0)
+    # -------------------------
+    detalles["E"] = None
+    if total_e > 0:
+        costo_unit_e = _dividir_redondeando(total_e, qty) or 1
+        detalles["E"] = (qty, costo_unit_e, total_e)
+
+    return detalles
+
+
+def calcular_detalles_lote(entradas: Iterable[Tuple[Dict[str, int], int, object]]) -> List[Detalles]:
+    """
+    calcular_detalles para muchos ítems de una pasada: *entradas* son
+    (partes, semilla, cantidad_excel). Reutiliza un solo Random.
+    """
+    rng = random.Random()
+    return [calcular_detalles(partes, semilla, cantidad, rng) for partes, semilla, cantidad in entradas]
+
+
+def detalles_a_dict(detalles: Detalles) -> Dict[str, Optional[dict]]:
+    """
+    La tabla de calcular_detalles con nombres (ver COLUMNAS), para JSON/CSV.
+    DTM y consumo de F van redondeados como se imprimen; B/E son None si no aplican.
+    """
+    out: Dict[str, Optional[dict]] = {}
+    for parte, columnas in COLUMNAS.items():
+        valores = detalles.get(parte)
+        if valores is None:
+            out[parte] = None
+            continue
+        if parte == "F":
+            dtm, consumo, costo_unit, total_f = valores
+            valores = (round(dtm, DECIMALES_F), round(consumo, DECIMALES_F), costo_unit, total_f)
+        out[parte] = dict(zip(columnas, valores))
+    return out
@@ -1,5 +1,17 @@
-from openpyxl import load_workbook
+from itertools import chain, islice
+import csv
+import io
+import logging
+import os
+import re
 import unicodedata
+import zipfile
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from modelos import FilaItem
+
+log = logging.getLogger("desglose.excel")
 
 def normalizar(texto):
     """
@@ -33,7 +45,8 @@ def _es_item_valido(valor_item):
         txt = valor_item.strip()
         if txt == "":
             return False
-        return txt.isdigit()
+        # isascii: "²" o "①" pasan isdigit pero int() no los acepta.
+        return txt.isascii() and txt.isdigit()
 
     # int
     if isinstance(valor_item, int):
@@ -77,7 +90,14 @@ def _to_number(valor):
     return None
 
 
-def _buscar_titulo_llamado(ws, filas_busqueda=5):
+def _celda(fila, col):
+    """Valor de la columna *col* (1-based) de una fila leída como tupla; None si no existe."""
+    if col is None or col < 1 or col > len(fila):
+        return None
+    return fila[col - 1]
+
+
+def _buscar_titulo_llamado(filas, filas_busqueda=5):
     """
     Busca el título del llamado en las primeras filas.
 
@@ -86,10 +106,11 @@ def _buscar_titulo_llamado(ws, filas_busqueda=5):
     - Ese texto debe ir completo debajo de la fecha en el PDF.
 
     Si no se encuentra un match claro, hace fallback a A1.
+
+    *filas*: primeras filas de la hoja, como tuplas de valores.
     """
-    for fila in range(1, filas_busqueda + 1):
-        for col in range(1, ws.max_column + 1):
-            valor = ws.cell(row=fila, column=col).value
+    for fila in filas[:filas_busqueda]:
+        for valor in fila:
             if not valor:
                 continue
 
@@ -97,11 +118,11 @@ def _buscar_titulo_llamado(ws, filas_busqueda=5):
             if "items del llamado" in norm or "item del llamado" in norm:
                 return str(valor).strip()
 
-    v = ws.cell(row=1, column=1).value
+    v = _celda(filas[0], 1) if filas else None
     return str(v).strip() if v else ""
 
 
-def _buscar_texto_lote(ws, filas_busqueda=15):
+def _buscar_texto_lote(filas, filas_busqueda=15):
     """Busca un texto que contenga/empiece con "Lote" en las primeras filas.
 
     - Recorre las primeras *filas_busqueda* filas y todas las columnas.
@@ -111,9 +132,8 @@ def _buscar_texto_lote(ws, filas_busqueda=15):
     Nota:
     En varios Excels el contenido suele empezar con "Lote ...".
     """
-    for fila in range(1, filas_busqueda + 1):
-        for col in range(1, ws.max_column + 1):
-            valor = ws.cell(row=fila, column=col).value
+    for fila in filas[:filas_busqueda]:
+        for valor in fila:
             if not valor:
                 continue
 
@@ -130,30 +150,24 @@ def _buscar_texto_lote(ws, filas_busqueda=15):
     return ""
 
 
-def leer_items_y_descripciones_excel(ruta_excel):
-    """
-    Lee el Excel subido por el usuario y devuelve:
+# Cuántas filas iniciales se leen para buscar título, lote y encabezados.
+FILAS_CABECERA = 15
 
-      (titulo_llamado, texto_lote, filas)
+# Fin de los datos: después de esta cantidad de filas VACÍAS seguidas (sin
+# ningún valor: las que solo tienen formato) se deja de leer la hoja. Las filas
+# con contenido que no es un ítem (firmas, notas, ítems mal cargados) no cuentan
+# y reinician la cuenta. Hojas formateadas "hasta abajo" traen cientos de miles
+# de filas vacías que openpyxl igual tiene que parsear. 0 = leer siempre hasta el final.
+MAX_FILAS_VACIAS_SEGUIDAS = int(os.environ.get("DESGLOSE_MAX_FILAS_VACIAS", "200"))
 
-    filas: lista de dicts con:
-        - item
-        - descripcion
-        - unidad_medida
-        - presentacion
-        - cantidad
-        - precio_unitario_iva_incl
-        - precio_total_iva_incl   (IMPORTANTE: es el TOTAL, no el unitario)
-    """
-    wb = load_workbook(ruta_excel, data_only=True)
-    ws = wb.active
 
-    # -------------------------------
-    # Encabezados generales (parte superior del Excel)
-    # -------------------------------
-    titulo_llamado = _buscar_titulo_llamado(ws)
-    texto_lote = _buscar_texto_lote(ws)
+def _detectar_columnas(primeras):
+    """
+    Busca la fila de encabezados (en las primeras 10 filas) y las columnas de interés.
 
+    Devuelve (indice_fila_encabezados, columnas) donde indice es 0-based dentro de
+    *primeras* y columnas es un dict nombre -> número de columna (1-based) o None.
+    """
     fila_encabezados = None
     col_desc = None
     col_item = None
@@ -164,21 +178,20 @@ def leer_items_y_descripciones_excel(ruta_excel):
     col_precio_total = None
 
     # Buscar encabezados en las primeras 10 filas
-    for fila in range(1, 11):
+    for idx, fila in enumerate(primeras[:10]):
         posibles = {}
-        for col in range(1, ws.max_column + 1):
-            valor = ws.cell(row=fila, column=col).value
+        for col, valor in enumerate(fila, start=1):
             if valor:
                 posibles[normalizar(valor)] = col
 
         # localizar descripción
         for nombre, col in posibles.items():
             if "descripcion" in nombre and "bien" in nombre:
-                fila_encabezados = fila
+                fila_encabezados = idx
                 col_desc = col
                 break
 
-        if fila_encabezados:
+        if fila_encabezados is not None:
             # localizar Unidad de Medida / Presentación / Cantidad / Precios
             for nombre, col in posibles.items():
                 if col_unidad is None and "unidad" in nombre and "medida" in nombre:
@@ -193,12 +206,11 @@ def leer_items_y_descripciones_excel(ruta_excel):
                     col_precio_total = col
             break
 
-    if not fila_encabezados:
+    if fila_encabezados is None:
         raise ValueError("No se encontró una fila de encabezados con 'Descripción del Bien'")
 
     # localizar columna de item
-    for col in range(1, ws.max_column + 1):
-        valor = ws.cell(row=fila_encabezados, column=col).value
+    for col, valor in enumerate(primeras[fila_encabezados], start=1):
         if not valor:
             continue
 
@@ -210,10 +222,568 @@ def leer_items_y_descripciones_excel(ruta_excel):
     if not col_item:
         raise ValueError("No se encontró la columna 'Ítem' en el encabezado")
 
-    filas = []
-    for fila in range(fila_encabezados + 1, ws.max_row + 1):
-        item = ws.cell(row=fila, column=col_item).value
-        desc = ws.cell(row=fila, column=col_desc).value
+    return fila_encabezados, {
+        "item": col_item,
+        "descripcion": col_desc,
+        "unidad_medida": col_unidad,
+        "presentacion": col_presentacion,
+        "cantidad": col_cantidad,
+        "precio_unitario_iva_incl": col_precio_unit,
+        "precio_total_iva_incl": col_precio_total,
+    }
+
+
+@dataclass
+class CorteLectura:
+    """Dónde se dejó de leer una hoja por filas vacías seguidas (ver MAX_FILAS_VACIAS_SEGUIDAS)."""
+    hoja: str
+    ultima_fila: int                 # última fila con contenido (1-based)
+    filas_sin_leer: Optional[int]    # según el tamaño declarado de la hoja, si se conoce
+
+
+class FilasLote:
+    """
+    Iterador de FilaItem de una hoja (lo devuelve _generar_filas).
+
+    Al agotarlo, *corte* es un CorteLectura si la lectura se cortó por filas
+    vacías seguidas (puede haber ítems más abajo), o None si llegó al final.
+    """
+
+    def __init__(self, filas, estado):
+        # *estado*: lista de un elemento que completa el generador *filas* (sin
+        # referenciar a este objeto: descartarlo cierra el generador enseguida).
+        self._filas = filas
+        self._estado = estado
+
+    @property
+    def corte(self) -> Optional[CorteLectura]:
+        return self._estado[0]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._filas)
+
+    def close(self):
+        self._filas.close()
+
+
+def _fila_vacia(fila):
+    """True si ninguna celda de la fila tiene un valor (None o texto en blanco)."""
+    return all(v is None or (isinstance(v, str) and not v.strip()) for v in fila)
+
+
+def _generar_filas(filas_datos, cols, al_terminar=None, hoja="", fila_inicio=1,
+                   filas_declaradas=None, max_filas_vacias=None):
+    """
+    Ítems a partir de las filas de datos (tuplas de valores), como FilasLote.
+    Se consume de a una fila: no materializa la hoja completa.
+
+    Corta después de *max_filas_vacias* filas vacías seguidas (default
+    MAX_FILAS_VACIAS_SEGUIDAS): lo deja en FilasLote.corte y en el log, con las
+    filas que se saltearon si el lector conoce el tamaño declarado de la hoja
+    (*filas_declaradas*). Las filas con contenido que no son ítems no cuentan.
+    *fila_inicio*: número (1-based) de la primera fila de *filas_datos*.
+    """
+    limite = MAX_FILAS_VACIAS_SEGUIDAS if max_filas_vacias is None else max_filas_vacias
+    estado = [None]
+
+    def _filas():
+        n_fila = fila_inicio - 1
+        vacias = 0
+        try:
+            for fila in filas_datos:
+                n_fila += 1
+                item = _celda(fila, cols["item"])
+                desc = _celda(fila, cols["descripcion"])
+
+                if not _es_item_valido(item) or desc is None or str(desc).strip() == "":
+                    if not _fila_vacia(fila):
+                        vacias = 0
+                        continue
+                    vacias += 1
+                    if limite and vacias >= limite:
+                        saltadas = None
+                        if filas_declaradas and filas_declaradas > n_fila:
+                            saltadas = filas_declaradas - n_fila
+                        estado[0] = CorteLectura(hoja, n_fila - vacias, saltadas)
+                        log.info(
+                            "Hoja %r: %d filas vacías seguidas después de la fila %d, se deja de leer%s",
+                            hoja, vacias, n_fila - vacias,
+                            f"; se saltearon {saltadas} de {filas_declaradas} filas declaradas" if saltadas else "",
+                        )
+                        return
+                    continue
+                vacias = 0
+
+                unidad = _celda(fila, cols["unidad_medida"])
+                presentacion = _celda(fila, cols["presentacion"])
+                cantidad = _celda(fila, cols["cantidad"])
+                precio_unit = _celda(fila, cols["precio_unitario_iva_incl"])
+                precio_total = _celda(fila, cols["precio_total_iva_incl"])
+
+                yield FilaItem(
+                    item=item,
+                    descripcion=str(desc).strip(),
+                    unidad_medida=str(unidad).strip() if unidad is not None else "",
+                    presentacion=str(presentacion).strip() if presentacion is not None else "",
+                    cantidad=_to_number(cantidad),
+                    precio_unitario_iva_incl=_to_number(precio_unit),
+                    precio_total_iva_incl=_to_number(precio_total),
+                )
+        finally:
+            if al_terminar is not None:
+                al_terminar()
+
+    return FilasLote(_filas(), estado)
+
+
+# ==========================================================
+# Lectores por formato (xlsx / xlsm / xls / csv)
+# ==========================================================
+# Cada lector recibe la fuente (ruta o buffer) y devuelve:
+#   (hojas, cerrar)
+# donde *hojas* es un iterador de (nombre_hoja, filas): *filas* es un iterador de
+# tuplas de valores (celda vacía -> None). Con todas=False solo se entrega la hoja
+# activa; con todas=True, todas las hojas en orden. *cerrar* libera recursos.
+# Si el lector conoce el tamaño declarado de la hoja, *filas* puede tener el
+# atributo filas_declaradas (solo se informa en el corte por filas vacías).
+# La detección de título/lote/encabezados es la MISMA para todos los formatos
+# (se hace sobre esas tuplas).
+
+# Firmas de archivo (primeros bytes)
+_FIRMA_ZIP = b"PK\x03\x04"                          # xlsx / xlsm (OOXML = zip)
+_FIRMA_OLE2 = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"  # xls (BIFF dentro de OLE2)
+
+
+def _leer_bytes(fuente):
+    """Bytes completos de la fuente (ruta o buffer). El buffer queda en su posición inicial."""
+    if hasattr(fuente, "read"):
+        pos = fuente.tell()
+        datos = fuente.read()
+        fuente.seek(pos)
+        return datos
+    with open(fuente, "rb") as f:
+        return f.read()
+
+
+# Bytes que se miran para decidir si una fuente sin firma conocida es texto (CSV).
+_MUESTRA_TEXTO = 4096
+# Controles que no aparecen en un CSV de texto (todos salvo \t \n \f \r y ESC).
+_CONTROLES_BINARIOS = bytes(c for c in range(32) if c not in (9, 10, 12, 13, 27))
+
+
+def detectar_formato(fuente):
+    """
+    Detecta el formato mirando la cabecera del archivo (no la extensión):
+      - zip  -> "xlsm" si trae macros (xl/vbaProject.bin), si no "xlsx"
+      - OLE2 -> "xls"
+      - texto -> "csv"
+    Un buffer queda en la posición en que estaba. Lanza ValueError si el zip
+    está dañado o si el contenido es binario y no es ninguno de esos formatos.
+    """
+    if hasattr(fuente, "read"):
+        pos = fuente.tell()
+        muestra = fuente.read(_MUESTRA_TEXTO)
+        fuente.seek(pos)
+    else:
+        pos = None
+        with open(fuente, "rb") as f:
+            muestra = f.read(_MUESTRA_TEXTO)
+
+    if muestra.startswith(_FIRMA_ZIP):
+        try:
+            with zipfile.ZipFile(fuente) as z:
+                return "xlsm" if "xl/vbaProject.bin" in z.namelist() else "xlsx"
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"El archivo Excel está dañado: {e}")
+        finally:
+            if pos is not None:
+                fuente.seek(pos)
+
+    if muestra.startswith(_FIRMA_OLE2):
+        return "xls"
+
+    if isinstance(muestra, bytes) and len(muestra.translate(None, _CONTROLES_BINARIOS)) != len(muestra):
+        raise ValueError("El archivo no es un Excel (.xlsx/.xlsm/.xls) ni un CSV de texto")
+    return "csv"
+
+
+def _filas_xlsx(fuente, todas=False):
+    """xlsx / xlsm con openpyxl en modo read-only (streaming)."""
+    # Import diferido (igual que xlrd): openpyxl solo se carga al leer el primer xlsx.
+    from openpyxl import load_workbook
+
+    wb = load_workbook(fuente, read_only=True, data_only=True)
+    hojas = wb.worksheets if todas else [wb.active]
+
+    def _hoja(ws):
+        # La dimensión declarada (<dimension ref="A1:XFD1048576">) suele incluir
+        # filas/columnas que solo tienen formato. Sin ella, openpyxl entrega cada
+        # fila hasta su última celda en vez de rellenarla hasta la columna declarada.
+        declaradas = ws.max_row
+        ws.reset_dimensions()
+        # wb._archive: el zip que openpyxl deja abierto en modo read-only.
+        contar = lambda desde, col: _filas_con_valor_xlsx(wb._archive, ws._worksheet_path, desde, col)
+        return ws.title, _FilasHoja(ws.iter_rows(values_only=True), declaradas, contar)
+
+    return (_hoja(ws) for ws in hojas), wb.close
+
+
+class _FilasHoja:
+    """
+    Iterador de filas con el tamaño declarado de la hoja (ver Lectores por formato).
+    *contar_con_valor(desde_fila, col)*, si el lector lo da: filas con valor en la
+    columna *col* desde *desde_fila* (1-based) sin recorrer las filas (estimar_items_por_lote).
+    """
+
+    def __init__(self, filas, filas_declaradas=None, contar_con_valor=None):
+        self._filas = iter(filas)
+        self.filas_declaradas = filas_declaradas
+        self.contar_con_valor = contar_con_valor
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._filas)
+
+
+def _filas_xls(fuente, todas=False):
+    """xls (Excel 97-2003) con xlrd, sin conversión previa."""
+    try:
+        import xlrd
+    except ImportError:
+        raise ValueError("Para leer archivos .xls hace falta instalar xlrd (pip install xlrd)")
+
+    # on_demand: cada hoja se parsea al pedirla y se descarta (unload_sheet) al
+    # terminar de recorrerla, así no quedan todas las hojas en memoria.
+    book = xlrd.open_workbook(file_contents=_leer_bytes(fuente), on_demand=True)
+
+    if todas:
+        indices = range(len(book.sheet_names()))
+    else:
+        # Hoja "activa": la primera seleccionada (equivalente a wb.active de openpyxl).
+        # xlrd solo lo sabe cargando la hoja: las que no lo son se descartan enseguida.
+        indices = [0]
+        for i in range(len(book.sheet_names())):
+            if book.sheet_by_index(i).sheet_selected:
+                indices = [i]
+                break
+            book.unload_sheet(i)
+
+    def _valor(celda):
+        if celda.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+            return None
+        v = celda.value
+        # xlrd devuelve todos los números como float: 3.0 -> 3 (igual que openpyxl)
+        if celda.ctype == xlrd.XL_CELL_NUMBER and float(v).is_integer():
+            return int(v)
+        return v
+
+    def _filas(i, sh):
+        try:
+            for r in range(sh.nrows):
+                yield tuple(_valor(c) for c in sh.row(r))
+        finally:
+            book.unload_sheet(i)
+
+    def _contar(sh, desde, col):
+        if col > sh.ncols:
+            return 0
+        vacias = (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK)
+        return sum(1 for t in sh.col_types(col - 1, start_rowx=desde - 1) if t not in vacias)
+
+    def _hojas():
+        for i in indices:
+            sh = book.sheet_by_index(i)
+            yield sh.name, _FilasHoja(_filas(i, sh), sh.nrows, lambda desde, col, sh=sh: _contar(sh, desde, col))
+
+    return _hojas(), book.release_resources
+
+
+def texto_csv(datos):
+    """Texto de un CSV: UTF-8 (con o sin BOM) o, si no decodifica, latin-1."""
+    if isinstance(datos, bytes):
+        try:
+            return datos.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            return datos.decode("latin-1")
+    return datos
+
+
+def separador_csv(texto):
+    """
+    Separador ("," o ";") de un CSV, decidido en la fila de encabezados (la que
+    dice "Descripción", entre las primeras FILAS_CABECERA): las filas de
+    título/lote y las descripciones suelen tener comas sueltas.
+    """
+    muestra = texto.split("\n", FILAS_CABECERA)[:FILAS_CABECERA]
+    referencia = next((ln for ln in muestra if "descripcion" in normalizar(ln)), muestra[0])
+    return ";" if referencia.count(";") > referencia.count(",") else ","
+
+
+def _filas_csv(fuente, todas=False):
+    """CSV (separador "," o ";"). UTF-8 (con o sin BOM) o latin-1. Celdas vacías -> None, enteros -> int."""
+    datos = texto_csv(_leer_bytes(fuente))
+    separador = separador_csv(datos)
+    f = io.StringIO(datos, newline="")
+
+    def _valor(v):
+        v = v.strip()
+        if v == "":
+            return None
+        # En Excel un número entero llega como int: replicamos eso para que el ítem
+        # ("1") y los demás valores salgan igual que desde un .xlsx.
+        if v.isascii() and v.isdigit():
+            return int(v)
+        return v
+
+    def _filas():
+        for fila in csv.reader(f, delimiter=separador):
+            yield tuple(_valor(v) for v in fila)
+
+    # Un CSV tiene una sola "hoja"
+    return iter([("csv", _filas())]), f.close
+
+
+# Registro de lectores: formato -> función. Se puede extender con registrar_lector.
+LECTORES = {
+    "xlsx": _filas_xlsx,
+    "xlsm": _filas_xlsx,
+    "xls": _filas_xls,
+    "csv": _filas_csv,
+}
+
+
+def registrar_lector(formato, lector):
+    """Agrega (o reemplaza) el lector de un formato. *lector(fuente, todas=False) -> (hojas, cerrar)*."""
+    LECTORES[formato] = lector
+
+
+def _lector_para(fuente, formato=None):
+    formato = formato or detectar_formato(fuente)
+    lector = LECTORES.get(formato)
+    if lector is None:
+        raise ValueError(f"Formato de planilla no soportado: {formato}")
+    return lector
+
+
+def _preparar_hoja(filas_iter):
+    """
+    Lee las primeras filas de una hoja y resuelve título, lote y encabezados.
+
+    Devuelve (titulo_llamado, texto_lote, filas_datos, cols, fila_inicio), donde
+    *filas_datos* sigue siendo un iterador (no se materializa la hoja) y
+    *fila_inicio* es el número (1-based) de su primera fila.
+    Lanza ValueError si la hoja no tiene encabezados reconocibles.
+    """
+    filas_iter = iter(filas_iter)
+    primeras = [tuple(f) for f in islice(filas_iter, FILAS_CABECERA)]
+
+    # -------------------------------
+    # Encabezados generales (parte superior del Excel)
+    # -------------------------------
+    titulo_llamado = _buscar_titulo_llamado(primeras)
+    texto_lote = _buscar_texto_lote(primeras)
+
+    idx_encabezados, cols = _detectar_columnas(primeras)
+
+    filas_datos = chain(primeras[idx_encabezados + 1:], filas_iter)
+    return titulo_llamado, texto_lote, filas_datos, cols, idx_encabezados + 2
+
+
+def iterar_items_y_descripciones_excel(ruta_excel, formato=None, max_filas_vacias=None):
+    """
+    Versión en streaming de leer_items_y_descripciones_excel.
+
+    Devuelve (titulo_llamado, texto_lote, filas) donde *filas* es un iterador (FilasLote):
+    el archivo se lee en streaming y las filas se obtienen de a una a medida que
+    se consumen, así la memoria no crece con la cantidad de ítems.
+
+    *ruta_excel* puede ser una ruta o un buffer (BytesIO). El formato (xlsx, xlsm,
+    xls, csv) se detecta por la cabecera del archivo salvo que se indique *formato*.
+
+    Título, lote y encabezados se resuelven enseguida (con las primeras filas),
+    de modo que un Excel sin encabezados falla acá y no en medio del PDF.
+    El archivo se cierra al agotar (o descartar) *filas*.
+
+    *max_filas_vacias*: ver MAX_FILAS_VACIAS_SEGUIDAS.
+    """
+    hojas, cerrar = _lector_para(ruta_excel, formato)(ruta_excel)
+    try:
+        nombre, filas_iter = next(iter(hojas))
+        declaradas = getattr(filas_iter, "filas_declaradas", None)
+        titulo_llamado, texto_lote, filas_datos, cols, inicio = _preparar_hoja(filas_iter)
+    except Exception:
+        cerrar()
+        raise
+
+    filas = _generar_filas(
+        filas_datos, cols, al_terminar=cerrar, hoja=nombre, fila_inicio=inicio,
+        filas_declaradas=declaradas, max_filas_vacias=max_filas_vacias,
+    )
+    return titulo_llamado, texto_lote, filas
+
+
+@dataclass
+class GrupoLote:
+    """Ítems de UNA hoja del libro (un lote), con su propio título y texto de lote."""
+    hoja: str
+    titulo_llamado: str
+    texto_lote: str
+    filas: Iterable[FilaItem]
+
+    @property
+    def corte(self) -> Optional[CorteLectura]:
+        """Si la hoja se dejó de leer por filas vacías seguidas (se sabe al agotar *filas*)."""
+        return getattr(self.filas, "corte", None)
+
+
+def iterar_lotes_excel(ruta_excel, formato=None, max_filas_vacias=None):
+    """
+    Recorre TODAS las hojas del libro (en streaming, read-only) y devuelve un
+    generador de GrupoLote: uno por hoja que tenga encabezados reconocibles.
+
+    - Cada hoja detecta su propio título, lote y fila de encabezados.
+    - Las hojas sin encabezados (portadas, notas, etc.) se saltean.
+    - *filas* de cada grupo es un iterador (FilasLote): consumirlo antes de pedir el siguiente
+      grupo. El archivo se cierra al agotar (o descartar) el generador de grupos.
+
+    Si ninguna hoja tiene encabezados, lanza ValueError (igual que la lectura simple).
+    *max_filas_vacias*: ver MAX_FILAS_VACIAS_SEGUIDAS; si una hoja se cortó, queda
+    en GrupoLote.corte al agotar sus filas.
+    """
+    hojas, cerrar = _lector_para(ruta_excel, formato)(ruta_excel, todas=True)
+    try:
+        encontrados = 0
+        for nombre, filas_iter in hojas:
+            declaradas = getattr(filas_iter, "filas_declaradas", None)
+            try:
+                titulo_llamado, texto_lote, filas_datos, cols, inicio = _preparar_hoja(filas_iter)
+            except ValueError:
+                continue
+            encontrados += 1
+            filas = _generar_filas(
+                filas_datos, cols, hoja=nombre, fila_inicio=inicio,
+                filas_declaradas=declaradas, max_filas_vacias=max_filas_vacias,
+            )
+            yield GrupoLote(nombre, titulo_llamado, texto_lote, filas)
+
+        if not encontrados:
+            raise ValueError("No se encontró una fila de encabezados con 'Descripción del Bien'")
+    finally:
+        cerrar()
+
+
+def leer_lotes_excel(ruta_excel, formato=None):
+    """Como iterar_lotes_excel pero con las filas de cada grupo ya leídas (listas)."""
+    return [
+        GrupoLote(g.hoja, g.titulo_llamado, g.texto_lote, list(g.filas))
+        for g in iterar_lotes_excel(ruta_excel, formato)
+    ]
+
+
+def contar_items_por_lote(ruta_excel, formato=None):
+    """
+    Cantidad de ítems válidos de cada lote (hoja con encabezados), en orden, sin
+    match ni render: una lectura en modo solo lectura, con el mismo corte por
+    filas vacías. La usa el planificador de renders (planificador.py) para estimar
+    el costo de un trabajo antes de encolarlo. ValueError si no hay encabezados.
+    """
+    return [sum(1 for _ in g.filas) for g in iterar_lotes_excel(ruta_excel, formato)]
+
+
+def _letras_columna(col):
+    """1 -> b"A", 28 -> b"AB" (referencias de celda del XML de una hoja)."""
+    letras = b""
+    while col > 0:
+        col, resto = divmod(col - 1, 26)
+        letras = bytes([65 + resto]) + letras
+    return letras
+
+
+def _filas_con_valor_xlsx(z, nombre, desde_fila, col):
+    """
+    Filas >= *desde_fila* (1-based) de la hoja *nombre* del zip con algún valor
+    (<v> o texto inline) en la columna *col*, buscando las celdas en el XML sin
+    parsearlo. Si la hoja no trae referencias de celda (r="A1" es opcional en el
+    formato) se cuenta toda fila con valores.
+    """
+    celda = re.compile(rb'<c r="' + _letras_columna(col) + rb'(\d+)"[^>]*?(?<!/)>(.*?)</c>', re.S)
+    n = 0
+    resto = b""
+    with z.open(nombre) as f:
+        while True:
+            bloque = f.read(1 << 16)
+            if not bloque:
+                break
+            partes = (resto + bloque).split(b"</row>")
+            resto = partes.pop()
+            for fila in partes:
+                m = celda.search(fila)
+                if m is not None:
+                    if int(m.group(1)) >= desde_fila and (b"<v>" in m.group(2) or b"<is>" in m.group(2)):
+                        n += 1
+                elif b'<c r="' not in fila and (b"<v>" in fila or b"<is>" in fila):
+                    n += 1
+    return n
+
+
+def estimar_items_por_lote(ruta_excel, formato=None):
+    """
+    Cota superior barata de contar_items_por_lote, para el planificador de renders.
+
+    Recorre las mismas hojas que iterar_lotes_excel y en cada una solo lee las
+    primeras filas (título, lote y encabezados, como _preparar_hoja). Debajo de
+    los encabezados no valida ítems: cuenta las filas con algún valor en la
+    columna Ítem (notas o ítems mal cargados en esa columna también suman).
+
+    - xlsx/xlsm: esas celdas se buscan en el XML de la hoja, sin pasar por openpyxl.
+    - xls / csv: se recorre la columna ya cargada (xlrd / el texto del CSV).
+
+    ValueError si el archivo no se puede abrir o si ninguna hoja tiene encabezados
+    (igual que iterar_lotes_excel).
+    """
+    pos = ruta_excel.tell() if hasattr(ruta_excel, "read") else None
+    hojas, cerrar = _lector_para(ruta_excel, formato)(ruta_excel, todas=True)
+    try:
+        estimados = []
+        for _, filas_iter in hojas:
+            try:
+                _, _, filas_datos, cols, inicio = _preparar_hoja(filas_iter)
+            except ValueError:
+                continue
+            contar = getattr(filas_iter, "contar_con_valor", None)
+            if contar is not None:
+                estimados.append(contar(inicio, cols["item"]))
+            else:
+                estimados.append(sum(1 for f in filas_datos if _celda(f, cols["item"]) is not None))
+    finally:
+        cerrar()
+        if pos is not None:
+            ruta_excel.seek(pos)
+
+    if not estimados:
+        raise ValueError("No se encontró una fila de encabezados con 'Descripción del Bien'")
+    return estimados
+
+
+def filas_desde_registros(registros):
+    """
+    Convierte registros ya estructurados (dicts con los MISMOS campos que produce
+    leer_items_y_descripciones_excel) en FilaItem, aplicando las mismas reglas
+    que la lectura del Excel:
+      - se descartan registros sin ítem válido o sin descripción;
+      - cantidad / precios se convierten con _to_number (acepta números o strings "1.234.567").
+
+    Es un generador (consume *registros* de a uno). Lo usa la API JSON/CSV,
+    que así no necesita pasar por un .xlsx.
+    """
+    for reg in registros:
+        item = reg.get("item")
+        desc = reg.get("descripcion")
 
         if not _es_item_valido(item):
             continue
@@ -221,20 +791,36 @@ def leer_items_y_descripciones_excel(ruta_excel):
         if desc is None or str(desc).strip() == "":
             continue
 
-        unidad = ws.cell(row=fila, column=col_unidad).value if col_unidad else None
-        presentacion = ws.cell(row=fila, column=col_presentacion).value if col_presentacion else None
-        cantidad = ws.cell(row=fila, column=col_cantidad).value if col_cantidad else None
-        precio_unit = ws.cell(row=fila, column=col_precio_unit).value if col_precio_unit else None
-        precio_total = ws.cell(row=fila, column=col_precio_total).value if col_precio_total else None
-
-        filas.append({
-            "item": item,
-            "descripcion": str(desc).strip(),
-            "unidad_medida": str(unidad).strip() if unidad is not None else "",
-            "presentacion": str(presentacion).strip() if presentacion is not None else "",
-            "cantidad": _to_number(cantidad),
-            "precio_unitario_iva_incl": _to_number(precio_unit),
-            "precio_total_iva_incl": _to_number(precio_total),
-        })
+        unidad = reg.get("unidad_medida")
+        presentacion = reg.get("presentacion")
 
-    return titulo_llamado, texto_lote, filas
+        yield FilaItem(
+            item=item,
+            descripcion=str(desc).strip(),
+            unidad_medida=str(unidad).strip() if unidad is not None else "",
+            presentacion=str(presentacion).strip() if presentacion is not None else "",
+            cantidad=_to_number(reg.get("cantidad")),
+            precio_unitario_iva_incl=_to_number(reg.get("precio_unitario_iva_incl")),
+            precio_total_iva_incl=_to_number(reg.get("precio_total_iva_incl")),
+        )
+
+
+def leer_items_y_descripciones_excel(ruta_excel):
+    """
+    Lee el Excel subido por el usuario y devuelve:
+
+      (titulo_llamado, texto_lote, filas)
+
+    filas: lista de FilaItem (modelos.py, compatibles con dict) con:
+        - item
+        - descripcion
+        - unidad_medida
+        - presentacion
+        - cantidad
+        - precio_unitario_iva_incl
+        - precio_total_iva_incl   (IMPORTANTE: es el TOTAL, no el unitario)
+
+    (Materializa en una lista lo que produce iterar_items_y_descripciones_excel.)
+    """
+    titulo_llamado, texto_lote, filas = iterar_items_y_descripciones_excel(ruta_excel)
+    return titulo_llamado, texto_lote, list(filas)
@@ -0,0 +1,160 @@
+"""exportar.py
+
+Exportación del desglose a planilla (.xlsx), en streaming.
+
+- openpyxl en modo write-only: cada fila se escribe y se olvida (no hay celdas
+  en memoria), así la memoria no crece con la cantidad de ítems.
+- Una hoja por lote: título del llamado, texto del lote, encabezados y una fila
+  por ítem con resumen, partes, detalles (calculo.COLUMNAS_CSV) y los textos del
+  match (equipos, mano de obra, materiales, transporte).
+- Las filas salen de los MISMOS CalculoItem que dibuja el PDF: con
+  EscritorXlsx.registrar los ítems se escriben en la planilla a medida que el
+  PDF los consume, y cada ítem se calcula una sola vez (ver generar_pdf_y_xlsx;
+  lo usa /api/desglose?formato=zip vía pool_render.generar_pdf_y_xlsx_desglose).
+- Los textos vienen del usuario (descripción, título, lote): los que empiezan
+  como fórmula (=, +, -, @) se escriben como celdas de texto explícitas, nunca
+  como fórmula.
+"""
+
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import Iterable, Iterator, Union
+
+from calculo import COLUMNAS_CSV, CalculoItem, calcular_filas
+from modelos import CAMPOS_MATCH
+
+# Textos del match (sin tipo_item, que ya está entre las columnas del cálculo).
+COLUMNAS_MATCH = [c for c in CAMPOS_MATCH if c != "tipo_item"]
+
+# COLUMNAS_CSV empieza con "hoja" y "lote": en el .xlsx van como hoja y encabezado.
+COLUMNAS_XLSX = COLUMNAS_CSV[2:] + COLUMNAS_MATCH
+
+# Largo máximo del nombre de una hoja de Excel.
+_MAX_NOMBRE_HOJA = 31
+_INVALIDOS_HOJA = set('[]:*?/\\')
+
+# Inicio de un texto que una planilla puede tomar como fórmula (inyección de fórmulas).
+_INICIO_FORMULA = ("=", "+", "-", "@")
+
+
+def _nombre_hoja(nombre: str, usados: set) -> str:
+    """Nombre válido y único para una hoja (Excel: 31 caracteres, sin []:*?/\\)."""
+    base = "".join("_" if c in _INVALIDOS_HOJA else c for c in str(nombre)).strip() or "Lote"
+    base = base[:_MAX_NOMBRE_HOJA]
+    nombre, n = base, 1
+    while nombre.lower() in usados:
+        n += 1
+        sufijo = f" ({n})"
+        nombre = base[:_MAX_NOMBRE_HOJA - len(sufijo)] + sufijo
+    usados.add(nombre.lower())
+    return nombre
+
+
+def _fila_segura(ws, valores):
+    """*valores* con los textos que empiezan como fórmula convertidos en celdas de texto."""
+    from openpyxl.cell import WriteOnlyCell
+
+    fila = []
+    for v in valores:
+        if isinstance(v, str) and v.startswith(_INICIO_FORMULA):
+            celda = WriteOnlyCell(ws, value=v)
+            celda.data_type = "s"   # openpyxl guardaría "=..." como fórmula
+            v = celda
+        fila.append(v)
+    return fila
+
+
+class EscritorXlsx:
+    """
+    Planilla write-only del desglose, lote por lote:
+
+        escritor = EscritorXlsx()
+        for c in escritor.registrar(hoja, titulo, lote, calcular_filas(filas)):
+            ...                       # c: el mismo CalculoItem (p. ej. para el PDF)
+        escritor.guardar("desglose.xlsx")
+    """
+
+    def __init__(self):
+        from openpyxl import Workbook
+
+        self._wb = Workbook(write_only=True)
+        self._usados: set = set()
+        self._ws = None
+        self._pendiente = None
+        self.items = 0
+
+    def nuevo_lote(self, hoja: str, titulo_llamado: str = "", texto_lote: str = ""):
+        """
+        Las filas siguientes van a una hoja nueva (título, lote y encabezados).
+        La hoja se crea con su primer ítem: un lote vacío no deja hoja.
+        """
+        self._pendiente = (hoja, titulo_llamado, texto_lote)
+
+    def _abrir_hoja(self):
+        hoja, titulo_llamado, texto_lote = self._pendiente or ("Lote", "", "")
+        self._pendiente = None
+        self._ws = self._wb.create_sheet(_nombre_hoja(hoja, self._usados))
+        self._ws.append(_fila_segura(self._ws, [titulo_llamado]))
+        self._ws.append(_fila_segura(self._ws, [texto_lote]))
+        self._ws.append(COLUMNAS_XLSX)
+
+    def agregar(self, calculo: CalculoItem):
+        """Escribe la fila de un ítem en la hoja actual."""
+        if self._ws is None or self._pendiente is not None:
+            self._abrir_hoja()
+        f = calculo.fila
+        self._ws.append(_fila_segura(self._ws, calculo.a_fila_csv() + [getattr(f, c) for c in COLUMNAS_MATCH]))
+        self.items += 1
+
+    def registrar(self, hoja: str, titulo_llamado: str, texto_lote: str,
+                  calculos: Iterable[CalculoItem]) -> Iterator[CalculoItem]:
+        """Abre la hoja del lote y devuelve *calculos* tal cual, escribiendo cada uno al pasar."""
+        self.nuevo_lote(hoja, titulo_llamado, texto_lote)
+        for c in calculos:
+            self.agregar(c)
+            yield c
+
+    def guardar(self, salida: Union[str, Path, io.IOBase, None] = None) -> Union[Path, bytes]:
+        """Guarda en *salida* (ruta o archivo abierto); sin salida devuelve los bytes."""
+        if self._ws is None:
+            self._abrir_hoja()  # un .xlsx necesita al menos una hoja
+        if salida is None:
+            buf = io.BytesIO()
+            self._wb.save(buf)
+            return buf.getvalue()
+        self._wb.save(salida)
+        return Path(salida) if isinstance(salida, (str, Path)) else salida
+
+
+def generar_xlsx(grupos: Iterable, salida=None):
+    """
+    Planilla del desglose de *grupos* (GrupoLote con filas ya pasadas por match).
+    Devuelve (ruta o bytes, cantidad de ítems); ver EscritorXlsx.guardar.
+    """
+    escritor = EscritorXlsx()
+    for g in grupos:
+        for _ in escritor.registrar(g.hoja, g.titulo_llamado, g.texto_lote, calcular_filas(g.filas)):
+            pass
+    return escritor.guardar(salida), escritor.items
+
+
+def generar_pdf_y_xlsx(grupos: Iterable, fecha: str, logo_path=None,
+                       salida_pdf=None, salida_xlsx=None, **opciones_pdf):
+    """
+    PDF y planilla de *grupos* en UNA pasada: cada ítem se calcula una vez y el
+    mismo CalculoItem se escribe en la planilla y se dibuja en el PDF.
+    *opciones_pdf* van a pdf_utils.generar_pdf_lotes. Devuelve (pdf, xlsx).
+    """
+    from excel_utils import GrupoLote
+    from pdf_utils import generar_pdf_lotes
+
+    escritor = EscritorXlsx()
+    grupos_calculados = (
+        GrupoLote(g.hoja, g.titulo_llamado, g.texto_lote,
+                  escritor.registrar(g.hoja, g.titulo_llamado, g.texto_lote, calcular_filas(g.filas)))
+        for g in grupos
+    )
+    pdf = generar_pdf_lotes(grupos_calculados, fecha, logo_path=logo_path, salida=salida_pdf, **opciones_pdf)
+    return pdf, escritor.guardar(salida_xlsx)
@@ -0,0 +1,126 @@
+"""
+gunicorn.conf.py
+
+Configuración de producción:
+
+    gunicorn -c gunicorn.conf.py
+
+Modelo de workers (según la cantidad de CPUs, o forzado con DESGLOSE_MODELO):
+- Generar un desglose es trabajo de CPU (PyMuPDF) que tarda segundos en
+  licitaciones grandes; los hits del cache de resultados y /salud son instantáneos.
+- "gthread" (1-2 CPUs): un proceso con varios hilos que atienden E/S, hits del
+  cache y chequeos de salud; los renders van a un pool de procesos de larga vida
+  (pool_render.py), uno por CPU, ya precargados. Varios renders en hilos del
+  mismo proceso se pelearían por el GIL y por el lock de MuPDF.
+- "sync" (3+ CPUs): un proceso por request, uno por CPU (+1 para cubrir la E/S
+  de subida/descarga). Sin GIL compartido entre renders. El planificador de
+  renders (planificador.py: SJF, envejecimiento, 429) es por worker, así que acá
+  no actúa: cada worker atiende de a un request y siempre lo admite. Para tener
+  SJF y 429 con varias CPUs, DESGLOSE_MODELO=gthread.
+
+Memoria: fitz va acumulando memoria en un proceso de larga vida, así que cada
+worker se recicla después de max_requests (con jitter, para que no se reinicien
+todos juntos).
+
+Precarga (preload_app): la app se importa en el proceso maestro y when_ready
+llama a arranque.precargar (template, match.xlsx, logo por defecto, métricas de
+fuente). Los workers lo heredan por copy-on-write al hacer fork.
+
+Variables de entorno:
+- DESGLOSE_BIND            (default 0.0.0.0:8000)
+- DESGLOSE_MODELO          sync | gthread (default: según CPUs)
+- DESGLOSE_WORKERS         (default: según modelo)
+- DESGLOSE_HILOS           hilos por worker en gthread (default 4, o 2 por proceso de render)
+- DESGLOSE_PROCESOS_RENDER procesos del pool de render por worker (gthread: default
+                           una por CPU; sync: 0, cada worker renderiza en su proceso)
+- DESGLOSE_RENDER_MAX_TAREAS (default 50): renders por proceso del pool antes de reciclarlo
+- DESGLOSE_RENDER_INCREMENTAL (default 0): 1 = reutilizar hojas del cache de páginas
+  (más lento con el cache frío; ver pool_render.py)
+- DESGLOSE_MAX_ESPERA_SEG  (default 120): cola de renders estimada a partir de la cual
+                           se responde 429 + Retry-After (planificador.py; orden SJF con
+                           envejecimiento, costo por hoja de `benchmarks.py costo --guardar`).
+                           Solo con el modelo gthread.
+- DESGLOSE_TIMEOUT_SEG     (default 300): tope por request; una licitación de
+                           ~200 ítems tarda ~5 s en una CPU; el margen cubre
+                           licitaciones de miles de ítems.
+- DESGLOSE_MAX_REQUESTS    (default 200)
+"""
+
+import multiprocessing
+import os
+
+_cpus = multiprocessing.cpu_count()
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("DESGLOSE_BIND", "0.0.0.0:8000")
+
+# ===============================
+# MODELO DE WORKERS
+# ===============================
+_modelo = os.environ.get("DESGLOSE_MODELO", "").strip().lower() or ("gthread" if _cpus <= 2 else "sync")
+
+if _modelo == "gthread":
+    worker_class = "gthread"
+    # Pool de render: app.py lo lee al importarse (con preload_app, en el maestro;
+    # cada worker crea sus procesos con el primer render).
+    os.environ.setdefault("DESGLOSE_PROCESOS_RENDER", str(_cpus))
+    _procesos_render = int(os.environ["DESGLOSE_PROCESOS_RENDER"])
+    threads = int(os.environ.get("DESGLOSE_HILOS", str(max(4, 2 * _procesos_render))))
+    # Con pool, un worker alcanza: los renders no corren en sus hilos.
+    _workers_default = 1 if _procesos_render > 0 else _cpus + 1
+else:
+    worker_class = "sync"
+    threads = 1
+    _workers_default = _cpus + 1
+
+workers = int(os.environ.get("DESGLOSE_WORKERS", str(_workers_default)))
+
+# ===============================
+# RECICLADO Y TIMEOUTS
+# ===============================
+max_requests = int(os.environ.get("DESGLOSE_MAX_REQUESTS", "200"))
+max_requests_jitter = max(1, max_requests // 4)
+
+timeout = int(os.environ.get("DESGLOSE_TIMEOUT_SEG", "300"))
+graceful_timeout = 60
+keepalive = 5
+
+# Heartbeat de los workers en memoria (evita bloqueos si /tmp es un disco lento).
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+# ===============================
+# PRECARGA
+# ===============================
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("DESGLOSE_LOGLEVEL", "info")
+
+
+def when_ready(server):
+    """Proceso maestro, antes de crear los workers: precarga lo compartido."""
+    from app import DEFAULT_LOGO, MATCH_XLSX
+    from arranque import precargar
+
+    tiempos = precargar(MATCH_XLSX, DEFAULT_LOGO)
+    server.log.info("Precarga (%s, %d workers x %d hilos): %s", worker_class, workers, threads, tiempos)
+
+
+def post_fork(server, worker):
+    server.log.info("Worker %s listo (pid %s)", worker.age, worker.pid)
+
+
+def post_worker_init(worker):
+    """Worker listo: arranca sus procesos de render (precargados) antes del primer request."""
+    from app import POOL_RENDER
+
+    POOL_RENDER.calentar()
+
+
+def worker_exit(server, worker):
+    """Al reciclar un worker se apagan también sus procesos de render."""
+    from app import POOL_RENDER
+
+    POOL_RENDER.cerrar()
@@ -0,0 +1,117 @@
+"""
+libros_sinteticos.py
+
+Libros Excel sintéticos (con el mismo formato que las planillas reales del
+portal de contrataciones) para pruebas de carga y de regresión.
+
+- Título del llamado en A1 y texto "Lote..." en A2.
+- Encabezados en la fila 3: Ítem | Código Catálogo | Descripción del Bien |
+  Unidad de Medida | Presentación | Cantidad | Precio unitario | Precio total.
+- Ítems alternados de bienes y "Mano de Obra", con precios en Gs. enteros.
+
+Todo es determinístico a partir de (cantidad de ítems, semilla): el mismo
+pedido produce siempre las mismas celdas, así los resultados de
+una prueba son comparables entre versiones del código.
+"""
+
+from __future__ import annotations
+
+import io
+import random
+from typing import List, Optional, Sequence
+
+ENCABEZADOS = [
+    "Ítem",
+    "Código Catálogo",
+    "Descripción del Bien",
+    "Unidad de Medida",
+    "Presentación",
+    "Cantidad",
+    "Precio unitario (IVA incluído)",
+    "Precio total",
+]
+
+_TRABAJOS = [
+    "CARGA DE GAS REFRIGERANTE POR LITRO PARA",
+    "SOLDADURA POR PÉRDIDA DE GAS",
+    "REBOBINADO DEL MOTOR VENTILADOR",
+    "CAMBIO DE MOTOR COMPRESOR",
+    "CAMBIO DE IRRADIADOR DE CALOR",
+    "LIMPIEZA GENERAL Y MANTENIMIENTO PREVENTIVO",
+    "PROVISIÓN E INSTALACIÓN DE CAPACITOR",
+    "REPARACIÓN DE PLACA ELECTRÓNICA",
+]
+_EQUIPOS = [
+    "A.A TIPO SPLIT DE 12.000 BTU",
+    "A.A TIPO SPLIT DE 18.000 BTU",
+    "A.A TIPO SPLIT DE 24.000 BTU",
+    "A.A TIPO VENTANA DE 12.000 BTU",
+    "A.A TIPO PISO TECHO DE 60.000 BTU",
+]
+_MARCAS = "MARCA: RBD- TOKYO, MIDEA, VCP, CHUNLAN, GOTZE, MATSUI, SPRINGER, MIDAS, CONSUL, CARRIER."
+_UNIDADES = ["Unidad", "Litros", "Metros", "Kilogramos"]
+
+
+def generar_filas(n_items: int, semilla: int = 0) -> List[list]:
+    """Filas de datos (sin encabezados): [item, código, descripción, unidad, presentación, cantidad, pu, total]."""
+    rnd = random.Random(semilla)
+    filas = []
+    for i in range(1, n_items + 1):
+        if i % 2 == 0:
+            desc = "Mano de Obra"
+            codigo = "80111613-9999"
+            unidad = "Unidad"
+        else:
+            desc = f"{rnd.choice(_TRABAJOS)} {rnd.choice(_EQUIPOS)} {_MARCAS}"
+            codigo = "72102305-001"
+            unidad = rnd.choice(_UNIDADES)
+        cantidad = rnd.choice([1, 1, 1, 2, 3, 5, 10])
+        unitario = rnd.randrange(50_000, 3_000_000, 500)
+        filas.append([i, codigo, desc, unidad, "EVENTO", cantidad, unitario, unitario * cantidad])
+    return filas
+
+
+def generar_libro(
+    n_items: int,
+    semilla: int = 0,
+    lotes: int = 1,
+    titulo: str = "Ítems del llamado MANTENIMIENTO DE EQUIPOS DE REFRIGERACIÓN con ID: 000000",
+    tamanos_lotes: Optional[Sequence[int]] = None,
+) -> bytes:
+    """
+    Devuelve los bytes de un .xlsx con *n_items* ítems repartidos en *lotes* hojas
+    (una hoja por lote, cada una con su título, texto de lote y encabezados).
+    Con *tamanos_lotes* se fija la cantidad de ítems de cada hoja.
+    """
+    from openpyxl import Workbook
+
+    if tamanos_lotes is None:
+        base, resto = divmod(n_items, lotes)
+        tamanos_lotes = [base + (1 if k < resto else 0) for k in range(lotes)]
+
+    wb = Workbook(write_only=True)
+    for k, n in enumerate(tamanos_lotes, start=1):
+        ws = wb.create_sheet(f"Lote {k}")
+        ws.append([titulo])
+        ws.append([f"Lote {k}, Contrato Abierto: por Monto. Abastecimiento simultáneo: No"])
+        ws.append(ENCABEZADOS)
+        for fila in generar_filas(n, semilla=semilla * 1000 + k):
+            ws.append(fila)
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def generar_csv(n_items: int, semilla: int = 0) -> bytes:
+    """Mismo contenido que generar_libro (un lote) en CSV separado por ';'."""
+    import csv
+
+    buf = io.StringIO()
+    w = csv.writer(buf, delimiter=";")
+    w.writerow(["Ítems del llamado MANTENIMIENTO DE EQUIPOS DE REFRIGERACIÓN con ID: 000000"])
+    w.writerow(["Lote 1, Contrato Abierto: por Monto. Abastecimiento simultáneo: No"])
+    w.writerow(ENCABEZADOS)
+    for fila in generar_filas(n_items, semilla=semilla * 1000 + 1):
+        w.writerow(fila)
+    return buf.getvalue().encode("utf-8")
@@ -21,12 +21,13 @@ Dependencias:
 from __future__ import annotations
 
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 import re
 import unicodedata
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from openpyxl import load_workbook
+from modelos import FilaItem
 
 
 # ==========================================================
@@ -118,6 +119,8 @@ def _clasificar_item(descripcion: str) -> str:
 
 @dataclass
 class MatchRow:
+    __slots__ = ("descripcion_raw", "descripcion_norm", "tokens", "herramientas", "materiales")
+
     descripcion_raw: str
     descripcion_norm: str
     tokens: List[str]
@@ -136,8 +139,24 @@ def cargar_match_table(path_match_xlsx: Path) -> Tuple[List[MatchRow], MatchRow]
       - Materiales
 
     La fila default se identifica por Descripcion == "DEFAULT" (insensible a mayúsculas).
+
+    La tabla se lee UNA vez por versión del archivo (ruta + mtime + tamaño) y queda
+    en memoria: los requests siguientes no vuelven a abrir el .xlsx. Si se carga en
+    el proceso maestro de gunicorn antes del fork (arranque.precargar), los workers
+    la heredan ya construida. Las listas devueltas se comparten: no modificarlas.
     """
-    wb = load_workbook(path_match_xlsx, data_only=True)
+    p = Path(path_match_xlsx)
+    st = p.stat()
+    return _cargar_match_cache(str(p.resolve()), st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=4)
+def _cargar_match_cache(ruta: str, mtime_ns: int, size: int) -> Tuple[List[MatchRow], MatchRow]:
+    # Import diferido: openpyxl tarda ~100 ms en importarse y no hace falta
+    # para arrancar el servidor ni para servir resultados cacheados.
+    from openpyxl import load_workbook
+
+    wb = load_workbook(ruta, data_only=True)
     ws = wb.active
 
     # Encabezados en la primera fila
@@ -219,31 +238,23 @@ def buscar_mejor_match(descripcion_item: str, rows: List[MatchRow], default_row:
 # API principal: aplicar match a filas
 # ==========================================================
 
-def aplicar_match_a_filas(filas: List[Dict], path_match_xlsx: Path) -> List[Dict]:
+def iterar_match_a_filas(filas: Iterable[Dict], path_match_xlsx: Path) -> Iterator[FilaItem]:
     """
-    Recibe las filas que ya vienen del Excel principal (con item/descripcion/etc)
-    y devuelve una NUEVA lista con campos extra:
+    Versión en streaming de aplicar_match_a_filas.
 
-      - texto_equipos
-      - texto_mano_obra
-      - texto_materiales
-      - texto_transporte
+    Consume *filas* de a una (puede ser un generador) y va devolviendo cada fila
+    como FilaItem con los campos extra. A diferencia de aplicar_match_a_filas, un
+    FilaItem de entrada se completa EN EL LUGAR (no se copia): pensado para filas
+    recién leídas del Excel que no se reutilizan en otro lado. Los dicts se
+    convierten a FilaItem.
 
-    Reglas:
-      - Transporte SIEMPRE: "Transporte terrestre"
-      - Equipos SIEMPRE: desde match.xlsx (si vacío -> "Herramientas de mano")
-      - Mano de obra:
-          * si item == materiales -> vacío
-          * si mano_obra o ambiguo -> "Supervisor, técnicos oficiales y técnicos ayudantes"
-      - Materiales:
-          * si item == mano_obra -> vacío
-          * si materiales o ambiguo -> desde match.xlsx (si vacío -> "Insumos y materiales")
+    La tabla match.xlsx se carga recién al pedir la primera fila.
     """
     rows, default_row = cargar_match_table(path_match_xlsx)
 
-    out: List[Dict] = []
     for fila in filas:
-        desc = str(fila.get("descripcion", "") or "").strip()
+        fila = FilaItem.desde(fila)
+        desc = str(fila.descripcion or "").strip()
 
         mr = buscar_mejor_match(desc, rows, default_row, umbral=0.80)
 
@@ -265,17 +276,37 @@ def aplicar_match_a_filas(filas: List[Dict], path_match_xlsx: Path) -> List[Dict
             texto_mano_obra = "Supervisor, técnicos oficiales y técnicos ayudantes"
             texto_materiales = (mr.materiales or "").strip() or "Insumos y materiales"
 
-        fila2 = dict(fila)
-        fila2["texto_equipos"] = texto_equipos
-        fila2["texto_mano_obra"] = texto_mano_obra
-        fila2["texto_materiales"] = texto_materiales
-        fila2["texto_transporte"] = texto_transporte
+        fila.texto_equipos = texto_equipos
+        fila.texto_mano_obra = texto_mano_obra
+        fila.texto_materiales = texto_materiales
+        fila.texto_transporte = texto_transporte
 
         # NUEVO: guardamos el tipo de ítem para que la lógica de costos
         # (D/E/F/A/B) pueda repartir correctamente el CDT.
         # Valores posibles: "materiales", "mano_obra", "ambiguo".
-        fila2["tipo_item"] = tipo
+        fila.tipo_item = tipo
 
-        out.append(fila2)
+        yield fila
 
-    return out
+
+def aplicar_match_a_filas(filas: List[Dict], path_match_xlsx: Path) -> List[FilaItem]:
+    """
+    Recibe las filas que ya vienen del Excel principal (con item/descripcion/etc)
+    y devuelve una NUEVA lista de FilaItem (copias) con campos extra:
+
+      - texto_equipos
+      - texto_mano_obra
+      - texto_materiales
+      - texto_transporte
+
+    Reglas:
+      - Transporte SIEMPRE: "Transporte terrestre"
+      - Equipos SIEMPRE: desde match.xlsx (si vacío -> "Herramientas de mano")
+      - Mano de obra:
+          * si item == materiales -> vacío
+          * si mano_obra o ambiguo -> "Supervisor, técnicos oficiales y técnicos ayudantes"
+      - Materiales:
+          * si item == mano_obra -> vacío
+          * si materiales o ambiguo -> desde match.xlsx (si vacío -> "Insumos y materiales")
+    """
+    return list(iterar_match_a_filas((FilaItem.desde(fila, copiar=True) for fila in filas), path_match_xlsx))
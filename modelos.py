@@ -0,0 +1,153 @@
+"""
+modelos.py
+
+Registro compacto de un ítem del desglose (una fila del Excel).
+
+Antes cada ítem viajaba como un dict con 12+ claves string y se copiaba entero
+en match_utils. FilaItem usa __slots__ (sin __dict__ por instancia), así:
+- ocupa bastante menos memoria en licitaciones grandes;
+- el acceso por atributo (fila.descripcion) es más rápido que dict.get.
+
+Compatibilidad:
+- FilaItem es un Mapping: fila["descripcion"], fila.get("cantidad"), dict(fila),
+  "item" in fila, etc. siguen funcionando para el código que espera dicts.
+- FilaItem.desde(obj) convierte un dict (o cualquier Mapping) en FilaItem. Las
+  claves que no son campos no se pierden (como con dict(fila)): quedan en
+  fila.extras y se siguen viendo como claves del Mapping. La validación estricta
+  de claves se hace en el borde de la API (excel_utils.filas_desde_registros).
+
+Campos:
+  Del Excel (excel_utils):
+    - item, descripcion, unidad_medida, presentacion, cantidad,
+      precio_unitario_iva_incl, precio_total_iva_incl
+  Del match (match_utils):
+    - texto_equipos, texto_mano_obra, texto_materiales, texto_transporte, tipo_item
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional
+
+
+CAMPOS_EXCEL = (
+    "item",
+    "descripcion",
+    "unidad_medida",
+    "presentacion",
+    "cantidad",
+    "precio_unitario_iva_incl",
+    "precio_total_iva_incl",
+)
+
+CAMPOS_MATCH = (
+    "texto_equipos",
+    "texto_mano_obra",
+    "texto_materiales",
+    "texto_transporte",
+    "tipo_item",
+)
+
+CAMPOS = CAMPOS_EXCEL + CAMPOS_MATCH
+_CAMPOS_SET = frozenset(CAMPOS)
+
+
+class FilaItem(Mapping):
+    """Ítem del desglose con __slots__ y adaptador compatible con dict."""
+
+    # extras: claves que no son campos (dict) o None si no hay ninguna.
+    __slots__ = CAMPOS + ("extras",)
+
+    def __init__(
+        self,
+        item: Any = "",
+        descripcion: str = "",
+        unidad_medida: str = "",
+        presentacion: str = "",
+        cantidad: Optional[float] = None,
+        precio_unitario_iva_incl: Optional[float] = None,
+        precio_total_iva_incl: Optional[float] = None,
+        texto_equipos: str = "",
+        texto_mano_obra: str = "",
+        texto_materiales: str = "",
+        texto_transporte: str = "",
+        tipo_item: str = "ambiguo",
+    ):
+        self.item = item
+        self.descripcion = descripcion
+        self.unidad_medida = unidad_medida
+        self.presentacion = presentacion
+        self.cantidad = cantidad
+        self.precio_unitario_iva_incl = precio_unitario_iva_incl
+        self.precio_total_iva_incl = precio_total_iva_incl
+        self.texto_equipos = texto_equipos
+        self.texto_mano_obra = texto_mano_obra
+        self.texto_materiales = texto_materiales
+        self.texto_transporte = texto_transporte
+        self.tipo_item = tipo_item
+        self.extras = None
+
+    # ------------------------------------------------------
+    # Conversión
+    # ------------------------------------------------------
+
+    @classmethod
+    def desde(cls, obj, copiar: bool = False) -> "FilaItem":
+        """
+        Devuelve *obj* como FilaItem.
+
+        - FilaItem: se devuelve tal cual (o una copia si copiar=True).
+        - Mapping (dict): los campos que falten toman su default; las claves que
+          no son campos se copian a fila.extras.
+        - Otro valor: se usa como descripción (mismo fallback que tenía pdf_utils).
+        """
+        if isinstance(obj, cls):
+            return obj.copia() if copiar else obj
+        if isinstance(obj, Mapping):
+            if _CAMPOS_SET.issuperset(obj):
+                return cls(**obj)
+            fila = cls(**{k: v for k, v in obj.items() if k in _CAMPOS_SET})
+            fila.extras = {k: v for k, v in obj.items() if k not in _CAMPOS_SET}
+            return fila
+        return cls(descripcion=str(obj))
+
+    def copia(self) -> "FilaItem":
+        nueva = FilaItem.__new__(FilaItem)
+        for k in CAMPOS:
+            setattr(nueva, k, getattr(self, k))
+        nueva.extras = dict(self.extras) if self.extras else None
+        return nueva
+
+    def a_dict(self) -> dict:
+        """Solo los campos (sin extras)."""
+        return {k: getattr(self, k) for k in CAMPOS}
+
+    # ------------------------------------------------------
+    # Adaptador tipo dict
+    # ------------------------------------------------------
+
+    def __getitem__(self, clave: str) -> Any:
+        if clave in _CAMPOS_SET:
+            return getattr(self, clave)
+        if self.extras is None:
+            raise KeyError(clave)
+        return self.extras[clave]
+
+    def __setitem__(self, clave: str, valor: Any) -> None:
+        if clave in _CAMPOS_SET:
+            setattr(self, clave, valor)
+        elif self.extras is None:
+            self.extras = {clave: valor}
+        else:
+            self.extras[clave] = valor
+
+    def __iter__(self) -> Iterator[str]:
+        if not self.extras:
+            return iter(CAMPOS)
+        return iter(CAMPOS + tuple(self.extras))
+
+    def __len__(self) -> int:
+        return len(CAMPOS) + (len(self.extras) if self.extras else 0)
+
+    def __repr__(self) -> str:
+        return f"FilaItem({self.a_dict()!r})"
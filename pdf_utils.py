@@ -1,10 +1,20 @@
 import fitz  # PyMuPDF
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from costos_partes import calcular_partes_desde_cdt  # NUEVO: cálculo D/E/F/A+B desde CDT
+from calculo import CalculoItem, calcular_item  # resumen, partes D/E/F/A+B y detalles (sin fitz)
+from cache_utils import CacheLRU, hash_archivo, hash_bytes, version_codigo
+from modelos import FilaItem
 
 TEMPLATE = Path("template_desglose.pdf")
 OUTPUT = Path("output.pdf")
 
+# Cache de hojas ya renderizadas (modo incremental de generar_pdf).
+CACHE_PAGINAS = CacheLRU(Path(__file__).resolve().parent / "cache" / "paginas", max_bytes=256 * 1024 * 1024)
+
 # ===============================
 # CONFIGURACIÓN DE LAYOUT
 # ===============================
@@ -125,10 +135,7 @@ PAD_Y_PARTES = 0
 # - Nunca imprimimos decimales (todo entero).
 # - Nunca imprimimos negativos (clamp >= 0).
 #
-# Porcentajes base (se pueden ajustar fácilmente):
-PCT_CDT = 0.75  # CDT = CU(sin IVA) * 75%
-PCT_GG = 0.14   # GG teórico = CU(sin IVA) * 14%  (luego se ajusta para cuadrar)
-PCT_BEL = 0.10  # Bel teórico = CU(sin IVA) * 10%
+# Los porcentajes base (PCT_CDT, PCT_GG, PCT_BEL) y el cálculo están en calculo.py.
 
 # Coordenadas (vectores) de los números del resumen en el PDF.
 # Son ABSOLUTAS en la página y existen para la tabla de ARRIBA (index 0)
@@ -287,13 +294,8 @@ Y_F_DET_BASE = [
     Y_F_DET_BASE_TOP + DELTA_TABLAS,
 ]
 
-# Parámetros de la generación del detalle (editables)
-DET_A_HORAS_MIN = 2
-DET_A_HORAS_MAX = 10
-
-DET_F_COSTO_UNIT_MIN = 8000
-DET_F_COSTO_UNIT_MAX = 11000
-DET_F_CONSUMO = 0.05
+# Parámetros de la generación del detalle (horas, costo unitario, consumo):
+# ver detalles.py.
 
 
 # ===============================
@@ -333,10 +335,6 @@ Y_B_DET_BASE = [
     Y_B_DET_BASE_TOP + DELTA_TABLAS,
 ]
 
-# Parámetros del detalle B
-DET_B_HORAS_MIN = 1
-DET_B_HORAS_MAX = 3
-
 # ---- E) MATERIALES (detalle) ----
 # Orden de columnas a imprimir:
 #   0: Consumo                      (entero)
@@ -379,167 +377,264 @@ LOGO_MARGIN_RIGHT = 18      # margen derecho (ajustable)
 LOGO_MARGIN_TOP = 14        # margen superior (ajustable)
 
 
-def insertar_texto_autoajustado(page, rect, texto):
-    """
-    Inserta texto respetando:
-    - máximo 3 líneas
-    - tamaño máximo 7.0
-    - tamaño mínimo 4.5
+# ==========================================
+# MÉTRICAS DE FUENTE (helv) Y TEMPLATE EN MEMORIA
+# ==========================================
+# El autoajuste de texto mide cada candidato de tamaño con fitz.get_text_length,
+# que vuelve a recorrer la fuente en cada llamada (cientos por página).
+# Guardamos el avance de cada carácter (a tamaño 1) y sumamos en Python.
+#
+# IMPORTANTE: _ancho_texto reproduce EXACTAMENTE a fitz.get_text_length, incluida
+# una rareza de PyMuPDF: avanza por la cadena según la cantidad de BYTES UTF-8 de
+# cada carácter, así que después de un carácter no ASCII ("ó", "ñ", "°") se saltea
+# el/los siguiente(s). Si se "corrige", cambian los tamaños de letra elegidos y el
+# PDF deja de ser idéntico al de siempre.
 
-    (Esta función la usabas para la descripción: NO TOCAR la lógica.)
-    """
-    MAX_LINEAS = 3
-    FONT_MAX = 7.0
-    FONT_MIN = 4.5
-    PASO = 0.1
+_AVANCES_HELV = {}
 
-    texto = str(texto).strip()
 
-    size = FONT_MAX
-    while size >= FONT_MIN:
-        text_length = fitz.get_text_length(
-            texto,
-            fontname="helv",
-            fontsize=size
-        )
+def _avance_helv(c):
+    a = _AVANCES_HELV.get(c)
+    if a is None:
+        a = fitz.get_text_length(c, fontname="helv", fontsize=1)
+        _AVANCES_HELV[c] = a
+    return a
 
-        alto_linea = size * 1.2
-        lineas_estimadas = (text_length / rect.width) * 1.15
-        alto_maximo = MAX_LINEAS * alto_linea
 
-        if lineas_estimadas * alto_linea <= alto_maximo:
-            page.insert_textbox(
-                rect,
-                texto,
-                fontsize=size,
-                fontname="helv",
-                color=(0, 0, 0),
-                align=fitz.TEXT_ALIGN_LEFT
-            )
-            return size
+def _ancho_texto(texto, fontsize):
+    """Ancho de *texto* en helv a *fontsize* (mismo resultado que fitz.get_text_length)."""
+    w = 0
+    pos = 0
+    n = len(texto)
+    while pos < n:
+        c = texto[pos]
+        w += _avance_helv(c)
+        pos += len(c.encode("utf-8", "surrogatepass"))
+    return w * fontsize
 
-        size -= PASO
 
-    page.insert_textbox(
-        rect,
-        texto,
-        fontsize=FONT_MIN,
-        fontname="helv",
-        color=(0, 0, 0),
-        align=fitz.TEXT_ALIGN_LEFT
-    )
+def precargar_metricas():
+    """Llena la tabla de avances para Latin-1 (todo lo que aparece en las planillas)."""
+    for i in range(32, 256):
+        _avance_helv(chr(i))
+    _metricas_caja()
+    return len(_AVANCES_HELV)
 
-    return FONT_MIN
 
+@lru_cache(maxsize=4)
+def _template_bytes_cache(ruta, mtime_ns, size):
+    return Path(ruta).read_bytes()
 
-def insertar_info_autoajustada(page, rect, texto, max_lineas=2):
-    """
-    Inserta el bloque de info debajo de la fecha (título / unidad+presentación)
-    con autoajuste de fuente para que no se salga de la caja.
 
-    - max_lineas: por defecto 2 (porque pediste 2 líneas: unidad y presentación)
-    - fuente max/min: configurables arriba (FUENTE_INFO_MAX / FUENTE_INFO_MIN)
-    """
-    texto = str(texto).strip()
-    size = FUENTE_INFO_MAX
-    paso = 0.1
+def _template_bytes():
+    """Bytes de TEMPLATE, leídos una vez por versión del archivo (ruta + mtime + tamaño)."""
+    p = Path(TEMPLATE)
+    st = p.stat()
+    return _template_bytes_cache(str(p.resolve()), st.st_mtime_ns, st.st_size)
 
-    while size >= FUENTE_INFO_MIN:
-        # estimación simple: largo en puntos / ancho -> lineas
-        text_length = fitz.get_text_length(texto, fontname="helv", fontsize=size)
-        alto_linea = size * 1.2
-        lineas_estimadas = (text_length / rect.width) * 1.15
-        alto_maximo = max_lineas * alto_linea
 
-        if lineas_estimadas * alto_linea <= alto_maximo:
-            page.insert_textbox(
-                rect,
-                texto,
-                fontsize=size,
-                fontname="helv",
-                color=(0, 0, 0),
-                align=fitz.TEXT_ALIGN_LEFT
-            )
-            return size
+def _abrir_template():
+    """Abre el template desde memoria (sin tocar el disco en cada request)."""
+    return fitz.open("pdf", _template_bytes())
 
-        size -= paso
 
-    page.insert_textbox(
-        rect,
-        texto,
-        fontsize=FUENTE_INFO_MIN,
-        fontname="helv",
-        color=(0, 0, 0),
-        align=fitz.TEXT_ALIGN_LEFT
-    )
+# ==========================================
+# MAQUETADO DE CAJAS DE TEXTO (descripción / info / partes)
+# ==========================================
+# Antes cada caja estimaba las líneas con (ancho del texto / ancho de la caja) * 1.15
+# y probaba insert_textbox bajando 0.1 pt: la estimación no ve dónde se cortan
+# las palabras, así que a veces quedaba lugar sin usar y a veces insert_textbox
+# no entraba (retorna < 0 y NO dibuja). En las cajas de partes era un intento
+# fallido cada dos llamadas; en la descripción y la info, el último intento
+# podía fallar también y el texto no aparecía.
+#
+# Ahora el corte de líneas se calcula EXACTO, con el mismo algoritmo que
+# Shape.insert_textbox (mismos anchos de glifo, mismas sumas y comparaciones),
+# con el ancho de cada palabra en cache. El tamaño se elige por búsqueda
+# binaria entre los mismos candidatos de siempre (máx, máx - 0.1, ...): con
+# letra más chica cada línea admite al menos las mismas palabras, así que
+# "entra" es monótono. Se dibuja UNA vez, con un tamaño que ya se sabe que entra.
+# Si ni el mínimo entra, se dibuja en el mínimo estirando la caja hacia abajo
+# lo justo (el texto se ve, aunque se pase del recuadro del template).
+
+PASO_AUTOAJUSTE = 0.1
+
+# Cache de anchos por palabra (a tamaño 1); se vacía al llegar a este tope.
+MAX_ANCHOS_PALABRA = 50000
+
+_METRICAS_CAJA = None
+_ANCHOS_PALABRA = {}
+
+
+def _metricas_caja():
+    """(anchos de glifo a tamaño 1, ascender, descender) de helv, tal como los usa insert_textbox."""
+    global _METRICAS_CAJA
+    if _METRICAS_CAJA is None:
+        doc = fitz.open()
+        try:
+            xref = doc.new_page().insert_font(fontname="helv")
+            anchos = tuple(w for _, w in doc.get_char_widths(xref, 256))
+        finally:
+            doc.close()
+        fuente = fitz.Font("helv")
+        _METRICAS_CAJA = (anchos, fuente.ascender, fuente.descender)
+    return _METRICAS_CAJA
+
+
+def _ancho_palabra(palabra):
+    """Ancho de *palabra* a tamaño 1, sumado glifo por glifo como insert_textbox."""
+    w = _ANCHOS_PALABRA.get(palabra)
+    if w is None:
+        anchos = _metricas_caja()[0]
+        w = sum([anchos[ord(c)] for c in palabra])
+        if len(_ANCHOS_PALABRA) >= MAX_ANCHOS_PALABRA:
+            _ANCHOS_PALABRA.clear()
+        _ANCHOS_PALABRA[palabra] = w
+    return w
+
+
+def _parrafos_caja(texto):
+    """Líneas de *texto* partidas en palabras, con los mismos reemplazos que insert_textbox."""
+    if max(map(ord, texto), default=0) > 255:
+        texto = "".join(c if ord(c) < 256 else "?" for c in texto)
+    return [linea.expandtabs(1).split(" ") for linea in texto.splitlines()]
+
+
+def _contar_lineas(parrafos, fontsize, ancho):
+    """Líneas que ocupa el texto en una caja de *ancho* (corte de palabras de insert_textbox)."""
+    anchos = _metricas_caja()[0]
+    blen = anchos[32] * fontsize
+    lineas = 0
+    for palabras in parrafos:
+        lineas += 1
+        hay = False
+        rest = ancho
+        for palabra in palabras:
+            pl_w = _ancho_palabra(palabra) * fontsize
+            if rest >= pl_w:
+                hay = True
+                rest -= pl_w + blen
+                continue
 
-    return FUENTE_INFO_MIN
+            if hay:
+                lineas += 1
+            rest = ancho
 
+            if pl_w <= ancho:
+                hay = True
+                rest = ancho - pl_w - blen
+                continue
 
+            # Palabra más larga que la caja: se corta carácter por carácter.
+            lbuff = ""
+            for c in palabra:
+                if _ancho_palabra(lbuff) * fontsize <= ancho - anchos[ord(c)] * fontsize:
+                    lbuff += c
+                else:
+                    lineas += 1
+                    lbuff = c
+            lbuff += " "
+            hay = True
+            rest = ancho - _ancho_palabra(lbuff) * fontsize
+    return lineas
 
 
+def _alto_texto(lineas, fontsize):
+    """Alto que insert_textbox exige para *lineas* líneas de helv a *fontsize*."""
+    _, asc, desc = _metricas_caja()
+    return fontsize * (asc - desc) * lineas - desc * fontsize
 
-def insertar_texto_partes_autoajustado(page, rect, texto):
-    """
-    NUEVO:
-    Inserta texto en cajas chicas (Equipos / Mano de obra / Materiales / Transporte)
-    usando autoajuste similar a la descripción, pero con fuentes más pequeñas.
 
-    - Máximo 3 líneas (por defecto) para que entren frases como
-      "Supervisor, técnicos oficiales y técnicos ayudantes".
-    - NO toca la lógica de la descripción ni la de los números.
+def _entra_en_caja(parrafos, fontsize, rect, max_lineas):
+    lineas = _contar_lineas(parrafos, fontsize, rect.width)
+    return lineas <= max_lineas and _alto_texto(lineas, fontsize) - rect.height <= fitz.EPSILON
+
+
+@lru_cache(maxsize=16)
+def _tamanos_candidatos(font_max, font_min, paso):
+    """Tamaños a probar, de mayor a menor (los mismos floats que el bucle size -= paso)."""
+    tamanos = []
+    size = font_max
+    while size >= font_min:
+        tamanos.append(size)
+        size -= paso
+    return tuple(tamanos)
+
+
+def maquetar_caja(rect, texto, font_max, font_min, max_lineas, paso=PASO_AUTOAJUSTE):
     """
-    MAX_LINEAS = 3
-    FONT_MAX = 6.0
-    FONT_MIN = 3.0
-    PASO = 0.1
+    Tamaño de letra para *texto* en *rect*: el mayor candidato (font_max, font_max - paso, ...)
+    con el que el texto ocupa <= *max_lineas* líneas y entra en el alto de la caja.
 
-    texto = str(texto).strip()
+    Devuelve (tamaño, rect_a_usar): si ni font_min entra, (font_min, rect estirado hacia
+    abajo hasta el alto necesario). Con ese par insert_textbox nunca falla.
+    """
+    parrafos = _parrafos_caja(texto)
+    tamanos = _tamanos_candidatos(font_max, font_min, paso)
+
+    lo, hi = 0, len(tamanos)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _entra_en_caja(parrafos, tamanos[mid], rect, max_lineas):
+            hi = mid
+        else:
+            lo = mid + 1
+    if lo < len(tamanos):
+        return tamanos[lo], rect
 
-    size = FONT_MAX
-    while size >= FONT_MIN:
-        text_length = fitz.get_text_length(texto, fontname="helv", fontsize=size)
-        alto_linea = size * 1.2
-        lineas_estimadas = (text_length / rect.width) * 1.15
-        alto_maximo = MAX_LINEAS * alto_linea
-
-        if lineas_estimadas * alto_linea <= alto_maximo:
-            # insert_textbox puede FALLAR (retorna < 0) si la caja es muy chica.
-            # En ese caso seguimos bajando el tamaño.
-            ret = page.insert_textbox(
-                rect,
-                texto,
-                fontsize=size,
-                fontname="helv",
-                color=(0, 0, 0),
-                align=fitz.TEXT_ALIGN_LEFT
-            )
-            if ret >= 0:
-                return size
+    alto = _alto_texto(_contar_lineas(parrafos, font_min, rect.width), font_min)
+    if alto > rect.height:
+        rect = fitz.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + alto)
+    return font_min, rect
 
-        size -= PASO
 
-    # Último intento con FONT_MIN
-    ret = page.insert_textbox(
+def _insertar_caja_autoajustada(page, rect, texto, font_max, font_min, max_lineas):
+    """maquetar_caja + un solo insert_textbox. Devuelve el tamaño usado."""
+    texto = str(texto).strip()
+    if not texto:
+        return font_max
+    size, rect = maquetar_caja(rect, texto, font_max, font_min, max_lineas)
+    page.insert_textbox(
         rect,
         texto,
-        fontsize=FONT_MIN,
+        fontsize=size,
         fontname="helv",
         color=(0, 0, 0),
         align=fitz.TEXT_ALIGN_LEFT
     )
+    return size
 
-    # Si todavía falla, usamos insert_text (no depende del alto de la caja).
-    if ret < 0:
-        page.insert_text(
-            (rect.x0, rect.y0 + FONT_MIN),
-            texto,
-            fontsize=FONT_MIN,
-            fontname="helv",
-            color=(0, 0, 0)
-        )
 
-    return FONT_MIN
+def insertar_texto_autoajustado(page, rect, texto):
+    """
+    Inserta la descripción del ítem (ver MAQUETADO DE CAJAS DE TEXTO):
+    - máximo 3 líneas
+    - tamaño máximo 7.0
+    - tamaño mínimo 4.5
+    """
+    return _insertar_caja_autoajustada(page, rect, texto, 7.0, 4.5, max_lineas=3)
+
+
+def insertar_info_autoajustada(page, rect, texto, max_lineas=2):
+    """
+    Inserta el bloque de info debajo de la fecha (título / unidad+presentación)
+    con autoajuste de fuente para que no se salga de la caja.
+
+    - max_lineas: por defecto 2 (porque pediste 2 líneas: unidad y presentación)
+    - fuente max/min: configurables arriba (FUENTE_INFO_MAX / FUENTE_INFO_MIN)
+    """
+    return _insertar_caja_autoajustada(page, rect, texto, FUENTE_INFO_MAX, FUENTE_INFO_MIN, max_lineas)
+
+
+def insertar_texto_partes_autoajustado(page, rect, texto):
+    """
+    Inserta texto en cajas chicas (Equipos / Mano de obra / Materiales / Transporte)
+    con el mismo autoajuste que la descripción, pero con fuentes más pequeñas.
+
+    - Máximo 3 líneas para que entren frases como
+      "Supervisor, técnicos oficiales y técnicos ayudantes".
+    """
+    return _insertar_caja_autoajustada(page, rect, texto, 6.0, 3.0, max_lineas=3)
 
 
 def insertar_texto_una_linea_autofit(page, x0, y_baseline, ancho, texto, font_max, font_min, centrado=True):
@@ -557,7 +652,7 @@ def insertar_texto_una_linea_autofit(page, x0, y_baseline, ancho, texto, font_ma
 
     size = font_max
     while size >= font_min:
-        w = fitz.get_text_length(texto, fontname="helv", fontsize=size)
+        w = _ancho_texto(texto, size)
         if w <= ancho:
             x = x0 + (ancho - w) / 2 if centrado else x0
             page.insert_text(
@@ -571,7 +666,7 @@ def insertar_texto_una_linea_autofit(page, x0, y_baseline, ancho, texto, font_ma
         size -= paso
 
     # Último intento con font_min
-    w = fitz.get_text_length(texto, fontname="helv", fontsize=font_min)
+    w = _ancho_texto(texto, font_min)
     x = x0 + (ancho - w) / 2 if centrado and w <= ancho else x0
     page.insert_text(
         (x, y_baseline),
@@ -597,33 +692,58 @@ def insertar_lote(page, y_base, texto_lote):
     )
 
 
-def insertar_logo_en_pagina(page, logo_path):
+@lru_cache(maxsize=32)
+def _cargar_logo_cache(ruta, mtime_ns, size):
+    datos = Path(ruta).read_bytes()
+    pix = fitz.Pixmap(datos)
+    img_w, img_h = float(pix.width), float(pix.height)
+    pix = None  # liberar
+    return datos, img_w, img_h
+
+
+def _cargar_logo(logo_path):
+    """
+    Cache de logos: devuelve (bytes, ancho, alto) del logo, decodificándolo UNA vez
+    por archivo (y no una vez por página). La clave incluye mtime/tamaño, así un
+    archivo modificado se vuelve a leer.
+
+    Los logos subidos se guardan deduplicados por contenido (upload_utils.AlmacenUploads),
+    por lo que el mismo logo tiene siempre la misma ruta y este cache se comparte
+    entre requests.
+    """
+    p = Path(logo_path)
+    st = p.stat()
+    return _cargar_logo_cache(str(p.resolve()), st.st_mtime_ns, st.st_size)
+
+
+def insertar_logo_en_pagina(page, logo_path, xref=0):
     """Inserta el logo en la esquina superior derecha de la página.
 
+    Devuelve el xref de la imagen en el documento (0 si no se insertó), para pasarlo
+    en las páginas siguientes del MISMO documento.
+
     IMPORTANTE:
     - Mantiene SIEMPRE las proporciones originales del logo (sin distorsión).
     - LOGO_W/LOGO_H representan un *bounding box* máximo. LOGO_SCALE permite agrandarlo.
     - El logo se ancla por la esquina superior derecha (márgenes constantes).
     """
     if not logo_path:
-        return
+        return 0
 
     try:
         p = Path(logo_path)
         if not p.exists():
-            return
+            return 0
 
         # Bounding box máximo (con escala)
         max_w = LOGO_W * LOGO_SCALE
         max_h = LOGO_H * LOGO_SCALE
 
         # Tamaño real de la imagen (para mantener proporciones)
-        pix = fitz.Pixmap(str(p))
-        img_w, img_h = float(pix.width), float(pix.height)
-        pix = None  # liberar
+        datos, img_w, img_h = _cargar_logo(p)
 
         if img_w <= 0 or img_h <= 0:
-            return
+            return 0
 
         ratio = img_w / img_h
 
@@ -643,24 +763,16 @@ def insertar_logo_en_pagina(page, logo_path):
         x0 = x1 - w
         y1 = y0 + h
 
-        page.insert_image(
+        # Si el logo ya está en el documento (xref), se referencia la MISMA imagen
+        # en vez de volver a pasarle los bytes a PyMuPDF en cada página.
+        return page.insert_image(
             fitz.Rect(x0, y0, x1, y1),
-            filename=str(p),
+            stream=None if xref else datos,
+            xref=xref,
         )
     except Exception:
         # Si el logo no se puede insertar por algún motivo, no rompemos la generación.
-        return
-
-
-def _round_half_up(x):
-    """
-    Emula el redondeo típico de Excel (ROUND) para 0 decimales,
-    evitando el "bankers rounding" de Python.
-
-    Retorna int.
-    """
-    from decimal import Decimal, ROUND_HALF_UP
-    return int(Decimal(str(x)).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+        return 0
 
 
 def _clamp_nonneg_int(x):
@@ -715,72 +827,38 @@ def _insertar_texto_derecha(page, x_right, y, texto, fontsize=8):
     Inserta texto alineado a la derecha, usando insert_text (robusto y consistente).
     """
     texto = str(texto)
-    ancho = fitz.get_text_length(texto, fontname="helv", fontsize=fontsize)
+    ancho = _ancho_texto(texto, fontsize)
     x = x_right - ancho
     page.insert_text((x, y), texto, fontsize=fontsize, fontname="helv", color=(0, 0, 0))
 
 
-def _insertar_detalles_a_y_f(page, tabla_index, seed_int, partes):
+def _insertar_detalles_a_y_f(page, tabla_index, detalles):
     """
     Inserta los detalles de:
       - A) Equipos: horas / costo por hora / costo total (repite total A)
       - F) Transporte: dtm / consumo / costo unit / costo total (repite total F)
 
+    *detalles*: tabla de detalles.calcular_detalles.
+
     No modifica ni interfiere con:
       - Resumen (CDT..CU+IVA)
       - Partes (A+B, D, E, F) ni Totales A/B ya impresos
       - Textos de match (equipos/mano obra/materiales/transporte)
     """
-    import random
-
-    rng = random.Random(int(seed_int) if seed_int is not None else 0)
-
-    total_a = _clamp_nonneg_int(partes.get("A", 0))
-    total_f = _clamp_nonneg_int(partes.get("F", 0))
-
-    # -------------------------
-    # A) Equipos (detalle)
-    # -------------------------
-    # Elegimos horas entre 2 y 10 (inclusive). Para que quede prolijo, si existe un divisor
-    # en ese rango lo preferimos (así total_a / horas queda exacto).
-    horas_candidates = [h for h in range(DET_A_HORAS_MIN, DET_A_HORAS_MAX + 1) if h > 0 and total_a % h == 0]
-    if horas_candidates:
-        horas = rng.choice(horas_candidates)
-    else:
-        horas = rng.randint(DET_A_HORAS_MIN, DET_A_HORAS_MAX)
-
-    horas = _clamp_nonneg_int(horas) if horas > 0 else 1
-
-    # Costo por hora (entero) derivado del total
-    costo_hora = 0
-    if horas > 0:
-        costo_hora = _clamp_nonneg_int(total_a // horas)
-
-    # Repetimos total A en la columna "Costo Total Horario Gs."
+    horas, costo_hora, total_a = detalles["A"]
     y_a = Y_A_DET_BASE[tabla_index]
     _insertar_texto_derecha(page, X_A_DET_RIGHTS[0], y_a, _format_gs(horas), fontsize=8)
     _insertar_texto_derecha(page, X_A_DET_RIGHTS[1], y_a, _format_gs(costo_hora), fontsize=8)
     _insertar_texto_derecha(page, X_A_DET_RIGHTS[2], y_a, _format_gs(total_a), fontsize=8)
 
-    # -------------------------
-    # F) Transporte (detalle)
-    # -------------------------
-    consumo = float(DET_F_CONSUMO)
-    costo_unit = rng.randint(DET_F_COSTO_UNIT_MIN, DET_F_COSTO_UNIT_MAX)
-    costo_unit = _clamp_nonneg_int(costo_unit) if costo_unit > 0 else DET_F_COSTO_UNIT_MIN
-
-    denom = consumo * float(costo_unit)
-    dtm = 0.0
-    if denom > 0:
-        dtm = float(total_f) / denom
-
+    dtm, consumo, costo_unit, total_f = detalles["F"]
     y_f = Y_F_DET_BASE[tabla_index]
     _insertar_texto_derecha(page, X_F_DET_RIGHTS[0], y_f, _format_float_coma(dtm, 2), fontsize=8)
     _insertar_texto_derecha(page, X_F_DET_RIGHTS[1], y_f, _format_float_coma(consumo, 2), fontsize=8)
     _insertar_texto_derecha(page, X_F_DET_RIGHTS[2], y_f, _format_gs(costo_unit), fontsize=8)
     _insertar_texto_derecha(page, X_F_DET_RIGHTS[3], y_f, _format_gs(total_f), fontsize=8)
 
-def _insertar_detalles_b_y_e(page, tabla_index, seed_int, partes, cantidad_excel):
+def _insertar_detalles_b_y_e(page, tabla_index, detalles):
     """Inserta los detalles de:
 
     - B) Mano de obra (solo si total_B > 0)
@@ -794,124 +872,27 @@ def _insertar_detalles_b_y_e(page, tabla_index, seed_int, partes, cantidad_excel
         * Costo unitario (Gs) = total_E / consumo
         * Costo total unitario (Gs) = total_E (se repite)
 
+    *detalles*: tabla de detalles.calcular_detalles.
+
     Importante:
     - No imprime nada si la parte no corresponde (fila vacía en el PDF).
     - No usa decimales (todo entero).
     """
-    import random
-
-    rng = random.Random((int(seed_int) if seed_int is not None else 0) + 1337)
-
-    total_b = _clamp_nonneg_int(partes.get("B", 0))
-    total_e = _clamp_nonneg_int(partes.get("E", 0))
-
-    # Cantidad (Excel). La usamos para Mano de obra y también como Consumo en Materiales.
-    try:
-        qty = _round_half_up(cantidad_excel) if cantidad_excel is not None else 0
-    except Exception:
-        qty = 0
-    qty = _clamp_nonneg_int(qty)
-    if qty <= 0:
-        qty = 1
-
-    # -------------------------
-    # B) Mano de obra (detalle)
-    # -------------------------
-    if total_b > 0:
-        # Preferimos horas que den división exacta si existen
-        horas_candidates = [
-            h for h in range(DET_B_HORAS_MIN, DET_B_HORAS_MAX + 1)
-            if h > 0 and (qty * h) > 0 and (total_b % (qty * h) == 0)
-        ]
-        if horas_candidates:
-            horas = rng.choice(horas_candidates)
-        else:
-            horas = rng.randint(DET_B_HORAS_MIN, DET_B_HORAS_MAX)
-
-        horas = _clamp_nonneg_int(horas) if horas > 0 else 1
-        denom = qty * horas
-        if denom <= 0:
-            denom = 1
-
-        costo = _clamp_nonneg_int(_round_half_up(total_b / denom))
-        if costo <= 0 and total_b > 0:
-            costo = 1
-
+    if detalles["B"] is not None:
+        qty, horas, costo, total_b = detalles["B"]
         y_b = Y_B_DET_BASE[tabla_index]
         _insertar_texto_derecha(page, X_B_DET_RIGHTS[0], y_b, str(qty), fontsize=8)
         _insertar_texto_derecha(page, X_B_DET_RIGHTS[1], y_b, str(horas), fontsize=8)
         _insertar_texto_derecha(page, X_B_DET_RIGHTS[2], y_b, _format_gs(costo), fontsize=8)
         _insertar_texto_derecha(page, X_B_DET_RIGHTS[3], y_b, _format_gs(total_b), fontsize=8)
 
-    # -------------------------
-    # E) Materiales (detalle)
-    # -------------------------
-    if total_e > 0:
-        consumo = qty if qty > 0 else 1
-        costo_unit = _clamp_nonneg_int(_round_half_up(total_e / consumo)) if consumo > 0 else total_e
-        if costo_unit <= 0 and total_e > 0:
-            costo_unit = 1
-
+    if detalles["E"] is not None:
+        consumo, costo_unit, total_e = detalles["E"]
         y_e = Y_E_DET_BASE[tabla_index]
         _insertar_texto_derecha(page, X_E_DET_RIGHTS[0], y_e, str(consumo), fontsize=8)
         _insertar_texto_derecha(page, X_E_DET_RIGHTS[1], y_e, _format_gs(costo_unit), fontsize=8)
         _insertar_texto_derecha(page, X_E_DET_RIGHTS[2], y_e, _format_gs(total_e), fontsize=8)
 
-def _calcular_resumen_desde_total(total_iva_incl):
-    """
-    Construye los valores del resumen desde el TOTAL (IVA incluido).
-
-    Devuelve dict:
-        {
-          "CDT": ...,
-          "GG": ...,
-          "BEL": ...,
-          "CU": ...,
-          "IVA": ...,
-          "CU_IVA": ...
-        }
-
-    Nota:
-    - No se imprimen decimales.
-    - No se permiten negativos.
-    - GG se ajusta (Opción A) para que CU = CDT + GG + BEL, donde CU = (CU+IVA) - IVA.
-    """
-    if total_iva_incl is None:
-        total_iva_incl = 0
-
-    # Total IVA incluido (entero)
-    cu_iva = _round_half_up(total_iva_incl)
-
-    # IVA y CU (sin IVA)
-    iva = _round_half_up(cu_iva / 11)
-    cu = cu_iva - iva
-
-    # Evitar negativos por cualquier motivo (aunque no debería)
-    iva = _clamp_nonneg_int(iva)
-    cu = _clamp_nonneg_int(cu)
-
-    # CDT y Bel teórico (sobre CU sin IVA)
-    cdt = _round_half_up(cu * PCT_CDT)
-    bel = _round_half_up(cu * PCT_BEL)
-
-    # Clamps para evitar pasar CU por redondeos
-    cdt = min(_clamp_nonneg_int(cdt), cu)
-    bel = min(_clamp_nonneg_int(bel), cu - cdt)
-
-    # Opción A (simplificada): GG absorbe el ajuste para que cierre
-    gg = cu - cdt - bel
-    gg = _clamp_nonneg_int(gg)
-
-    return {
-        "CDT": cdt,
-        "GG": gg,
-        "BEL": bel,          # en el template figura como "Impuestos y retenciones"
-        "CU": cdt + gg + bel,
-        "IVA": iva,
-        "CU_IVA": cu_iva,
-    }
-
-
 def _insertar_numero_resumen(page, tabla_index, fila_index, valor):
     """
     Inserta un número del resumen en el PDF usando los vectores:
@@ -927,7 +908,7 @@ def _insertar_numero_resumen(page, tabla_index, fila_index, valor):
     y = Y_RESUMEN_BASE[tabla_index][fila_index]
 
     # Alineación a la derecha: calculamos ancho y ubicamos el inicio.
-    ancho = fitz.get_text_length(texto, fontname="helv", fontsize=8)
+    ancho = _ancho_texto(texto, 8)
     x = x_right - ancho
 
     page.insert_text(
@@ -954,7 +935,7 @@ def _insertar_numero_partes(page, tabla_index, fila_index, valor):
     x_right = X_PARTES_RIGHTS[fila_index]
     y = Y_PARTES_BASE[tabla_index][fila_index]
 
-    ancho = fitz.get_text_length(texto, fontname="helv", fontsize=8)
+    ancho = _ancho_texto(texto, 8)
     x = x_right - ancho
 
     page.insert_text(
@@ -978,7 +959,7 @@ def _insertar_numero_ab_totales(page, tabla_index, fila_index, valor):
     x_right = X_AB_TOTALES_RIGHTS[fila_index]
     y = Y_AB_TOTALES_BASE[tabla_index][fila_index]
 
-    ancho = fitz.get_text_length(texto, fontname="helv", fontsize=8)
+    ancho = _ancho_texto(texto, 8)
     x = x_right - ancho
 
     page.insert_text(
@@ -989,253 +970,454 @@ def _insertar_numero_ab_totales(page, tabla_index, fila_index, valor):
         color=(0, 0, 0)
     )
 
-def generar_pdf(filas, fecha, titulo_llamado="", texto_lote="", logo_path=None):
-    """
-    Genera un PDF usando el template existente.
-    Coloca 2 ítems por hoja.
 
-    - Solo imprimimos filas válidas (excel_utils filtra por item).
-    - Si la cantidad total es impar, la última hoja debe mostrar SOLO una tabla:
-      => Opción B: tapar visualmente la tabla inferior.
+# ===============================
+# TEMPLATE COMO FORM XOBJECT
+# ===============================
+# insert_pdf copia en cada hoja el contenido del template y sus recursos
+# (las dos Calibri embebidas: ~50 KB por hoja antes de deduplicar). Con
+# PLANTILLA_COMO_XOBJECT cada hoja es una página en blanco del mismo tamaño que
+# dibuja el template con show_pdf_page: PyMuPDF copia la página del template UNA
+# vez por documento como Form XObject y cada hoja solo lo referencia. El texto
+# de los ítems se dibuja encima, igual que antes.
 
-    Bloque debajo de fecha:
-    - Debajo de la fecha (y en el bloque superior de cada tabla), imprimimos:
-        * Izquierda: título del llamado (desde el Excel, fila 1)
-        * Derecha: 'Unidad de medida' y 'Presentación' (por cada ítem)
-      Las coordenadas quedan arriba como constantes para que puedas ajustarlas fácil.
+PLANTILLA_COMO_XOBJECT = True
 
-    NUEVO:
-    - Imprime los valores del resumen desde CDT hasta CU+IVA en ambas tablas.
-      (Se calcula desde el TOTAL IVA incluido del Excel).
 
-    NUEVO (encabezado):
-    - Texto de "Lote" (una sola línea) en la 2da fila de cada tabla.
-    - Logo en esquina superior derecha de cada página (default o subido por usuario).
+def _nueva_pagina(doc, template_doc, logo_path, logos=None):
     """
-    template_doc = fitz.open(TEMPLATE)
-    doc = fitz.open()
+    Agrega al documento una hoja con el template (y el logo) y la devuelve.
 
-    total = len(filas)
+    *logos*: dict logo_path -> xref, propio de *doc*. Si se pasa, la imagen del logo
+    se escribe en la primera página y las demás la referencian (una sola copia).
+    """
+    if PLANTILLA_COMO_XOBJECT:
+        base = template_doc[0]
+        page = doc.new_page(width=base.rect.width, height=base.rect.height)
+        page.show_pdf_page(page.rect, template_doc, 0)
+    else:
+        doc.insert_pdf(template_doc, from_page=0, to_page=0)
+        page = doc[-1]
+    # Logo: se inserta UNA VEZ por página (al crearla)
+    if logos is None:
+        insertar_logo_en_pagina(page, logo_path)
+    else:
+        logos[logo_path] = insertar_logo_en_pagina(page, logo_path, xref=logos.get(logo_path, 0))
+    return page
 
-    for i, fila in enumerate(filas):
 
-        # Esperamos dict:
-        #   {"item": ..., "descripcion": "...", "unidad_medida": "...", "presentacion": "...",
-        #    "cantidad": ..., "precio_unitario_iva_incl": ..., "precio_total_iva_incl": ...}
-        if isinstance(fila, dict):
-            texto = fila.get("descripcion", "")
-            numero_item = fila.get("item", "")
-            unidad_medida = fila.get("unidad_medida", "")
-            presentacion = fila.get("presentacion", "")
-        else:
-            # fallback por si llega algo inesperado
-            texto = str(fila)
-            numero_item = ""
-            unidad_medida = ""
-            presentacion = ""
+# ===============================
+# EMISIÓN DE TEXTO POR PÁGINA
+# ===============================
+# Cada page.insert_text / insert_textbox crea su propio Shape y lo "commitea":
+# un stream de contenido nuevo por llamada (~70 por hoja) y, en cada uno,
+# page.wrap_contents() vuelve a recorrer TODO el contenido de la página para
+# balancear q/Q. Era más de la mitad del tiempo de render.
+#
+# Con TEXTO_POR_PAGINA todos los textos de una hoja se escriben en UN Shape
+# (page.new_shape) que se commitea una vez: un solo stream, un solo recurso
+# /helv. Shape.insert_text / insert_textbox son las mismas funciones que usan
+# los métodos de Page (mismo corte de líneas, mismas posiciones, mismo
+# "no dibujar si no entra"), así que la salida es idéntica; solo cambia cuántos
+# streams tiene la página. Las funciones insertar_* reciben indistintamente
+# una Page o un Shape ("lienzo").
 
-        posicion_en_hoja = i % 2
+TEXTO_POR_PAGINA = True
 
-        if posicion_en_hoja == 0:
-            doc.insert_pdf(template_doc, from_page=0, to_page=0)
-            page = doc[-1]
-            # Logo: se inserta UNA VEZ por página (al crearla)
-            insertar_logo_en_pagina(page, logo_path)
-        else:
-            page = doc[-1]
 
-        y = Y_POSICIONES[posicion_en_hoja]
+def _lienzo(page):
+    """Destino de los textos de *page*: un Shape compartido (o la página misma)."""
+    return page.new_shape() if TEXTO_POR_PAGINA else page
 
-        # -------------------------------
-        # FECHA (como ya te funciona)
-        # -------------------------------
-        AJUSTE_BASELINE = 17
 
-        page.insert_text(
-            (X_FECHA, y + AJUSTE_BASELINE),
-            fecha,
-            fontsize=8,
-            fontname="helv",
-            color=(0, 0, 0)
-        )
+def _volcar(lienzo):
+    """Escribe en la página lo acumulado en el lienzo (no hace nada si es la página)."""
+    if isinstance(lienzo, fitz.Shape):
+        lienzo.commit()
 
-        # -------------------------------
-        # N° ÍTEM
-        # - Misma Y que la fecha (y + AJUSTE_BASELINE)
-        # - Ceros a la izquierda si es numérico: 1->001, 12->012, 101->101
-        # -------------------------------
-        item_txt = str(numero_item).strip()
-        if item_txt.isdigit():
-            item_txt = item_txt.zfill(3)
-
-        page.insert_text(
-            (X_ITEM, y + AJUSTE_BASELINE),
-            item_txt,
-            fontsize=8,
-            fontname="helv",
-            color=(0, 0, 0)
-        )
 
-        # ---------------------------------------------
-        # NUEVO: TEXTO "LOTE" (una sola línea)
-        # ---------------------------------------------
-        # Se imprime en la 2da fila de cada tabla. Si no entra, se reduce la fuente.
-        insertar_lote(page, y, texto_lote)
-
-        # ---------------------------------------------
-        # NUEVO: NÚMEROS DEL RESUMEN (CDT..CU+IVA)
-        # ---------------------------------------------
-        # El monto base que usamos es el TOTAL (IVA incluido): "Precio total".
-        # Si por alguna razón no viniera, intentamos reconstruirlo con:
-        #   (precio_unitario_iva_incl * cantidad)
-        total_iva_incl = None
-        if isinstance(fila, dict):
-            total_iva_incl = fila.get("precio_total_iva_incl", None)
-            if total_iva_incl is None:
-                pu = fila.get("precio_unitario_iva_incl", None)
-                qty = fila.get("cantidad", None)
-                if pu is not None and qty is not None:
-                    total_iva_incl = pu * qty
-
-        resumen = _calcular_resumen_desde_total(total_iva_incl)
-
-        # Posición en hoja: 0 = tabla de arriba, 1 = tabla de abajo
-        tabla_index = posicion_en_hoja
-
-        # Insertar todos los valores del resumen usando vectores de coordenadas
-        for idx_fila, key in enumerate(RESUMEN_FILAS):
-            _insertar_numero_resumen(page, tabla_index, idx_fila, resumen.get(key, 0))
-
-        # ---------------------------------------------
-        # NUEVO: D / E / F (y A+B) a partir del CDT
-        # ---------------------------------------------
-        # NOTA IMPORTANTE:
-        # - No tocamos la lógica del resumen (ya funciona).
-        # - Solo usamos el CDT ya calculado y el tipo de ítem (match_utils) para repartir.
-        # - Herramientas / Transporte son textos (se imprimen siempre) y NO dependen de estos números.
-        tipo_item = "ambiguo"
-        if isinstance(fila, dict):
-            tipo_item = fila.get("tipo_item", "ambiguo")
-
-        partes = calcular_partes_desde_cdt(resumen.get("CDT", 0), tipo_item)
-
-        # Insertamos: (A+B), D, E, F (en ambas tablas)
-        valores_partes = [
-            partes.get("AB", 0),
-            partes.get("D", 0),
-            partes.get("E", 0),
-            partes.get("F", 0),
-        ]
-        for idx_parte, val in enumerate(valores_partes):
-            _insertar_numero_partes(page, tabla_index, idx_parte, val)
+def _tapar_segunda_tabla(page):
+    """Opción B: rectángulo blanco cubriendo desde TAPAR_Y0 hasta el final de la página."""
+    page.draw_rect(
+        fitz.Rect(0, TAPAR_Y0, page.rect.width, page.rect.height),
+        color=(1, 1, 1),
+        fill=(1, 1, 1)
+    )
 
-        # NUEVO: Totales A) y B) (filas propias)
-        valores_ab = [
-            partes.get("A", 0),
-            partes.get("B", 0),
-        ]
-        for idx_ab, val in enumerate(valores_ab):
-            _insertar_numero_ab_totales(page, tabla_index, idx_ab, val)
-
-        # ---------------------------------------------
-        # NUEVO: DETALLE DE A (Equipos) Y F (Transporte)
-        # ---------------------------------------------
-        # Usamos un seed estable por ítem para que los aleatorios sean REPRODUCIBLES.
-        if item_txt.isdigit():
-            seed_int = int(item_txt)
-        else:
-            seed_int = abs(hash(str(texto))) % 1000000
-
-        _insertar_detalles_a_y_f(page, tabla_index, seed_int, partes)
-
-        # ---------------------------------------------
-        # NUEVO: DETALLE DE B (Mano de obra) Y E (Materiales)
-        # ---------------------------------------------
-        cantidad_excel = None
-        if isinstance(fila, dict):
-            cantidad_excel = fila.get("cantidad", None)
-
-        _insertar_detalles_b_y_e(page, tabla_index, seed_int, partes, cantidad_excel)
-
-
-        # ---------------------------------------------
-        # BLOQUE DE INFO (debajo de fecha)
-        # ---------------------------------------------
-        # Izquierda: título del llamado (mismo para todos los ítems)
-        if titulo_llamado:
-            rect_llamado = fitz.Rect(
-                X_LLAMADO,
-                y + Y_LLAMADO_OFFSET,
-                X_LLAMADO + ANCHO_LLAMADO,
-                y + Y_LLAMADO_OFFSET + ALTO_LLAMADO
-            )
-            insertar_info_autoajustada(
-                page,
-                rect_llamado,
-                str(titulo_llamado).strip(),
-                max_lineas=2
-            )
 
-        # Derecha: Unidad de medida + Presentación (por ítem)
-        texto_info = (
-            f"Unidad de medida: {str(unidad_medida).strip()}\n"
-            f"Presentación: {str(presentacion).strip()}"
-        )
+def _renderizar_item(page, fila, posicion_en_hoja, fecha, titulo_llamado="", texto_lote=""):
+    """
+    Imprime UN ítem en la tabla indicada de la página
+    (posicion_en_hoja: 0 = tabla de arriba, 1 = tabla de abajo).
 
-        rect_info = fitz.Rect(
-            X_UNI_PRES,
-            y + Y_UNI_PRES_OFFSET,
-            X_UNI_PRES + ANCHO_UNI_PRES,
-            y + Y_UNI_PRES_OFFSET + ALTO_UNI_PRES
-        )
+    *page* puede ser la Page o el lienzo (Shape) de la hoja: ver _lienzo.
+    """
+    # Esperamos FilaItem (modelos.py) o un CalculoItem ya calculado (calculo.py, p. ej.
+    # el mismo que se exporta a la planilla). Si llega un dict (u otra cosa) lo convertimos:
+    # así el resto de la función usa acceso por atributo, sin .get ni isinstance.
+    calculo = fila if isinstance(fila, CalculoItem) else calcular_item(fila)
+    fila = calculo.fila
+    texto = fila.descripcion
+    numero_item = fila.item
+    unidad_medida = fila.unidad_medida
+    presentacion = fila.presentacion
+
+    y = Y_POSICIONES[posicion_en_hoja]
+
+    # -------------------------------
+    # FECHA (como ya te funciona)
+    # -------------------------------
+    AJUSTE_BASELINE = 17
 
-        insertar_info_autoajustada(page, rect_info, texto_info, max_lineas=2)
+    page.insert_text(
+        (X_FECHA, y + AJUSTE_BASELINE),
+        fecha,
+        fontsize=8,
+        fontname="helv",
+        color=(0, 0, 0)
+    )
+
+    # -------------------------------
+    # N° ÍTEM
+    # - Misma Y que la fecha (y + AJUSTE_BASELINE)
+    # - Ceros a la izquierda si es numérico: 1->001, 12->012, 101->101
+    # -------------------------------
+    item_txt = str(numero_item).strip()
+    if item_txt.isdigit():
+        item_txt = item_txt.zfill(3)
 
-        # -------------------------------
-        # DESCRIPCIÓN (NO TOCAR)
-        # -------------------------------
-        rect = fitz.Rect(
-            X_DESCRIPCION,
-            y,
-            X_DESCRIPCION + ANCHO_DESCRIPCION,
-            y + ALTO_BLOQUE
+    page.insert_text(
+        (X_ITEM, y + AJUSTE_BASELINE),
+        item_txt,
+        fontsize=8,
+        fontname="helv",
+        color=(0, 0, 0)
+    )
+
+    # ---------------------------------------------
+    # NUEVO: TEXTO "LOTE" (una sola línea)
+    # ---------------------------------------------
+    # Se imprime en la 2da fila de cada tabla. Si no entra, se reduce la fuente.
+    insertar_lote(page, y, texto_lote)
+
+    # ---------------------------------------------
+    # NÚMEROS DEL ÍTEM (calculo.py)
+    # ---------------------------------------------
+    # Resumen (CDT..CU+IVA) desde el TOTAL (IVA incluido), partes D/E/F/A+B
+    # desde el CDT y el tipo de ítem (match_utils), y la tabla de detalle A/F/B/E
+    # con semilla estable por ítem. Es el mismo cálculo que devuelve /api/calculo.
+    resumen = calculo.resumen
+    partes = calculo.partes
+
+    # Posición en hoja: 0 = tabla de arriba, 1 = tabla de abajo
+    tabla_index = posicion_en_hoja
+
+    # Insertar todos los valores del resumen usando vectores de coordenadas
+    for idx_fila, key in enumerate(RESUMEN_FILAS):
+        _insertar_numero_resumen(page, tabla_index, idx_fila, resumen.get(key, 0))
+
+    # ---------------------------------------------
+    # NUEVO: D / E / F (y A+B) a partir del CDT
+    # ---------------------------------------------
+    # Herramientas / Transporte son textos (se imprimen siempre) y NO dependen de estos números.
+    # Insertamos: (A+B), D, E, F (en ambas tablas)
+    valores_partes = [
+        partes.get("AB", 0),
+        partes.get("D", 0),
+        partes.get("E", 0),
+        partes.get("F", 0),
+    ]
+    for idx_parte, val in enumerate(valores_partes):
+        _insertar_numero_partes(page, tabla_index, idx_parte, val)
+
+    # NUEVO: Totales A) y B) (filas propias)
+    valores_ab = [
+        partes.get("A", 0),
+        partes.get("B", 0),
+    ]
+    for idx_ab, val in enumerate(valores_ab):
+        _insertar_numero_ab_totales(page, tabla_index, idx_ab, val)
+
+    # ---------------------------------------------
+    # NUEVO: DETALLE DE A (Equipos) Y F (Transporte)
+    # ---------------------------------------------
+    _insertar_detalles_a_y_f(page, tabla_index, calculo.detalles)
+
+    # ---------------------------------------------
+    # NUEVO: DETALLE DE B (Mano de obra) Y E (Materiales)
+    # ---------------------------------------------
+    _insertar_detalles_b_y_e(page, tabla_index, calculo.detalles)
+
+
+    # ---------------------------------------------
+    # BLOQUE DE INFO (debajo de fecha)
+    # ---------------------------------------------
+    # Izquierda: título del llamado (mismo para todos los ítems)
+    if titulo_llamado:
+        rect_llamado = fitz.Rect(
+            X_LLAMADO,
+            y + Y_LLAMADO_OFFSET,
+            X_LLAMADO + ANCHO_LLAMADO,
+            y + Y_LLAMADO_OFFSET + ALTO_LLAMADO
+        )
+        insertar_info_autoajustada(
+            page,
+            rect_llamado,
+            str(titulo_llamado).strip(),
+            max_lineas=2
         )
 
-        insertar_texto_autoajustado(page, rect, texto)
+    # Derecha: Unidad de medida + Presentación (por ítem)
+    texto_info = (
+        f"Unidad de medida: {str(unidad_medida).strip()}\n"
+        f"Presentación: {str(presentacion).strip()}"
+    )
+
+    rect_info = fitz.Rect(
+        X_UNI_PRES,
+        y + Y_UNI_PRES_OFFSET,
+        X_UNI_PRES + ANCHO_UNI_PRES,
+        y + Y_UNI_PRES_OFFSET + ALTO_UNI_PRES
+    )
+
+    insertar_info_autoajustada(page, rect_info, texto_info, max_lineas=2)
+
+    # -------------------------------
+    # DESCRIPCIÓN (NO TOCAR)
+    # -------------------------------
+    rect = fitz.Rect(
+        X_DESCRIPCION,
+        y,
+        X_DESCRIPCION + ANCHO_DESCRIPCION,
+        y + ALTO_BLOQUE
+    )
+
+    insertar_texto_autoajustado(page, rect, texto)
+
+
+    # ---------------------------------------------
+    # NUEVO: TEXTOS DE EQUIPOS / MANO DE OBRA / MATERIALES / TRANSPORTE
+    # (Solo imprime texto; NO altera cálculos ni coordenadas de números)
+    # ---------------------------------------------
+    # Estos campos se agregan en app.py usando match_utils.aplicar_match_a_filas().
+    textos_partes = [
+        fila.texto_equipos,
+        fila.texto_mano_obra,
+        fila.texto_materiales,
+        fila.texto_transporte,
+    ]
+
+    for idx_parte, t in enumerate(textos_partes):
+        t = str(t or "").strip()
+
+        # Equipos y Transporte siempre deben existir: si por algún motivo vienen vacíos, ponemos fallback.
+        if idx_parte == 0 and not t:
+            t = "Herramientas de mano"
+        if idx_parte == 3 and not t:
+            t = "Transporte terrestre"
+
+        # Mano de obra y Materiales pueden quedar vacíos según reglas del ítem.
+        if not t and idx_parte in (1, 2):
+            continue
+
+        x0 = X_CAJAS_PARTES[idx_parte] + PAD_X_PARTES
+        y0 = y + Y_CAJAS_PARTES_OFFSET[idx_parte] + PAD_Y_PARTES
+        x1 = X_CAJAS_PARTES[idx_parte] + ANCHO_CAJAS_PARTES[idx_parte] - PAD_X_PARTES
+        y1 = y + Y_CAJAS_PARTES_OFFSET[idx_parte] + ALTO_CAJAS_PARTES[idx_parte] - PAD_Y_PARTES
+
+        rect_parte = fitz.Rect(x0, y0, x1, y1)
+        insertar_texto_partes_autoajustado(page, rect_parte, t)
+
+
+def _renderizar_hoja(template_doc, filas_hoja, tapar, fecha, titulo_llamado, texto_lote, logo_path):
+    """
+    Renderiza UNA hoja (1 o 2 ítems) en un documento nuevo de una sola página
+    y devuelve sus bytes. Se usa en el modo incremental.
+    """
+    hoja = fitz.open()
+    page = _nueva_pagina(hoja, template_doc, logo_path)
+    lienzo = _lienzo(page)
+    for posicion_en_hoja, fila in enumerate(filas_hoja):
+        _renderizar_item(lienzo, fila, posicion_en_hoja, fecha, titulo_llamado, texto_lote)
+    _volcar(lienzo)
+    if tapar:
+        _tapar_segunda_tabla(page)
+    datos = hoja.tobytes(garbage=3, deflate=True)
+    hoja.close()
+    return datos
+
+
+def _como_fila(fila):
+    """FilaItem de *fila* (FilaItem, dict o CalculoItem)."""
+    return fila.fila if isinstance(fila, CalculoItem) else FilaItem.desde(fila)
+
 
+def _clave_hoja(filas_hoja, tapar, fecha, titulo_llamado, texto_lote, version_documento):
+    """
+    Clave del cache de páginas: contenido de los (hasta) 2 ítems de la hoja +
+    campos a nivel documento (fecha, título, lote, logo/template/código).
+    """
+    contenido = {
+        "filas": [_como_fila(f).a_dict() for f in filas_hoja],
+        "tapar": bool(tapar),
+        "fecha": fecha,
+        "titulo": titulo_llamado,
+        "lote": texto_lote,
+        "version": version_documento,
+    }
+    return hash_bytes(json.dumps(contenido, sort_keys=True, default=str).encode("utf-8"))
 
-        # ---------------------------------------------
-        # NUEVO: TEXTOS DE EQUIPOS / MANO DE OBRA / MATERIALES / TRANSPORTE
-        # (Solo imprime texto; NO altera cálculos ni coordenadas de números)
-        # ---------------------------------------------
-        # Estos campos se agregan en app.py usando match_utils.aplicar_match_a_filas().
-        textos_partes = [
-            fila.get("texto_equipos", ""),
-            fila.get("texto_mano_obra", ""),
-            fila.get("texto_materiales", ""),
-            fila.get("texto_transporte", ""),
+
+def _con_lookahead(filas):
+    """
+    Recorre *filas* (cualquier iterable, también un generador) devolviendo
+    (fila, es_ultima) con una sola fila de anticipación.
+    Así sabemos cuál es el último ítem sin materializar la lista completa.
+    """
+    it = iter(filas)
+    try:
+        actual = next(it)
+    except StopIteration:
+        return
+    for siguiente in it:
+        yield actual, False
+        actual = siguiente
+    yield actual, True
+
+
+def _por_hojas(filas):
+    """Agrupa *filas* (cualquier iterable) de a 2 ítems por hoja; la última puede tener 1."""
+    hoja = []
+    for fila in filas:
+        hoja.append(fila)
+        if len(hoja) == 2:
+            yield hoja
+            hoja = []
+    if hoja:
+        yield hoja
+
+
+# ===============================
+# OPTIMIZACIÓN DEL ARCHIVO DE SALIDA
+# ===============================
+# Opciones de Document.save. Medido con la planilla de ejemplo (106 hojas) y con
+# 10 hojas (python benchmarks.py guardado), con el texto emitido por página
+# (TEXTO_POR_PAGINA) y el template como XObject (PLANTILLA_COMO_XOBJECT):
+#
+#   modo       106 hojas           10 hojas
+#   ninguna    1.1 MB   0.01 s     936 KB  0.00 s
+#   compacta   373 KB   0.66 s     247 KB  0.10 s
+#   maxima     382 KB   0.03 s     247 KB  0.03 s
+#   fuentes    361 KB   0.35 s     226 KB  0.06 s
+#
+# - Copiando el template con insert_pdf cada hoja traía sus propias fuentes
+#   ("ninguna": 7.7 MB en 106 hojas) y garbage=4 las deduplicaba. Con el XObject
+#   ya están una sola vez; la compresión es lo que más reduce.
+# - Con TEXTO_POR_PAGINA = False (~70 streams por hoja) garbage=4 sin clean
+#   tardaba 12 s en 106 hojas; por eso "auto" sigue pasando a "compacta" arriba
+#   de OPTIMIZACION_AUTO_MAX_PAGINAS en ese caso.
+# - "fuentes" además recorta las fuentes embebidas a los glifos usados
+#   (subset_fonts). Las del template ya vienen recortadas: gana poco y es lento.
+# - "lineal" (primera página visible antes de terminar la descarga): PyMuPDF
+#   1.24+ ya no linealiza; si falla se guarda como "maxima".
+# - "auto": "maxima" (o "compacta" si el texto va por llamada y hay más de
+#   OPTIMIZACION_AUTO_MAX_PAGINAS hojas).
+
+OPTIMIZACIONES = {
+    "ninguna": {},
+    "compacta": {"garbage": 4, "deflate": True, "clean": True, "use_objstms": 1},
+    "maxima": {"garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True, "use_objstms": 1},
+    "fuentes": {"garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True, "use_objstms": 1,
+                "subset_fonts": True},
+    "lineal": {"garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True, "linear": True},
+}
+OPTIMIZACION_AUTO_MAX_PAGINAS = 40
+OPTIMIZACION_DEFAULT = os.environ.get("DESGLOSE_OPTIMIZACION", "auto")
+
+
+def opciones_guardado(optimizacion, paginas):
+    """Nombre efectivo y opciones de save para *optimizacion* ("auto" se resuelve por *paginas*)."""
+    nombre = optimizacion or OPTIMIZACION_DEFAULT
+    if nombre == "auto":
+        grande = not TEXTO_POR_PAGINA and paginas > OPTIMIZACION_AUTO_MAX_PAGINAS
+        nombre = "compacta" if grande else "maxima"
+    if nombre not in OPTIMIZACIONES:
+        raise ValueError(f"Optimización desconocida: {nombre!r} (opciones: auto, {', '.join(OPTIMIZACIONES)})")
+    return nombre, dict(OPTIMIZACIONES[nombre])
+
+
+def _guardar(doc, salida, incremental=False, optimizacion=None):
+    """
+    Guarda *doc* en *salida* con la optimización pedida (ver OPTIMIZACIONES).
+
+    En modo incremental las hojas vienen de documentos distintos (template, fuentes
+    y logo repetidos por hoja): "ninguna" se sube a "compacta" para deduplicarlos.
+    Devuelve el nombre de la optimización aplicada.
+    """
+    nombre, opciones = opciones_guardado(optimizacion, doc.page_count)
+    if incremental and nombre == "ninguna":
+        nombre, opciones = opciones_guardado("compacta", doc.page_count)
+
+    if opciones.pop("subset_fonts", False):
+        doc.subset_fonts()
+
+    if opciones.get("linear"):
+        try:
+            doc.save(salida, **opciones)
+            return nombre
+        except Exception:
+            # PyMuPDF >= 1.24: "Linearisation is no longer supported" (FzErrorArgument).
+            nombre, opciones = opciones_guardado("maxima", doc.page_count)
+
+    doc.save(salida, **opciones)
+    return nombre
+
+
+def _agregar_paginas(doc, template_doc, filas, fecha, titulo_llamado, texto_lote, logo_path,
+                     incremental=False, cache_paginas=None, logos=None):
+    """
+    Agrega al final de *doc* las hojas de *filas* (2 ítems por hoja).
+    Es el cuerpo de generar_pdf; generar_pdf_lotes lo llama una vez por lote
+    (con el mismo dict *logos*, así el logo se guarda una vez por documento).
+    """
+    if incremental:
+        cache = cache_paginas if cache_paginas is not None else CACHE_PAGINAS
+        version_documento = [
+            hash_archivo(logo_path) if logo_path else "",
+            hash_archivo(TEMPLATE),
+            version_codigo(),
         ]
 
-        for idx_parte, t in enumerate(textos_partes):
-            t = str(t or "").strip()
+        for filas_hoja in _por_hojas(filas):
+            # Solo la última hoja puede tener 1 ítem (cantidad impar)
+            tapar = TAPAR_SEGUNDA_TABLA_EN_ULTIMA_HOJA_SI_IMPAR and len(filas_hoja) == 1
+
+            clave = _clave_hoja(filas_hoja, tapar, fecha, titulo_llamado, texto_lote, version_documento)
+            datos = cache.leer(clave)
+            if datos is None:
+                datos = _renderizar_hoja(
+                    template_doc, filas_hoja, tapar, fecha, titulo_llamado, texto_lote, logo_path
+                )
+                cache.put_bytes(clave, datos)
+
+            hoja = fitz.open("pdf", datos)
+            doc.insert_pdf(hoja)
+            hoja.close()
+        return
 
-            # Equipos y Transporte siempre deben existir: si por algún motivo vienen vacíos, ponemos fallback.
-            if idx_parte == 0 and not t:
-                t = "Herramientas de mano"
-            if idx_parte == 3 and not t:
-                t = "Transporte terrestre"
+    logos = logos if logos is not None else {}
+    for i, (fila, es_ultima) in enumerate(_con_lookahead(filas)):
+        posicion_en_hoja = i % 2
 
-            # Mano de obra y Materiales pueden quedar vacíos según reglas del ítem.
-            if not t and idx_parte in (1, 2):
-                continue
+        if posicion_en_hoja == 0:
+            page = _nueva_pagina(doc, template_doc, logo_path, logos)
+            lienzo = _lienzo(page)
 
-            x0 = X_CAJAS_PARTES[idx_parte] + PAD_X_PARTES
-            y0 = y + Y_CAJAS_PARTES_OFFSET[idx_parte] + PAD_Y_PARTES
-            x1 = X_CAJAS_PARTES[idx_parte] + ANCHO_CAJAS_PARTES[idx_parte] - PAD_X_PARTES
-            y1 = y + Y_CAJAS_PARTES_OFFSET[idx_parte] + ALTO_CAJAS_PARTES[idx_parte] - PAD_Y_PARTES
+        _renderizar_item(lienzo, fila, posicion_en_hoja, fecha, titulo_llamado, texto_lote)
 
-            rect_parte = fitz.Rect(x0, y0, x1, y1)
-            insertar_texto_partes_autoajustado(page, rect_parte, t)
+        # Hoja completa (o último ítem): se escriben sus textos de una vez.
+        if posicion_en_hoja == 1 or es_ultima:
+            _volcar(lienzo)
 
         # ===============================
         # OPCIÓN B (tapado):
@@ -1245,19 +1427,176 @@ def generar_pdf(filas, fecha, titulo_llamado="", texto_lote="", logo_path=None):
         # ===============================
         if (
             TAPAR_SEGUNDA_TABLA_EN_ULTIMA_HOJA_SI_IMPAR
-            and (total % 2 == 1)
-            and (i == total - 1)
+            and es_ultima
             and (posicion_en_hoja == 0)
         ):
-            # Rectángulo blanco cubriendo desde TAPAR_Y0 hasta el final de la página
-            page.draw_rect(
-                fitz.Rect(0, TAPAR_Y0, page.rect.width, page.rect.height),
-                color=(1, 1, 1),
-                fill=(1, 1, 1)
-            )
+            _tapar_segunda_tabla(page)
+
+
+def generar_pdf(filas, fecha, titulo_llamado="", texto_lote="", logo_path=None,
+                incremental=False, cache_paginas=None, salida=None, optimizacion=None):
+    """
+    Genera un PDF usando el template existente.
+    Coloca 2 ítems por hoja.
+
+    - Solo imprimimos filas válidas (excel_utils filtra por item).
+    - Si la cantidad total es impar, la última hoja debe mostrar SOLO una tabla:
+      => Opción B: tapar visualmente la tabla inferior.
+
+    Bloque debajo de fecha:
+    - Debajo de la fecha (y en el bloque superior de cada tabla), imprimimos:
+        * Izquierda: título del llamado (desde el Excel, fila 1)
+        * Derecha: 'Unidad de medida' y 'Presentación' (por cada ítem)
+      Las coordenadas quedan arriba como constantes para que puedas ajustarlas fácil.
+
+    NUEVO:
+    - Imprime los valores del resumen desde CDT hasta CU+IVA en ambas tablas.
+      (Se calcula desde el TOTAL IVA incluido del Excel).
+
+    NUEVO (encabezado):
+    - Texto de "Lote" (una sola línea) en la 2da fila de cada tabla.
+    - Logo en esquina superior derecha de cada página (default o subido por usuario).
+
+    NUEVO (streaming):
+    - *filas* puede ser cualquier iterable (por ejemplo el generador de
+      excel_utils.iterar_items_y_descripciones_excel pasado por
+      match_utils.iterar_match_a_filas). Se consume de a un ítem; para saber si el
+      último ítem queda solo en su hoja (tapado) se mira UNA fila por adelantado.
+
+    NUEVO (modo incremental):
+    - Con incremental=True cada hoja se renderiza por separado y se guarda en
+      cache_paginas (por defecto CACHE_PAGINAS), con clave = contenido de sus 2 ítems
+      + campos del documento. Las hojas sin cambios se reutilizan del cache y se
+      insertan en el documento nuevo, así una re-subida con un precio corregido
+      solo vuelve a dibujar las hojas afectadas.
+
+    - salida: ruta del PDF a escribir (por defecto OUTPUT). Devuelve esa ruta.
+    - optimizacion: opciones de guardado (OPTIMIZACIONES o "auto"); por defecto
+      OPTIMIZACION_DEFAULT (variable de entorno DESGLOSE_OPTIMIZACION, "auto").
+    """
+    salida = Path(salida) if salida is not None else OUTPUT
+
+    template_doc = _abrir_template()
+    doc = fitz.open()
+
+    _agregar_paginas(
+        doc, template_doc, filas, fecha, titulo_llamado, texto_lote, logo_path,
+        incremental=incremental, cache_paginas=cache_paginas,
+    )
+
+    _guardar(doc, salida, incremental, optimizacion)
+    doc.close()
+    template_doc.close()
+
+    return salida
+
+
+def _generar_pdf_lote(args):
+    """Trabajo de un proceso del pool: genera el PDF de UN lote (ver generar_pdf_lotes)."""
+    filas, fecha, titulo_llamado, texto_lote, logo_path, incremental, salida, optimizacion = args
+    return generar_pdf(
+        filas, fecha, titulo_llamado=titulo_llamado, texto_lote=texto_lote,
+        logo_path=logo_path, incremental=incremental, salida=salida, optimizacion=optimizacion,
+    )
+
+
+def generar_pdf_lotes(grupos, fecha, logo_path=None, salida=None, incremental=False,
+                      paralelo=False, max_procesos=None, optimizacion=None):
+    """
+    Genera el desglose de un libro con VARIOS lotes (excel_utils.iterar_lotes_excel).
+
+    *grupos*: iterable de GrupoLote (hoja, titulo_llamado, texto_lote, filas), con las
+    filas ya pasadas por match. Cada lote usa su propio título y texto de lote, y
+    empieza en una hoja nueva (con su propio tapado si tiene cantidad impar).
 
-    doc.save(OUTPUT)
+    - paralelo=False: UN solo documento con todos los lotes en orden -> devuelve su ruta.
+    - paralelo=True: UN documento POR LOTE, generados en paralelo en procesos
+      separados (ProcessPoolExecutor) -> devuelve la lista de rutas, en el orden de
+      los lotes: <salida>_lote1.pdf, <salida>_lote2.pdf, ...
+    - optimizacion: igual que en generar_pdf.
+    """
+    salida = Path(salida) if salida is not None else OUTPUT
+
+    if paralelo:
+        trabajos = []
+        for n, g in enumerate(grupos, start=1):
+            ruta = salida.with_name(f"{salida.stem}_lote{n}{salida.suffix}")
+            trabajos.append((
+                [f if isinstance(f, CalculoItem) else FilaItem.desde(f) for f in g.filas],
+                fecha, g.titulo_llamado, g.texto_lote,
+                logo_path, incremental, ruta, optimizacion,
+            ))
+        if not trabajos:
+            return []
+        with ProcessPoolExecutor(max_workers=max_procesos or min(len(trabajos), os.cpu_count() or 1)) as pool:
+            return list(pool.map(_generar_pdf_lote, trabajos))
+
+    template_doc = _abrir_template()
+    doc = fitz.open()
+
+    logos = {}
+    for g in grupos:
+        _agregar_paginas(
+            doc, template_doc, g.filas, fecha, g.titulo_llamado, g.texto_lote, logo_path,
+            incremental=incremental, logos=logos,
+        )
+
+    _guardar(doc, salida, incremental, optimizacion)
     doc.close()
     template_doc.close()
 
-    return OUTPUT
+    return salida
+
+
+# ===============================
+# VISTA PREVIA (PNG)
+# ===============================
+# Para "ver cómo queda" no hace falta armar el documento entero: se dibujan solo
+# las primeras hojas en un documento en memoria y se rasterizan a baja resolución.
+
+PREVIEW_ITEMS = 2        # ítems por defecto (= primera hoja)
+PREVIEW_ITEMS_MAX = 20   # 10 hojas: todas se apilan en un solo PNG en memoria
+PREVIEW_DPI = 60         # suficiente para revisar textos y posiciones en pantalla
+PREVIEW_DPI_MAX = 150
+
+
+def generar_preview_png(filas, fecha, titulo_llamado="", texto_lote="", logo_path=None,
+                        n_items=PREVIEW_ITEMS, dpi=PREVIEW_DPI):
+    """
+    Devuelve un PNG (bytes) con las hojas de los primeros *n_items* ítems de *filas*,
+    una debajo de la otra. No se escribe nada a disco.
+
+    *n_items* se redondea a hojas completas (2 ítems por hoja): así la última hoja
+    de la vista previa es igual a la del PDF (solo se tapa la tabla inferior si el
+    lote realmente termina ahí). Se limita a PREVIEW_ITEMS_MAX ítems y el dpi a
+    18..PREVIEW_DPI_MAX. Si no hay ítems, lanza ValueError.
+    """
+    paginas = max(1, (min(int(n_items), PREVIEW_ITEMS_MAX) + 1) // 2)
+    dpi = max(18, min(int(dpi), PREVIEW_DPI_MAX))
+
+    template_doc = _abrir_template()
+    doc = fitz.open()
+    try:
+        _agregar_paginas(
+            doc, template_doc, islice(filas, paginas * 2), fecha, titulo_llamado, texto_lote, logo_path,
+        )
+        pixmaps = [page.get_pixmap(dpi=dpi) for page in doc]
+    finally:
+        doc.close()
+        template_doc.close()
+
+    if not pixmaps:
+        raise ValueError("No hay ítems para la vista previa")
+    if len(pixmaps) == 1:
+        return pixmaps[0].tobytes("png")
+
+    ancho = max(px.width for px in pixmaps)
+    alto = sum(px.height for px in pixmaps)
+    lienzo = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, ancho, alto), False)
+    lienzo.clear_with(255)
+    y = 0
+    for px in pixmaps:
+        px.set_origin(0, y)
+        lienzo.copy(px, px.irect)
+        y += px.height
+    return lienzo.tobytes("png")
@@ -0,0 +1,211 @@
+"""
+planificador.py
+
+Orden y admisión de los renders de un worker: primero el trabajo más corto,
+con envejecimiento, y 429 cuando la cola estimada es demasiado larga.
+
+- Con una cola FIFO, una licitación de 2000 ítems (~1000 hojas, más de un
+  minuto) deja esperando a todas las de 5 ítems que lleguen detrás.
+- Costo estimado ANTES de encolar: ítems por lote (excel_utils.estimar_items_por_lote,
+  una cota que solo lee los encabezados de cada hoja y cuenta las celdas con
+  valor de la columna Ítem debajo; o la cantidad de registros de la API)
+  -> hojas (2 ítems por hoja, ver pdf_utils._por_hojas) -> segundos, con el
+  costo por hoja que mide `python benchmarks.py costo`.
+- Cola de prioridad por costo (shortest-job-first) con envejecimiento: la
+  prioridad de un trabajo es costo - ENVEJECIMIENTO * espera. Como todos envejecen
+  al mismo ritmo, el orden relativo no cambia con el tiempo y alcanza con un heap
+  ordenado por costo + ENVEJECIMIENTO * llegada. Un trabajo grande termina
+  pasando adelante: con ENVEJECIMIENTO = 1, después de esperar N segundos
+  compite como si costara N segundos menos.
+- Admisión: si la espera estimada (costo de lo que corre + lo encolado, repartido
+  entre los lugares de render) supera MAX_ESPERA_SEG, el trabajo se rechaza con
+  Saturado(reintentar_en) -> 429 + Retry-After en app.py. Si no hay nada en
+  curso se admite siempre (un trabajo más grande que el umbral también tiene que
+  poder correr).
+
+Alcance: la cola es por proceso (un worker de gunicorn), no se comparte entre
+workers. Solo ordena y rechaza con el modelo gthread (gunicorn.conf.py), donde
+hay un solo worker y todos sus hilos comparten este planificador. Con workers
+sync cada proceso atiende un request por vez: el planificador siempre está vacío
+al llegar uno, lo admite enseguida y el orden lo decide el backlog del socket
+(FIFO). Para SJF y 429 con varias CPUs usar DESGLOSE_MODELO=gthread.
+
+Configuración (variables de entorno):
+- DESGLOSE_RENDERS_SIMULTANEOS (default: procesos del pool de render, o 1)
+- DESGLOSE_SEG_POR_PAGINA  (default: costo_render.json de benchmarks.py, o 0.025)
+- DESGLOSE_MAX_ESPERA_SEG  (default 120): cola estimada máxima antes de responder 429.
+- DESGLOSE_ENVEJECIMIENTO  (default 1.0): segundos de costo que se descuentan por
+  segundo de espera.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Lo escribe `python benchmarks.py costo --guardar` (medido en la máquina de producción).
+ARCHIVO_COSTO = BASE_DIR / "costo_render.json"
+
+# Medido con benchmarks.py costo (render normal, 1 CPU): 106 hojas en ~2.6 s.
+# Con DESGLOSE_RENDER_INCREMENTAL=1 y el cache de hojas frío son ~0.07 s/hoja:
+# medir de nuevo con --guardar si se activa.
+SEGUNDOS_POR_PAGINA_DEFAULT = 0.025
+SEGUNDOS_FIJOS = 0.1     # abrir template, leer el Excel, guardar
+
+ITEMS_POR_HOJA = 2
+
+MAX_ESPERA_SEG = float(os.environ.get("DESGLOSE_MAX_ESPERA_SEG", "120"))
+ENVEJECIMIENTO = float(os.environ.get("DESGLOSE_ENVEJECIMIENTO", "1.0"))
+
+
+class Saturado(Exception):
+    """La cola estimada supera el máximo: reintentar en *reintentar_en* segundos."""
+
+    def __init__(self, espera_seg: float, reintentar_en: int):
+        super().__init__(f"cola de renders estimada en {espera_seg:.0f} s; reintentar en {reintentar_en} s")
+        self.espera_seg = espera_seg
+        self.reintentar_en = reintentar_en
+
+
+def segundos_por_pagina() -> float:
+    """DESGLOSE_SEG_POR_PAGINA, o lo medido por benchmarks.py (costo_render.json), o el default."""
+    valor = os.environ.get("DESGLOSE_SEG_POR_PAGINA", "").strip()
+    if valor:
+        return float(valor)
+    try:
+        return float(json.loads(ARCHIVO_COSTO.read_text(encoding="utf-8"))["segundos_por_pagina"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return SEGUNDOS_POR_PAGINA_DEFAULT
+
+
+def paginas_estimadas(items_por_lote: Iterable[int]) -> int:
+    """Hojas del PDF: cada lote empieza hoja nueva, 2 ítems por hoja."""
+    return sum(math.ceil(n / ITEMS_POR_HOJA) for n in items_por_lote)
+
+
+def costo_estimado(items_por_lote: Iterable[int], seg_por_pagina: Optional[float] = None) -> float:
+    """Segundos estimados de render para lotes con esas cantidades de ítems."""
+    por_pagina = segundos_por_pagina() if seg_por_pagina is None else seg_por_pagina
+    return SEGUNDOS_FIJOS + por_pagina * paginas_estimadas(items_por_lote)
+
+
+class Planificador:
+    """
+    Lugares de render repartidos por costo estimado (ver docstring del módulo):
+
+        with PLANIFICADOR.turno(costo):     # puede lanzar Saturado
+            pdf = POOL_RENDER.ejecutar(...)
+
+    Seguro entre hilos.
+    """
+
+    def __init__(self, capacidad: int = 1, max_espera_seg: float = MAX_ESPERA_SEG,
+                 envejecimiento: float = ENVEJECIMIENTO):
+        self.capacidad = max(1, capacidad)
+        self.max_espera_seg = max_espera_seg
+        self.envejecimiento = envejecimiento
+        self._cond = threading.Condition()
+        self._cola = []                 # heap de (clave, n, costo)
+        self._siguiente = itertools.count()
+        self._en_curso = 0
+        self._costo_en_curso = 0.0
+        self._costo_en_cola = 0.0
+
+    # -------------------------
+    # Estado
+    # -------------------------
+
+    def espera_estimada(self) -> float:
+        """Segundos hasta que se libere un lugar para un trabajo nuevo (aprox.)."""
+        with self._cond:
+            return self._espera_estimada()
+
+    def _espera_estimada(self) -> float:
+        return (self._costo_en_curso + self._costo_en_cola) / self.capacidad
+
+    def estado(self) -> dict:
+        with self._cond:
+            return {
+                "en_curso": self._en_curso,
+                "en_cola": len(self._cola),
+                "espera_estimada_seg": round(self._espera_estimada(), 1),
+                "capacidad": self.capacidad,
+            }
+
+    # -------------------------
+    # Turnos
+    # -------------------------
+
+    def _admitir(self, costo: float):
+        if self._en_curso == 0 and not self._cola:
+            return
+        espera = self._espera_estimada() + costo / self.capacidad
+        if espera > self.max_espera_seg:
+            reintentar = max(1, math.ceil(espera - self.max_espera_seg))
+            raise Saturado(espera, reintentar)
+
+    def entrar(self, costo: float):
+        """Espera (bloquea) hasta que le toque a un trabajo de *costo* segundos. Saturado si no se admite."""
+        costo = max(0.0, float(costo))
+        with self._cond:
+            self._admitir(costo)
+            if self._en_curso < self.capacidad and not self._cola:
+                self._empezar(costo)
+                return
+            clave = costo + self.envejecimiento * time.monotonic()
+            entrada = (clave, next(self._siguiente), costo)
+            heapq.heappush(self._cola, entrada)
+            self._costo_en_cola += costo
+            try:
+                while self._en_curso >= self.capacidad or self._cola[0] is not entrada:
+                    self._cond.wait()
+            except BaseException:
+                self._cola.remove(entrada)
+                heapq.heapify(self._cola)
+                self._costo_en_cola -= costo
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._cola)
+            self._costo_en_cola -= costo
+            self._empezar(costo)
+            # Si quedó otro lugar libre, que el siguiente de la cola lo vea.
+            self._cond.notify_all()
+
+    def _empezar(self, costo: float):
+        self._en_curso += 1
+        self._costo_en_curso += costo
+
+    def salir(self, costo: float):
+        """Libera el lugar de un trabajo de *costo* segundos (llamar una vez por entrar)."""
+        costo = max(0.0, float(costo))
+        with self._cond:
+            self._en_curso -= 1
+            self._costo_en_curso = max(0.0, self._costo_en_curso - costo)
+            self._cond.notify_all()
+
+    def turno(self, costo: float):
+        """Context manager: entrar(costo) ... salir(costo)."""
+        return _Turno(self, costo)
+
+
+class _Turno:
+    def __init__(self, planificador: Planificador, costo: float):
+        self.planificador = planificador
+        self.costo = costo
+
+    def __enter__(self):
+        self.planificador.entrar(self.costo)
+        return self
+
+    def __exit__(self, *exc):
+        self.planificador.salir(self.costo)
+        return False
@@ -0,0 +1,216 @@
+"""
+pool_render.py
+
+Pool de procesos de render de larga vida.
+
+- Generar un PDF es CPU pura (PyMuPDF + cálculo). En workers gthread, dos renders
+  en hilos del mismo proceso se pelean por el GIL y por el lock global de MuPDF:
+  más hilos no dan más PDFs por segundo, solo más latencia para todos.
+- Con el pool, el handler de Flask manda el trabajo a un proceso aparte y espera
+  el resultado; el hilo del request solo hace E/S (subida, cache, send_file) y los
+  renders corren en paralelo de verdad, uno por núcleo.
+- Cada proceso arranca caliente: en el initializer llama a arranque.precargar
+  (template, métricas de fuente, logo por defecto, tabla match) una sola vez, y
+  después atiende trabajos hasta MAX_TAREAS_POR_PROCESO; ahí se reemplaza por uno
+  nuevo (fitz acumula memoria en procesos de larga vida, igual que los workers de
+  gunicorn con max_requests).
+- El pool se crea en el proceso que lo usa, después del fork de gunicorn (los
+  hilos del executor no sobreviven a un fork): con el primer trabajo, o antes
+  con calentar() (gunicorn.conf.py lo llama al iniciar cada worker). Los procesos
+  salen de un forkserver con fitz/openpyxl y los módulos del render ya importados.
+- Lo que viaja al proceso es chico: la fuente del Excel (ruta o bytes), las filas
+  de la API, fecha, logo y la ruta de salida. El PDF se escribe directo en la
+  ruta de salida (un temporal del cache de resultados): no vuelve por el pipe.
+
+Configuración (variables de entorno):
+- DESGLOSE_PROCESOS_RENDER (default 0): procesos del pool. 0 = sin pool, se
+  renderiza en el hilo del request (como antes). gunicorn.conf.py lo pone en la
+  cantidad de CPUs para el modelo gthread.
+- DESGLOSE_RENDER_MAX_TAREAS (default 50): trabajos por proceso antes de reciclarlo.
+- DESGLOSE_RENDER_INCREMENTAL (default 0): 1 = render incremental (cada hoja como
+  documento propio, guardada en cache/paginas). Solo conviene si las mismas hojas
+  se repiten entre pedidos: con el cache frío es ~2.5x más lento que el render
+  normal (212 ítems: ~7.7 s contra ~3 s), y cada fecha distinta es un cache frío.
+
+Trabajos (funciones de módulo, las corre el pool o el hilo del request):
+- generar_pdf_desglose: Excel (o grupos ya leídos) -> match -> PDF en *salida*.
+- generar_pdf_y_xlsx_desglose: lo mismo, más la planilla del desglose en
+  *salida_xlsx* (exportar.generar_pdf_y_xlsx: cada ítem se calcula una vez).
+- generar_preview_desglose: primer lote del Excel -> match -> PNG (bytes).
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+log = logging.getLogger("desglose.pool")
+
+PROCESOS_RENDER = int(os.environ.get("DESGLOSE_PROCESOS_RENDER", "0"))
+MAX_TAREAS_POR_PROCESO = int(os.environ.get("DESGLOSE_RENDER_MAX_TAREAS", "50"))
+RENDER_INCREMENTAL = os.environ.get("DESGLOSE_RENDER_INCREMENTAL", "0").strip().lower() in ("1", "true", "si", "sí")
+
+# Importados una vez en el forkserver: cada proceso nuevo del pool nace con ellos.
+MODULOS_FORKSERVER = [
+    "fitz", "openpyxl", "pdf_utils", "excel_utils", "match_utils", "exportar", "arranque", "pool_render",
+]
+
+
+# ==========================================================
+# Trabajos
+# ==========================================================
+
+def generar_pdf_desglose(entrada, fecha, logo_path, salida, match_path, incremental=None):
+    """
+    PDF del desglose en *salida* (mismo pipeline que app.index) y devuelve su ruta.
+
+    *entrada*: fuente del Excel (ruta o buffer: todas sus hojas son lotes) o una
+    lista de GrupoLote con las filas ya leídas (API). El match se aplica acá.
+    *incremental*: None = RENDER_INCREMENTAL.
+    """
+    from pdf_utils import generar_pdf_lotes
+
+    if incremental is None:
+        incremental = RENDER_INCREMENTAL
+    return generar_pdf_lotes(
+        _grupos_con_match(entrada, match_path), fecha, logo_path=logo_path, incremental=incremental, salida=salida,
+    )
+
+
+def generar_pdf_y_xlsx_desglose(entrada, fecha, logo_path, salida_pdf, salida_xlsx, match_path):
+    """Como generar_pdf_desglose, más la planilla en *salida_xlsx*. Devuelve (ruta_pdf, ruta_xlsx)."""
+    from exportar import generar_pdf_y_xlsx
+
+    return generar_pdf_y_xlsx(
+        _grupos_con_match(entrada, match_path), fecha, logo_path=logo_path,
+        salida_pdf=salida_pdf, salida_xlsx=salida_xlsx, incremental=RENDER_INCREMENTAL,
+    )
+
+
+def _grupos_con_match(entrada, match_path):
+    from excel_utils import GrupoLote, iterar_lotes_excel
+    from match_utils import iterar_match_a_filas
+
+    lotes = entrada if isinstance(entrada, list) else iterar_lotes_excel(entrada)
+    return (
+        GrupoLote(g.hoja, g.titulo_llamado, g.texto_lote, iterar_match_a_filas(g.filas, match_path))
+        for g in lotes
+    )
+
+
+def generar_preview_desglose(fuente, fecha, logo_path, match_path, n_items, dpi) -> bytes:
+    """PNG de las primeras hojas del primer lote del Excel. ValueError si no hay ítems."""
+    from excel_utils import iterar_lotes_excel
+    from match_utils import iterar_match_a_filas
+    from pdf_utils import generar_preview_png
+
+    lote = next(iter(iterar_lotes_excel(fuente)), None)
+    if lote is None:
+        raise ValueError("El Excel no tiene ítems")
+    filas = iterar_match_a_filas(lote.filas, match_path)
+    return generar_preview_png(
+        filas, fecha, lote.titulo_llamado, lote.texto_lote, logo_path, n_items=n_items, dpi=dpi,
+    )
+
+
+# ==========================================================
+# Pool
+# ==========================================================
+
+def _inicializar_proceso(match_path, logo_path):
+    """Initializer de cada proceso del pool: deja en memoria lo que usa todo render."""
+    from arranque import precargar
+
+    precargar(match_path, logo_path)
+
+
+def _nada():
+    return os.getpid()
+
+
+def _contexto():
+    """forkserver en POSIX (max_tasks_per_child no admite fork); spawn en el resto."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(MODULOS_FORKSERVER)
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+class PoolRender:
+    """
+    Procesos de render compartidos por los hilos de un worker:
+
+        pool = PoolRender(match_path=MATCH_XLSX, logo_path=DEFAULT_LOGO)
+        ruta = pool.ejecutar(generar_pdf_desglose, fuente, fecha, logo, salida, MATCH_XLSX)
+
+    Con procesos=0, ejecutar llama a la función en el hilo actual (sin pool).
+    """
+
+    def __init__(self, procesos: Optional[int] = None, max_tareas: Optional[int] = None,
+                 match_path=None, logo_path=None):
+        self.procesos = PROCESOS_RENDER if procesos is None else procesos
+        self.max_tareas = MAX_TAREAS_POR_PROCESO if max_tareas is None else max_tareas
+        self.match_path = match_path
+        self.logo_path = logo_path
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def activo(self) -> bool:
+        return self.procesos > 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                opciones = {}
+                if self.max_tareas > 0 and sys.version_info >= (3, 11):
+                    opciones["max_tasks_per_child"] = self.max_tareas
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.procesos,
+                    mp_context=_contexto(),
+                    initializer=_inicializar_proceso,
+                    initargs=(self.match_path, self.logo_path),
+                    **opciones,
+                )
+                self._pid = os.getpid()
+                log.info("pool de render: %d procesos (pid %s, %s tareas por proceso)",
+                         self.procesos, self._pid, self.max_tareas or "sin límite de")
+            return self._executor
+
+    def calentar(self):
+        """Arranca los procesos ya, sin esperarlos: el primer render no paga la precarga."""
+        if self.activo:
+            executor = self._pool()
+            for _ in range(self.procesos):
+                executor.submit(_nada)
+
+    def ejecutar(self, fn, *args):
+        """fn(*args) en un proceso del pool (o en este hilo si el pool está apagado)."""
+        if not self.activo:
+            return fn(*args)
+        executor = self._pool()
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # Un proceso murió (memoria, señal): el executor queda inutilizable.
+            # Se descarta y el próximo trabajo crea uno nuevo; este request falla.
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def cerrar(self, esperar: bool = True):
+        """Apaga los procesos del pool (al reciclar el worker o en los tests de carga)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=esperar, cancel_futures=True)
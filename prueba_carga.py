@@ -0,0 +1,327 @@
+"""
+prueba_carga.py
+
+Prueba de carga del endpoint principal (POST /: Excel + fecha -> PDF).
+
+Modos:
+- cliente : en el mismo proceso, con el test client de Flask (sin red ni gunicorn).
+            Mide la app sola: parseo + match + render + cache.
+- gunicorn: levanta gunicorn con gunicorn.conf.py en un puerto local, espera a
+            /salud y manda los requests por HTTP. Mide la configuración de producción.
+- url     : contra un servidor ya levantado (--url).
+
+Libros: por defecto se generan libros sintéticos (libros_sinteticos) de varios
+tamaños (--tamanos 10,50,200 ítems); con --excel se usa un archivo real.
+Para cada tamaño se mandan --requests requests con --concurrencia en paralelo
+y se informa latencia p50/p95/p99, throughput y tasa de errores.
+
+Cada request manda una fecha distinta (a partir de un punto al azar, para no
+chocar con lo que quedó en cache de corridas anteriores), así no se sirve del
+cache de resultados y se mide el render real. Con --repetir se manda siempre
+la misma (mide los hits del cache).
+
+Reporte: con --reporte se escribe un JSON con el commit (git), la máquina, los
+parámetros y los resultados; con --comparar se muestra la diferencia contra un
+reporte anterior (por ejemplo, el de otro commit).
+
+    python prueba_carga.py --modo cliente --tamanos 10,50 --requests 6 --concurrencia 2
+    python prueba_carga.py --modo gunicorn --requests 8 --concurrencia 4 --reporte carga.json
+    python prueba_carga.py --modo gunicorn --comparar carga.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# (status, segundos, bytes_respuesta); status 0 = error de red / excepción.
+Resultado = Tuple[int, float, int]
+
+
+# ==========================================================
+# Clientes: una función (nombre_excel, bytes, fecha) -> Resultado
+# ==========================================================
+
+def _multipart(campos: Dict[str, str], archivos: Dict[str, Tuple[str, bytes]]) -> Tuple[bytes, str]:
+    """Arma un cuerpo multipart/form-data. Devuelve (cuerpo, content_type)."""
+    limite = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos.items():
+        partes.append(
+            f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode("utf-8")
+        )
+    for nombre, (archivo, datos) in archivos.items():
+        partes.append(
+            f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"; filename="{archivo}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n".encode("utf-8")
+            + datos + b"\r\n"
+        )
+    partes.append(f"--{limite}--\r\n".encode("utf-8"))
+    return b"".join(partes), f"multipart/form-data; boundary={limite}"
+
+
+def cliente_http(url: str, timeout: float = 600) -> Callable[[str, bytes, str], Resultado]:
+    def enviar(nombre: str, datos: bytes, fecha: str) -> Resultado:
+        cuerpo, tipo = _multipart({"fecha": fecha}, {"excel": (nombre, datos)})
+        req = urllib.request.Request(url.rstrip("/") + "/", data=cuerpo, headers={"Content-Type": tipo})
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as r:
+                n = len(r.read())
+                return r.status, time.perf_counter() - t0, n
+        except urllib.error.HTTPError as e:
+            return e.code, time.perf_counter() - t0, 0
+        except OSError:
+            return 0, time.perf_counter() - t0, 0
+    return enviar
+
+
+def cliente_flask() -> Callable[[str, bytes, str], Resultado]:
+    """Llama a app.index en el mismo proceso (un test client por request)."""
+    from app import app
+
+    def enviar(nombre: str, datos: bytes, fecha: str) -> Resultado:
+        t0 = time.perf_counter()
+        try:
+            r = app.test_client().post(
+                "/",
+                data={"fecha": fecha, "excel": (io.BytesIO(datos), nombre)},
+                content_type="multipart/form-data",
+            )
+            return r.status_code, time.perf_counter() - t0, len(r.data)
+        except Exception:
+            return 0, time.perf_counter() - t0, 0
+    return enviar
+
+
+# ==========================================================
+# gunicorn local
+# ==========================================================
+
+def esperar_salud(url: str, limite_seg: float = 60) -> bool:
+    fin = time.monotonic() + limite_seg
+    while time.monotonic() < fin:
+        try:
+            with urllib.request.urlopen(url.rstrip("/") + "/salud", timeout=2) as r:
+                if r.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def iniciar_gunicorn(puerto: int, env_extra: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """Levanta gunicorn con gunicorn.conf.py en 127.0.0.1:<puerto> (grupo de procesos propio)."""
+    env = dict(os.environ)
+    env["DESGLOSE_BIND"] = f"127.0.0.1:{puerto}"
+    env.update(env_extra or {})
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+        cwd=BASE_DIR, env=env, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def detener_gunicorn(proc: subprocess.Popen):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(proc.pid, signal.SIGKILL)
+
+
+# ==========================================================
+# Corrida y estadísticas
+# ==========================================================
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil por rango más cercano (sin interpolar): siempre es una latencia observada."""
+    if not valores:
+        return None
+    orden = sorted(valores)
+    k = max(1, math.ceil(p / 100 * len(orden)))
+    return orden[k - 1]
+
+
+def _fechas(total: int, repetir: bool, desde: int = 0) -> List[str]:
+    if repetir:
+        return ["01/02/2026"] * total
+    # Fechas distintas por request (no hay hits del cache de resultados).
+    return [f"{1 + i % 28:02d}/{1 + i // 28 % 12:02d}/{2026 + i // 336}" for i in range(desde, desde + total)]
+
+
+def correr(enviar, nombre: str, datos: bytes, total: int, concurrencia: int,
+           repetir: bool = False, desde: int = 0) -> Dict:
+    """Manda *total* requests con *concurrencia* en paralelo y devuelve las métricas."""
+    fechas = _fechas(total, repetir, desde)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        res: List[Resultado] = list(pool.map(lambda f: enviar(nombre, datos, f), fechas))
+    duracion = time.perf_counter() - t0
+
+    ok = [seg for status, seg, _ in res if status == 200]
+    errores: Dict[str, int] = {}
+    for status, _, _ in res:
+        if status != 200:
+            errores[str(status)] = errores.get(str(status), 0) + 1
+
+    def _r(x):
+        return None if x is None else round(x, 3)
+
+    return {
+        "requests": len(res),
+        "ok": len(ok),
+        "tasa_error": round((len(res) - len(ok)) / len(res), 4) if res else 0.0,
+        "errores": errores,
+        "p50_s": _r(percentil(ok, 50)),
+        "p95_s": _r(percentil(ok, 95)),
+        "p99_s": _r(percentil(ok, 99)),
+        "max_s": _r(max(ok) if ok else None),
+        "throughput_rps": round(len(ok) / duracion, 4) if duracion > 0 else 0.0,
+        "duracion_s": round(duracion, 3),
+        "bytes_pdf": max((n for _, _, n in res), default=0),
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def _libros(args) -> List[Tuple[str, str, bytes]]:
+    """Lista de (etiqueta, nombre_archivo, bytes) a probar."""
+    if args.excel is not None:
+        return [(args.excel.name, args.excel.name, args.excel.read_bytes())]
+
+    from libros_sinteticos import generar_libro
+
+    libros = []
+    for n in args.tamanos:
+        libros.append((f"{n}_items", f"sintetico_{n}.xlsx", generar_libro(n, semilla=n)))
+    return libros
+
+
+def imprimir(resultados: Dict[str, Dict], anterior: Optional[Dict[str, Dict]] = None):
+    print(f"{'libro':<16}{'ok':>6}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}")
+    for etiqueta, r in resultados.items():
+        fila = (
+            f"{etiqueta:<16}{r['ok']:>3}/{r['requests']:<2}{r['tasa_error'] * 100:>7.1f}"
+            f"{_fmt(r['p50_s'])}{_fmt(r['p95_s'])}{_fmt(r['p99_s'])}{r['throughput_rps']:>9.3f}"
+        )
+        print(fila)
+        prev = (anterior or {}).get(etiqueta)
+        if prev and prev.get("p50_s") and r.get("p50_s"):
+            print(
+                f"{'  vs anterior':<16}{'':>13}"
+                f"{_delta(prev['p50_s'], r['p50_s'])}{_delta(prev['p95_s'], r['p95_s'])}"
+                f"{_delta(prev['p99_s'], r['p99_s'])}{_delta(prev['throughput_rps'], r['throughput_rps'])}"
+            )
+
+
+def _fmt(x) -> str:
+    return f"{'-':>9}" if x is None else f"{x:>8.2f}s"
+
+
+def _delta(antes, ahora) -> str:
+    if not antes or ahora is None:
+        return f"{'-':>9}"
+    return f"{(ahora - antes) / antes * 100:>+8.0f}%"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Prueba de carga de POST / (ver docstring del módulo).")
+    ap.add_argument("--modo", choices=["cliente", "gunicorn", "url"], default="cliente")
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--puerto", type=int, default=8765, help="puerto del gunicorn local (--modo gunicorn)")
+    ap.add_argument("--excel", type=Path, help="usar este archivo en vez de libros sintéticos")
+    ap.add_argument("--tamanos", type=lambda s: [int(x) for x in s.split(",") if x.strip()],
+                    default=[10, 50, 200], help="ítems por libro sintético (ej: 10,50,200)")
+    ap.add_argument("--requests", type=int, default=8, help="requests por libro")
+    ap.add_argument("--concurrencia", type=int, default=4)
+    ap.add_argument("--repetir", action="store_true", help="misma fecha en todos (hits del cache)")
+    ap.add_argument("--reporte", type=Path, help="escribir el reporte JSON acá")
+    ap.add_argument("--comparar", type=Path, help="reporte JSON anterior para comparar")
+    args = ap.parse_args(argv)
+
+    libros = _libros(args)
+
+    proc = None
+    if args.modo == "cliente":
+        enviar = cliente_flask()
+    else:
+        url = args.url
+        if args.modo == "gunicorn":
+            url = f"http://127.0.0.1:{args.puerto}"
+            proc = iniciar_gunicorn(args.puerto)
+        if not esperar_salud(url):
+            if proc is not None:
+                detener_gunicorn(proc)
+            print(f"El servidor no respondió en {url}/salud")
+            return 1
+        enviar = cliente_http(url)
+
+    resultados: Dict[str, Dict] = {}
+    try:
+        desde = random.randrange(336 * 70)
+        for etiqueta, nombre, datos in libros:
+            resultados[etiqueta] = correr(
+                enviar, nombre, datos, args.requests, args.concurrencia,
+                repetir=args.repetir, desde=desde,
+            )
+            desde += args.requests
+    finally:
+        if proc is not None:
+            detener_gunicorn(proc)
+
+    anterior = None
+    if args.comparar is not None:
+        anterior = json.loads(args.comparar.read_text(encoding="utf-8")).get("resultados")
+
+    print(f"modo={args.modo} requests={args.requests} concurrencia={args.concurrencia} repetir={args.repetir}")
+    imprimir(resultados, anterior)
+
+    if args.reporte is not None:
+        reporte = {
+            "commit": _commit(),
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "maquina": {"cpus": os.cpu_count(), "python": platform.python_version(), "sistema": platform.platform()},
+            "parametros": {
+                "modo": args.modo,
+                "requests": args.requests,
+                "concurrencia": args.concurrencia,
+                "repetir": args.repetir,
+                "libros": [etiqueta for etiqueta, _, _ in libros],
+            },
+            "resultados": resultados,
+        }
+        args.reporte.write_text(json.dumps(reporte, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"reporte: {args.reporte}")
+
+    return 0 if all(r["ok"] == r["requests"] for r in resultados.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+regresion.py
+
+Regresión del PDF contra salidas "golden".
+
+Cualquier optimización de generar_pdf puede mover un número o un texto sin
+que nadie lo note. Este script renderiza un corpus fijo de libros (la planilla
+de ejemplo de uploads/ + libros sintéticos de libros_sinteticos) con el mismo
+pipeline que app.py, extrae con fitz TODO lo que quedó dibujado:
+  - cada span de texto: página, texto, bbox, tamaño de letra y fuente
+  - cada imagen (logo): página y bbox
+y lo compara con lo guardado en golden/<caso>.json.gz. Además mide el tiempo
+de cada render, así un cambio de rendimiento se verifica en una sola corrida:
+salida idéntica + más rápido.
+
+    python regresion.py                    # compara todo el corpus
+    python regresion.py sintetico_3 csv_7  # solo algunos casos
+    python regresion.py --actualizar       # regenera los golden (cambio de salida INTENCIONAL)
+    python regresion.py --reporte t.json   # además guarda los tiempos en JSON
+
+Sale con código 1 si algún caso difiere (o no tiene golden).
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+GOLDEN_DIR = BASE_DIR / "golden"
+
+MATCH_XLSX = BASE_DIR / "match.xlsx"
+DEFAULT_LOGO = BASE_DIR / "logo_default.png"
+FECHA = "01/02/2026"
+
+# Redondeo de coordenadas/tamaños: absorbe ruido de punto flotante de la
+# extracción, pero cualquier corrimiento visible (0.01 pt) cuenta como cambio.
+DECIMALES = 2
+
+
+# ==========================================================
+# Corpus
+# ==========================================================
+
+def _sintetico(n, **kw):
+    def fuente():
+        from libros_sinteticos import generar_libro
+        return io.BytesIO(generar_libro(n, semilla=n, **kw))
+    return fuente
+
+
+def _csv(n):
+    def fuente():
+        from libros_sinteticos import generar_csv
+        return io.BytesIO(generar_csv(n, semilla=n))
+    return fuente
+
+
+def _archivo(ruta):
+    return lambda: Path(ruta)
+
+
+# nombre -> (fuente(), logo)
+CORPUS: Dict[str, tuple] = {
+    # Una hoja con un solo ítem: se tapa la tabla inferior.
+    "sintetico_3": (_sintetico(3), DEFAULT_LOGO),
+    "sintetico_20": (_sintetico(20), DEFAULT_LOGO),
+    # Dos lotes en hojas separadas, ambos impares (dos tapados).
+    "lotes_2": (_sintetico(9, lotes=2, tamanos_lotes=[5, 3]), DEFAULT_LOGO),
+    "csv_7": (_csv(7), DEFAULT_LOGO),
+    # Logo subido por un usuario (jpeg apaisado).
+    "logo_usuario": (_sintetico(4), BASE_DIR / "uploads" / "logo_1766884656.jpeg"),
+    # Planilla real del portal (212 ítems, la más lenta).
+    "planilla_ejemplo": (_archivo(BASE_DIR / "uploads" / "ItemsSolicitados.xlsx"), DEFAULT_LOGO),
+}
+
+
+# ==========================================================
+# Render + extracción
+# ==========================================================
+
+def renderizar(fuente, logo, salida: Path) -> Path:
+    """Mismo pipeline que app.index: lotes del Excel -> match -> generar_pdf_lotes."""
+    from excel_utils import GrupoLote, iterar_lotes_excel
+    from match_utils import iterar_match_a_filas
+    from pdf_utils import generar_pdf_lotes
+
+    grupos = (
+        GrupoLote(g.hoja, g.titulo_llamado, g.texto_lote, iterar_match_a_filas(g.filas, MATCH_XLSX))
+        for g in iterar_lotes_excel(fuente)
+    )
+    return generar_pdf_lotes(grupos, FECHA, logo_path=logo, salida=salida)
+
+
+def extraer(ruta_pdf: Path) -> Dict:
+    """Todo lo dibujado en el PDF, en un formato estable para comparar."""
+    import fitz
+
+    def r(v):
+        return round(v, DECIMALES)
+
+    spans = []
+    imagenes = []
+    with fitz.open(ruta_pdf) as doc:
+        paginas = doc.page_count
+        for page in doc:
+            n = page.number
+            for bloque in page.get_text("dict")["blocks"]:
+                for linea in bloque.get("lines", []):
+                    for s in linea["spans"]:
+                        spans.append([n, s["text"], [r(v) for v in s["bbox"]], r(s["size"]), s["font"]])
+            for img in page.get_image_info():
+                imagenes.append([n, [r(v) for v in img["bbox"]]])
+
+    return {"paginas": paginas, "spans": spans, "imagenes": imagenes}
+
+
+# ==========================================================
+# Golden
+# ==========================================================
+
+def ruta_golden(caso: str) -> Path:
+    return GOLDEN_DIR / f"{caso}.json.gz"
+
+
+def leer_golden(caso: str) -> Optional[Dict]:
+    p = ruta_golden(caso)
+    if not p.exists():
+        return None
+    with gzip.open(p, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def guardar_golden(caso: str, datos: Dict):
+    GOLDEN_DIR.mkdir(exist_ok=True)
+    # mtime=0: el .gz no cambia si el contenido no cambia (diffs limpios en git).
+    with open(ruta_golden(caso), "wb") as f:
+        with gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+            gz.write(json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def diferencias(esperado: Dict, obtenido: Dict, maximo: int = 10) -> List[str]:
+    """Lista legible (acotada a *maximo*) de lo que cambió."""
+    out = []
+    if esperado["paginas"] != obtenido["paginas"]:
+        out.append(f"páginas: {esperado['paginas']} -> {obtenido['paginas']}")
+
+    for clave in ("spans", "imagenes"):
+        a, b = esperado[clave], obtenido[clave]
+        if len(a) != len(b):
+            out.append(f"{clave}: {len(a)} -> {len(b)}")
+        for i, (x, y) in enumerate(zip(a, b)):
+            if x != y:
+                out.append(f"{clave}[{i}]: {x} -> {y}")
+                if len(out) >= maximo:
+                    return out
+    return out
+
+
+# ==========================================================
+# Main
+# ==========================================================
+
+def correr_caso(caso: str, actualizar: bool = False) -> Dict:
+    fuente, logo = CORPUS[caso]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        salida = Path(tmp) / f"{caso}.pdf"
+        t0 = time.perf_counter()
+        renderizar(fuente(), logo, salida)
+        segundos = time.perf_counter() - t0
+        obtenido = extraer(salida)
+        bytes_pdf = salida.stat().st_size
+
+    res = {
+        "caso": caso,
+        "segundos": round(segundos, 3),
+        "paginas": obtenido["paginas"],
+        "paginas_por_seg": round(obtenido["paginas"] / segundos, 2) if segundos > 0 else None,
+        "bytes_pdf": bytes_pdf,
+    }
+
+    if actualizar:
+        guardar_golden(caso, obtenido)
+        res["estado"] = "actualizado"
+        return res
+
+    esperado = leer_golden(caso)
+    if esperado is None:
+        res["estado"] = "sin_golden"
+        return res
+
+    difs = diferencias(esperado, obtenido)
+    res["estado"] = "igual" if not difs else "DIFERENTE"
+    res["diferencias"] = difs
+    return res
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Regresión del PDF contra golden/ (ver docstring del módulo).")
+    ap.add_argument("casos", nargs="*", help=f"casos a correr (default: todos): {', '.join(CORPUS)}")
+    ap.add_argument("--actualizar", action="store_true", help="regenerar los golden con la salida actual")
+    ap.add_argument("--reporte", type=Path, help="guardar tiempos y estados en este JSON")
+    args = ap.parse_args(argv)
+
+    casos = args.casos or list(CORPUS)
+    desconocidos = [c for c in casos if c not in CORPUS]
+    if desconocidos:
+        ap.error(f"casos desconocidos: {', '.join(desconocidos)}")
+
+    resultados = []
+    for caso in casos:
+        res = correr_caso(caso, actualizar=args.actualizar)
+        resultados.append(res)
+        print(f"{caso:<18} {res['estado']:<12} {res['paginas']:>4} pág  {res['segundos']:>8.2f} s  "
+              f"{res['paginas_por_seg'] or 0:>7.2f} pág/s  {res['bytes_pdf'] / 1024:>8.0f} KB")
+        for d in res.get("diferencias", []):
+            print(f"    {d}")
+
+    if args.reporte is not None:
+        args.reporte.write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    fallidos = [r for r in resultados if r["estado"] not in ("igual", "actualizado")]
+    return 1 if fallidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
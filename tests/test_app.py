@@ -0,0 +1,195 @@
+import io
+
+import pytest
+
+import app as app_mod
+from libros_sinteticos import generar_libro
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    from cache_utils import CacheLRU
+
+    monkeypatch.setattr(app_mod, "CACHE_RESULTADOS", CacheLRU(tmp_path / "resultados"))
+    monkeypatch.setattr(app_mod, "CACHE_PREVIEWS", CacheLRU(tmp_path / "previews", extension=".png"))
+    return app_mod.app.test_client()
+
+
+def _form(datos, nombre="libro.xlsx", **extra):
+    return dict(extra, fecha="01/02/2025", excel=(io.BytesIO(datos), nombre))
+
+
+@pytest.mark.parametrize("items", ["abc", "-3", "1.5", "²"])
+def test_preview_rechaza_items_no_enteros(cliente, items):
+    r = cliente.post("/preview", data=_form(generar_libro(3), items=items))
+    assert r.status_code == 400
+
+
+def test_preview_limita_items(cliente, monkeypatch):
+    pedidos = []
+
+    def preview_falso(fuente, fecha, logo_path, match_path, n_items, dpi):
+        pedidos.append((n_items, dpi))
+        return b"\x89PNG"
+
+    monkeypatch.setattr(app_mod, "generar_preview_desglose", preview_falso)
+    r = cliente.post("/preview", data=_form(generar_libro(3), items="100000", dpi="9999"))
+    assert r.status_code == 200
+    from pdf_utils import PREVIEW_DPI_MAX, PREVIEW_ITEMS_MAX
+    assert pedidos == [(PREVIEW_ITEMS_MAX, PREVIEW_DPI_MAX)]
+
+
+def test_desglose_sin_encabezados_es_400(cliente):
+    r = cliente.post("/", data=_form(b"a;b\n1;2\n", nombre="libro.csv"))
+    assert r.status_code == 400
+
+
+def _items_api(n):
+    return [
+        {"item": i, "descripcion": f"Cable {i}", "unidad_medida": "UNIDAD", "presentacion": "EVENTO",
+         "cantidad": 1, "precio_unitario_iva_incl": 100000, "precio_total_iva_incl": 100000}
+        for i in range(1, n + 1)
+    ]
+
+
+def test_api_desglose_zip_trae_pdf_y_planilla(cliente):
+    import zipfile
+
+    from openpyxl import load_workbook
+
+    cuerpo = {"titulo": "Llamado", "lote": "Lote 1", "fecha": "01/02/2025", "items": _items_api(3)}
+    r = cliente.post("/api/desglose?formato=zip", json=cuerpo)
+    assert r.status_code == 200
+    assert r.mimetype == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(r.data)) as z:
+        assert sorted(z.namelist()) == ["desglose.xlsx", "output.pdf"]
+        assert z.read("output.pdf").startswith(b"%PDF")
+        ws = load_workbook(io.BytesIO(z.read("desglose.xlsx"))).worksheets[0]
+        assert ws.max_row == 3 + 3
+
+
+def test_api_desglose_formato_desconocido(cliente):
+    r = cliente.post("/api/desglose?formato=docx", json={"items": _items_api(1)})
+    assert r.status_code == 400
+
+
+def _calculo_json(cliente, items):
+    return cliente.post("/api/calculo", json={"titulo": "Llamado", "lote": "Lote 1", "items": items})
+
+
+def test_api_numeros_json_se_toman_como_numeros(cliente):
+    items = _items_api(1)
+    items[0].update(cantidad=2.5, precio_unitario_iva_incl=1000, precio_total_iva_incl=2500)
+    r = _calculo_json(cliente, items)
+    assert r.status_code == 200
+    assert r.get_json()["lotes"][0]["items"][0]["cantidad"] == 2.5
+
+
+@pytest.mark.parametrize("valor, esperado", [("1.234.567", 1234567.0), ("2,5", 2.5), ("1500", 1500.0)])
+def test_api_textos_numericos_no_ambiguos(cliente, valor, esperado):
+    items = _items_api(1)
+    items[0]["cantidad"] = valor
+    r = _calculo_json(cliente, items)
+    assert r.status_code == 200
+    assert r.get_json()["lotes"][0]["items"][0]["cantidad"] == esperado
+
+
+@pytest.mark.parametrize("valor", ["2.5", "1.234", "abc", "1,2,3", True, [1]])
+def test_api_rechaza_numeros_ambiguos_o_invalidos(cliente, valor):
+    items = _items_api(1)
+    items[0]["precio_unitario_iva_incl"] = valor
+    r = _calculo_json(cliente, items)
+    assert r.status_code == 400
+    assert b"precio_unitario_iva_incl" in r.data
+
+
+def test_api_csv_separador_de_la_fila_de_encabezados(cliente):
+    cuerpo = (
+        "item;descripcion;unidad_medida;presentacion;cantidad\n"
+        "1;Cable, cobre, 2 mm;UNIDAD;EVENTO;2\n"
+        "2;Caño;UNIDAD;EVENTO;1.500\n"
+    ).encode("utf-8")
+    r = cliente.post("/api/calculo", data=cuerpo, content_type="text/csv")
+    assert r.status_code == 200
+    items = r.get_json()["lotes"][0]["items"]
+    assert [(i["descripcion"], i["cantidad"]) for i in items] == [("Cable, cobre, 2 mm", 2.0), ("Caño", 1500.0)]
+
+
+@pytest.mark.parametrize("ruta", ["/api/calculo", "/api/desglose"])
+def test_api_csv_item_no_ascii_se_descarta(cliente, ruta):
+    cuerpo = (
+        "item;descripcion;unidad_medida;presentacion;cantidad\n"
+        "²;Cable;UNIDAD;EVENTO;2\n"
+        "1;Caño;UNIDAD;EVENTO;1\n"
+    ).encode("utf-8")
+    r = cliente.post(ruta, data=cuerpo, content_type="text/csv")
+    assert r.status_code == 200
+    if ruta == "/api/calculo":
+        assert [i["item"] for i in r.get_json()["lotes"][0]["items"]] == ["1"]
+
+
+def test_desglose_suelta_logo_y_excel_al_terminar(cliente, monkeypatch):
+    from upload_utils import AlmacenUploads
+
+    almacen = AlmacenUploads(app_mod.UPLOADS)
+    monkeypatch.setattr(app_mod, "ALMACEN_UPLOADS", almacen)
+    monkeypatch.setattr(app_mod, "UMBRAL_MEMORIA_BYTES", 0)    # el Excel va a disco
+    logo = open(app_mod.DEFAULT_LOGO, "rb").read()
+    r = cliente.post("/", data=_form(generar_libro(3), logo=(io.BytesIO(logo), "logo.png")))
+    assert r.status_code == 200
+    assert almacen.retenidos() == []
+    assert list(almacen.dir_excel.iterdir()) == []
+
+
+def test_multipart_se_recibe_sin_el_temporal_de_werkzeug(cliente, monkeypatch):
+    import werkzeug.wrappers.request as wz
+    from upload_utils import AlmacenUploads
+
+    def prohibido(*args, **kwargs):
+        raise AssertionError("werkzeug no debe bufferear el upload")
+
+    monkeypatch.setattr(wz, "default_stream_factory", prohibido)
+    almacen = AlmacenUploads(app_mod.UPLOADS)
+    monkeypatch.setattr(app_mod, "ALMACEN_UPLOADS", almacen)
+    monkeypatch.setattr(app_mod, "UMBRAL_MEMORIA_BYTES", 0)
+    r = cliente.post("/", data=_form(generar_libro(3), otro=(io.BytesIO(b"sin leer"), "otro.txt")))
+    assert r.status_code == 200
+    # El campo que ninguna vista leyó también se borró al cerrar el request.
+    assert list(almacen.dir_excel.iterdir()) == [] and almacen.retenidos() == []
+
+
+@pytest.mark.parametrize("ruta", ["/", "/preview", "/api/calculo", "/api/desglose"])
+def test_todo_post_arranca_el_barrido(cliente, monkeypatch, ruta):
+    arrancados = []
+    monkeypatch.setattr(app_mod.ALMACEN_UPLOADS, "asegurar_barrido", lambda: arrancados.append(ruta))
+    cliente.post(ruta, data=_form(generar_libro(3)))
+    assert arrancados == [ruta]
+
+
+def test_pdf_se_envia_aunque_lo_expulsen_del_cache(cliente, monkeypatch):
+    cache = app_mod.CACHE_RESULTADOS
+    put, get = cache.put, cache.get
+    libro = generar_libro(3)    # el mismo para los tres requests (generar_libro lleva la hora)
+
+    def put_y_expulsar(clave, origen, mover=False):
+        destino = put(clave, origen, mover)
+        destino.unlink()
+        return destino
+
+    monkeypatch.setattr(cache, "put", put_y_expulsar)
+    r = cliente.post("/", data=_form(libro))
+    assert r.status_code == 200 and r.data.startswith(b"%PDF")
+
+    # Hit: la entrada se borra entre get y send_file.
+    monkeypatch.setattr(cache, "put", put)
+    assert cliente.post("/", data=_form(libro)).status_code == 200
+
+    def get_y_expulsar(clave):
+        f = get(clave)
+        cache.ruta(clave).unlink()
+        return f
+
+    monkeypatch.setattr(cache, "get", get_y_expulsar)
+    r = cliente.post("/", data=_form(libro))
+    assert r.status_code == 200 and r.data.startswith(b"%PDF")
+    assert list(cache.directorio.glob("*.pdf")) == []
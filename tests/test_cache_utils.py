@@ -0,0 +1,53 @@
+import os
+
+from cache_utils import CacheLRU, clave_resultado, hash_archivo, hash_bytes
+
+
+def test_hash_archivo_igual_a_hash_bytes_y_se_invalida(tmp_path):
+    p = tmp_path / "a.bin"
+    p.write_bytes(b"hola")
+    assert hash_archivo(p) == hash_bytes(b"hola")
+    p.write_bytes(b"chau!")
+    assert hash_archivo(p) == hash_bytes(b"chau!")
+    assert hash_archivo(tmp_path / "no_existe") == ""
+
+
+def test_clave_resultado_depende_de_cada_entrada(tmp_path):
+    match = tmp_path / "match.xlsx"
+    match.write_bytes(b"m")
+    base = clave_resultado("e", "01/01/2024", "l", match, tmp_path / "t.pdf")
+    assert base == clave_resultado("e", " 01/01/2024 ", "l", match, tmp_path / "t.pdf")
+    assert base != clave_resultado("e2", "01/01/2024", "l", match, tmp_path / "t.pdf")
+    assert base != clave_resultado("e", "02/01/2024", "l", match, tmp_path / "t.pdf")
+    assert base != clave_resultado("e", "01/01/2024", "l2", match, tmp_path / "t.pdf")
+
+
+def test_cache_lru_expulsa_el_menos_usado(tmp_path):
+    cache = CacheLRU(tmp_path, max_bytes=25)
+    for i, clave in enumerate(("a", "b")):
+        cache.put_bytes(clave, b"x" * 10)
+        os.utime(cache.ruta(clave), ns=(i * 10 ** 9, i * 10 ** 9))
+    cache.get("a").close()  # "a" pasa a ser el más reciente
+    cache.put_bytes("c", b"x" * 10)
+    assert cache.get("b") is None
+    assert cache.leer("a") == b"x" * 10 and cache.leer("c") is not None
+
+
+def test_cache_lru_put_mover(tmp_path):
+    cache = CacheLRU(tmp_path)
+    tmp = cache.ruta_temporal()
+    tmp.write_bytes(b"pdf")
+    destino = cache.put("k", tmp, mover=True)
+    assert not tmp.exists() and destino.read_bytes() == b"pdf"
+    with cache.get("k") as f:
+        assert f.name == str(destino)
+
+
+def test_cache_lru_get_sobrevive_a_la_expulsion(tmp_path):
+    cache = CacheLRU(tmp_path)
+    cache.put_bytes("k", b"pdf")
+    f = cache.get("k")
+    cache.ruta("k").unlink()    # otro worker la expulsa antes de enviarla
+    with f:
+        assert f.read() == b"pdf"
+    assert cache.get("k") is None and cache.leer("k") is None
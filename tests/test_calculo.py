@@ -0,0 +1,51 @@
+import pytest
+
+from calculo import (
+    CLAVES_PARTES,
+    CLAVES_RESUMEN,
+    COLUMNAS_CSV,
+    _round_half_up,
+    calcular_filas,
+    calcular_item,
+    calcular_resumen_desde_total,
+    total_iva_incl,
+)
+from modelos import FilaItem
+
+
+@pytest.mark.parametrize("x,esperado", [(0.5, 1), (1.5, 2), (2.5, 3), (2.4999, 2), ("10.5", 11)])
+def test_round_half_up_no_es_bankers(x, esperado):
+    assert _round_half_up(x) == esperado
+
+
+@pytest.mark.parametrize("total", [0, 1, 11, 99, 1000, 123456.5, 987654321])
+def test_resumen_entero_y_cuadra(total):
+    r = calcular_resumen_desde_total(total)
+    assert list(r) == CLAVES_RESUMEN
+    assert all(isinstance(v, int) and v >= 0 for v in r.values())
+    assert r["CU"] == r["CDT"] + r["GG"] + r["BEL"]
+    assert r["CU"] + r["IVA"] == r["CU_IVA"] == _round_half_up(total)
+
+
+def test_resumen_sin_total_es_cero():
+    assert set(calcular_resumen_desde_total(None).values()) == {0}
+
+
+def test_total_iva_incl_reconstruye_desde_unitario():
+    assert total_iva_incl(FilaItem(precio_total_iva_incl=500)) == 500
+    assert total_iva_incl(FilaItem(precio_unitario_iva_incl=120, cantidad=3)) == 360
+    assert total_iva_incl(FilaItem(precio_unitario_iva_incl=120)) is None
+
+
+def test_calcular_item_y_salidas():
+    fila = {"item": 7, "descripcion": "Cable", "cantidad": 2.0,
+            "precio_total_iva_incl": 1100000, "tipo_item": "servicio"}
+    calc = calcular_item(fila)
+    assert calc.resumen["CU_IVA"] == 1100000 and calc.resumen["IVA"] == 100000
+
+    d = calc.a_dict()
+    assert d["item"] == 7 and list(d["partes"]) == CLAVES_PARTES
+    assert len(calc.a_fila_csv()) == len(COLUMNAS_CSV) - 2  # sin hoja/lote
+
+    # Mismo resultado con el Random compartido de calcular_filas.
+    assert [c.detalles for c in calcular_filas([fila, fila])] == [calc.detalles, calc.detalles]
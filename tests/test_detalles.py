@@ -0,0 +1,79 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+
+from detalles import (
+    COLUMNAS,
+    DET_A_HORAS_MAX,
+    DET_A_HORAS_MIN,
+    DET_B_HORAS_MAX,
+    DET_B_HORAS_MIN,
+    _dividir_redondeando,
+    _horas_que_dividen,
+    _tabla_divisores,
+    calcular_detalles,
+    calcular_detalles_lote,
+    detalles_a_dict,
+    semilla_item,
+)
+
+PARTES = {"A": 123456, "B": 45000, "D": 0, "E": 7777, "F": 9876}
+
+
+@pytest.mark.parametrize("a,b", [(0, 1), (5, 2), (7, 2), (10, 4), (14, 4), (999, 7), (123457, 3)])
+def test_dividir_redondeando_es_half_up(a, b):
+    esperado = int((Decimal(a) / Decimal(b)).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    assert _dividir_redondeando(a, b) == esperado
+
+
+def test_tabla_divisores_coincide_con_probar_cada_hora():
+    m, tabla = _tabla_divisores(DET_A_HORAS_MIN, DET_A_HORAS_MAX)
+    assert m == 2520 and len(tabla) == m
+    for total in (0, 1, 7, 60, 2519, 2520, 123456, 10 ** 9 + 7):
+        esperado = tuple(h for h in range(DET_A_HORAS_MIN, DET_A_HORAS_MAX + 1) if total % h == 0)
+        assert _horas_que_dividen(total, DET_A_HORAS_MIN, DET_A_HORAS_MAX) == esperado
+
+
+def test_tabla_divisores_rango_grande_sin_tabla():
+    m, tabla = _tabla_divisores(1, 40)
+    assert tabla is None and m > 1 << 16
+    assert _horas_que_dividen(120, 1, 40) == tuple(h for h in range(1, 41) if 120 % h == 0)
+
+
+def test_semilla_item_numerico_y_texto_estable():
+    assert semilla_item(" 42 ", "x") == 42
+    assert semilla_item("²", "Cable") == semilla_item("x", "Cable")
+    s = semilla_item("A-1", "Cable unipolar")
+    assert s == semilla_item("B-2", "Cable unipolar")
+    assert 0 <= s < 1000000
+
+
+def test_calcular_detalles_reproducible_y_cuadra_con_las_partes():
+    d1 = calcular_detalles(PARTES, 17, 3)
+    d2 = calcular_detalles_lote([(PARTES, 17, 3), (PARTES, 17, 3)])
+    assert d2 == [d1, d1]
+
+    horas, costo_hora, total_a = d1["A"]
+    assert DET_A_HORAS_MIN <= horas <= DET_A_HORAS_MAX
+    assert total_a == PARTES["A"] and costo_hora == PARTES["A"] // horas
+    # 123456 es divisible por 2, 3, 4, 6 y 8: se elige una hora exacta.
+    assert PARTES["A"] % horas == 0
+
+    qty, horas_b, costo_b, total_b = d1["B"]
+    assert qty == 3 and DET_B_HORAS_MIN <= horas_b <= DET_B_HORAS_MAX
+    assert total_b == PARTES["B"] and costo_b * qty * horas_b == PARTES["B"]
+
+    assert d1["E"] == (3, _dividir_redondeando(PARTES["E"], 3), PARTES["E"])
+    assert d1["F"][3] == PARTES["F"]
+
+
+def test_calcular_detalles_sin_b_ni_e():
+    d = calcular_detalles({"A": 100, "F": 50}, 1, None)
+    assert d["B"] is None and d["E"] is None
+
+
+def test_detalles_a_dict_usa_las_columnas():
+    out = detalles_a_dict(calcular_detalles(PARTES, 5, 2.4))
+    for parte, columnas in COLUMNAS.items():
+        assert tuple(out[parte]) == columnas
+    assert out["F"]["dtm"] == round(out["F"]["dtm"], 2)
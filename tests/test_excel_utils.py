@@ -0,0 +1,241 @@
+import io
+import zipfile
+
+import pytest
+
+from excel_utils import (
+    CorteLectura,
+    contar_items_por_lote,
+    detectar_formato,
+    estimar_items_por_lote,
+    iterar_items_y_descripciones_excel,
+    iterar_lotes_excel,
+)
+from libros_sinteticos import generar_csv, generar_libro
+
+
+def test_estimar_items_igual_al_conteo_xlsx():
+    libro = generar_libro(30, lotes=2, tamanos_lotes=[10, 20])
+    assert estimar_items_por_lote(io.BytesIO(libro)) == contar_items_por_lote(io.BytesIO(libro)) == [10, 20]
+
+
+def _libro_con_ruido():
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
+    wb = Workbook()
+    portada = wb.active
+    portada.title = "Portada"
+    for r in range(1, 40):
+        portada.append([f"Texto {r}", r])
+    ws = wb.create_sheet("Lote 1")
+    ws.append(["Ítems del llamado OBRA con ID: 1"])
+    ws.append(["Lote 1"])
+    ws.append([])
+    ws.append(["Ítem", "Descripción del Bien", "Cantidad"])
+    for i in range(1, 13):
+        ws.append([i, f"Ítem {i}", 1])
+    ws.append(["firma", None, None])           # ítem inválido en la columna Ítem: cota
+    ws.append([None, "Observaciones", "x"])    # sin valor en la columna Ítem: no suma
+    for r in range(ws.max_row + 1, ws.max_row + 50):
+        ws.cell(r, 1).font = Font(bold=True)   # filas solo con formato
+    reporte = wb.create_sheet("reporte")
+    for r in range(1, 60):
+        reporte.append([r, f"Resumen {r}"])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def test_estimar_items_solo_debajo_de_los_encabezados():
+    libro = _libro_con_ruido()
+    assert contar_items_por_lote(io.BytesIO(libro)) == [12]
+    assert estimar_items_por_lote(io.BytesIO(libro)) == [13]
+
+
+def test_estimar_items_xls_y_csv_como_el_conteo():
+    libro = _libro_xls([("Portada", [["Nada"]]), ("Lote 1", _hoja(1, 2)), ("Lote 2", _hoja(3))])
+    assert estimar_items_por_lote(io.BytesIO(libro)) == contar_items_por_lote(io.BytesIO(libro)) == [2, 1]
+    datos = generar_csv(7)
+    assert estimar_items_por_lote(io.BytesIO(datos)) == contar_items_por_lote(io.BytesIO(datos)) == [7]
+
+
+def test_estimar_items_sin_encabezados_es_error():
+    with pytest.raises(ValueError, match="encabezados"):
+        estimar_items_por_lote(io.BytesIO(b"a;b\n1;2\n"))
+
+
+def test_estimar_items_respeta_la_posicion_del_buffer():
+    buf = io.BytesIO(generar_libro(5))
+    estimar_items_por_lote(buf)
+    assert buf.tell() == 0
+
+
+_ENCABEZADO_CSV = "Ítem;Descripción del Bien;Unidad de Medida;Presentación;Cantidad\n"
+
+
+def _csv(*lineas):
+    return io.BytesIO((_ENCABEZADO_CSV + "".join(l + "\n" for l in lineas)).encode("utf-8"))
+
+
+def _items(lote):
+    return [f["item"] for f in lote.filas]
+
+
+def test_corte_por_filas_vacias_seguidas():
+    fuente = _csv("1;Cable;UNIDAD;EVENTO;1", *[";;;;"] * 4, "2;Caño;UNIDAD;EVENTO;1")
+    (lote,) = iterar_lotes_excel(fuente, max_filas_vacias=3)
+    assert _items(lote) == [1]
+    assert lote.corte == CorteLectura("csv", ultima_fila=2, filas_sin_leer=None)
+
+
+def test_filas_con_contenido_no_cuentan_como_vacias():
+    invalidas = ["firma;;;;", "x;Sin número;;;", ";Sin ítem;;;", "3;;;;"]
+    fuente = _csv("1;Cable;UNIDAD;EVENTO;1", *invalidas * 2, "2;Caño;UNIDAD;EVENTO;1")
+    (lote,) = iterar_lotes_excel(fuente, max_filas_vacias=3)
+    assert _items(lote) == [1, 2]
+    assert lote.corte is None
+
+
+def test_filas_con_espacios_son_vacias():
+    fuente = _csv("1;Cable;UNIDAD;EVENTO;1", " ; ;;;", ";;;;", "2;Caño;UNIDAD;EVENTO;1")
+    (lote,) = iterar_lotes_excel(fuente, max_filas_vacias=2)
+    assert _items(lote) == [1]
+    assert lote.corte.ultima_fila == 2
+
+
+def test_sin_limite_lee_hasta_el_final():
+    fuente = _csv("1;Cable;UNIDAD;EVENTO;1", *[";;;;"] * 10, "2;Caño;UNIDAD;EVENTO;1")
+    (lote,) = iterar_lotes_excel(fuente, max_filas_vacias=0)
+    assert _items(lote) == [1, 2]
+    assert lote.corte is None
+
+
+@pytest.mark.parametrize("item", ["²", "①", "٣"])
+def test_csv_item_con_digito_no_ascii_no_es_valido(item):
+    fuente = _csv("1;Cable;UNIDAD;EVENTO;1", f"{item};Caño;UNIDAD;EVENTO;1")
+    (lote,) = iterar_lotes_excel(fuente)
+    assert _items(lote) == [1]
+
+
+def test_corte_xlsx_informa_filas_declaradas_sin_leer():
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Ítem", "Descripción del Bien"])
+    ws.append([1, "Cable"])
+    ws.cell(row=50, column=1).number_format = "0.00"   # fila solo con formato
+    buf = io.BytesIO()
+    wb.save(buf)
+    (lote,) = iterar_lotes_excel(io.BytesIO(buf.getvalue()), max_filas_vacias=5)
+    assert _items(lote) == [1]
+    assert lote.corte == CorteLectura(ws.title, ultima_fila=2, filas_sin_leer=43)
+
+
+# ----------------------------------------------------------
+# Detección de formato y lectores
+# ----------------------------------------------------------
+
+def _libro_xls(hojas, activa=0):
+    xlwt = pytest.importorskip("xlwt")
+    wb = xlwt.Workbook()
+    for k, (nombre, filas) in enumerate(hojas):
+        ws = wb.add_sheet(nombre)
+        ws.set_selected(k == activa)
+        for r, fila in enumerate(filas):
+            for c, valor in enumerate(fila):
+                ws.write(r, c, valor)
+    wb.active_sheet = activa
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _hoja(*items):
+    return [["Ítem", "Descripción del Bien", "Cantidad"]] + [[i, f"Ítem {i}", 1] for i in items]
+
+
+def test_detectar_formato():
+    assert detectar_formato(io.BytesIO(generar_libro(2))) == "xlsx"
+    assert detectar_formato(io.BytesIO(generar_csv(2))) == "csv"
+    assert detectar_formato(io.BytesIO(_libro_xls([("a", _hoja(1))]))) == "xls"
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("xl/workbook.xml", "")
+        z.writestr("xl/vbaProject.bin", b"")
+    assert detectar_formato(io.BytesIO(buf.getvalue())) == "xlsm"
+
+
+def test_detectar_formato_desde_ruta(tmp_path):
+    ruta = tmp_path / "libro.xlsx"
+    ruta.write_bytes(generar_libro(2))
+    assert detectar_formato(ruta) == "xlsx"
+
+
+@pytest.mark.parametrize("datos", [generar_libro(2), generar_csv(2)])
+def test_detectar_formato_respeta_la_posicion(datos):
+    # Fuente que no empieza en el byte 0 del buffer (p. ej. un adjunto dentro de otro stream).
+    buf = io.BytesIO(b"cabecera;" + datos)
+    buf.seek(len(b"cabecera;"))
+    detectar_formato(buf)
+    assert buf.tell() == len(b"cabecera;")
+
+
+@pytest.mark.parametrize("datos", [
+    b"PK\x03\x04 no es un zip",          # xlsx truncado o dañado
+    bytes(range(256)) * 4,               # binario cualquiera
+    b"%PDF-1.7\n\x00\x01\x02",
+])
+def test_detectar_formato_rechaza_binarios_desconocidos(datos):
+    with pytest.raises(ValueError):
+        detectar_formato(io.BytesIO(datos))
+
+
+def test_csv_latin1_es_texto():
+    datos = _ENCABEZADO_CSV.encode("latin-1") + "1;Caño;UNIDAD;EVENTO;1\n".encode("latin-1")
+    assert detectar_formato(io.BytesIO(datos)) == "csv"
+    (lote,) = iterar_lotes_excel(io.BytesIO(datos))
+    assert [f["descripcion"] for f in lote.filas] == ["Caño"]
+
+
+@pytest.mark.parametrize("separador", [";", ","])
+def test_lector_csv_separadores(separador):
+    lineas = ["Ítems del llamado X, con comas, sueltas", "Lote 1", "Ítem;Descripción del Bien;Cantidad",
+              "1;Cable;2", "2;Caño;3"]
+    datos = "\n".join(l.replace(";", separador) for l in lineas).encode("utf-8")
+    (lote,) = iterar_lotes_excel(io.BytesIO(datos))
+    assert lote.titulo_llamado.startswith("Ítems del llamado X")
+    assert [(f["item"], f["descripcion"], f["cantidad"]) for f in lote.filas] == [(1, "Cable", 2.0), (2, "Caño", 3.0)]
+
+
+def test_lector_xlsx_todas_las_hojas():
+    libro = generar_libro(5, lotes=2, tamanos_lotes=[2, 3])
+    lotes = [(g.hoja, len(list(g.filas))) for g in iterar_lotes_excel(io.BytesIO(libro))]
+    assert lotes == [("Lote 1", 2), ("Lote 2", 3)]
+
+
+def test_lector_xls_todas_las_hojas():
+    libro = _libro_xls([("Portada", [["Nada"]]), ("Lote 1", _hoja(1, 2)), ("Lote 2", _hoja(3))])
+    lotes = [(g.hoja, [f["item"] for f in g.filas]) for g in iterar_lotes_excel(io.BytesIO(libro))]
+    assert lotes == [("Lote 1", [1, 2]), ("Lote 2", [3])]
+
+
+def test_lector_xls_hoja_activa():
+    libro = _libro_xls([("Lote 1", _hoja(1)), ("Lote 2", _hoja(7, 8))], activa=1)
+    _, _, filas = iterar_items_y_descripciones_excel(io.BytesIO(libro))
+    assert [f["item"] for f in filas] == [7, 8]
+
+
+def test_lector_xls_descarga_cada_hoja_al_terminar(monkeypatch):
+    import xlrd
+
+    descargadas = []
+    original = xlrd.book.Book.unload_sheet
+    monkeypatch.setattr(xlrd.book.Book, "unload_sheet",
+                        lambda self, i: (descargadas.append(i), original(self, i)))
+    libro = _libro_xls([("Lote 1", _hoja(1)), ("Lote 2", _hoja(2))])
+    for g in iterar_lotes_excel(io.BytesIO(libro)):
+        list(g.filas)
+    assert descargadas == [0, 1]
@@ -0,0 +1,38 @@
+import io
+
+from openpyxl import load_workbook
+
+from calculo import calcular_filas
+from exportar import COLUMNAS_XLSX, EscritorXlsx
+from modelos import FilaItem
+
+
+def _fila(descripcion, item=1):
+    return FilaItem(
+        item=item, descripcion=descripcion, unidad_medida="UNIDAD", presentacion="EVENTO",
+        cantidad=2.0, precio_unitario_iva_incl=150000.0, precio_total_iva_incl=300000.0,
+    )
+
+
+def _leer(xlsx):
+    return list(load_workbook(io.BytesIO(xlsx)).worksheets[0].iter_rows(values_only=False))
+
+
+def test_textos_tipo_formula_quedan_como_texto():
+    escritor = EscritorXlsx()
+    filas = [_fila('=HYPERLINK("http://x","y")'), _fila("+54 cable", item=2), _fila("@SUM(A1)", item=3)]
+    list(escritor.registrar("Lote 1", "=1+1", "-Lote 1", calcular_filas(filas)))
+    filas_xlsx = _leer(escritor.guardar())
+
+    assert (filas_xlsx[0][0].value, filas_xlsx[0][0].data_type) == ("=1+1", "s")
+    assert (filas_xlsx[1][0].value, filas_xlsx[1][0].data_type) == ("-Lote 1", "s")
+    col = COLUMNAS_XLSX.index("descripcion")
+    descripciones = [(f[col].value, f[col].data_type) for f in filas_xlsx[3:]]
+    assert descripciones == [('=HYPERLINK("http://x","y")', "s"), ("+54 cable", "s"), ("@SUM(A1)", "s")]
+
+
+def test_numeros_siguen_siendo_numeros():
+    escritor = EscritorXlsx()
+    list(escritor.registrar("Lote 1", "", "", calcular_filas([_fila("Cable")])))
+    fila = _leer(escritor.guardar())[3]
+    assert fila[COLUMNAS_XLSX.index("item")].data_type == "n"
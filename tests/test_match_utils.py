@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from match_utils import aplicar_match_a_filas, iterar_match_a_filas
+from modelos import FilaItem
+
+MATCH = Path(__file__).resolve().parent.parent / "match.xlsx"
+
+
+def test_iterar_match_es_perezoso_y_completa_en_el_lugar():
+    consumidas = []
+
+    def filas():
+        for i in (1, 2):
+            consumidas.append(i)
+            yield FilaItem(item=i, descripcion="Cable unipolar")
+
+    it = iterar_match_a_filas(filas(), MATCH)
+    assert consumidas == []
+    primera = next(it)
+    assert consumidas == [1]
+    assert primera.texto_transporte == "Transporte terrestre" and primera.texto_equipos
+
+
+def test_iterar_y_aplicar_dan_lo_mismo():
+    filas = [{"item": 1, "descripcion": "Cable unipolar"}, {"item": 2, "descripcion": "Mano de obra pintura"}]
+    originales = [FilaItem.desde(f, copiar=True) for f in filas]
+    copias = aplicar_match_a_filas([FilaItem.desde(f) for f in filas], MATCH)
+    assert list(iterar_match_a_filas(filas, MATCH)) == copias
+    assert copias[0] != originales[0]  # se agregaron los campos del match
+
+
+def test_aplicar_match_conserva_claves_extra():
+    (fila,) = aplicar_match_a_filas([{"item": 1, "descripcion": "Cable", "foo": 1}], MATCH)
+    assert fila["foo"] == 1 and fila.texto_transporte
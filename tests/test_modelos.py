@@ -0,0 +1,51 @@
+import pytest
+
+from modelos import CAMPOS, FilaItem
+
+
+def test_desde_dict_completa_los_defaults():
+    fila = FilaItem.desde({"item": 3, "descripcion": "Cable", "cantidad": 2.0})
+    assert (fila.item, fila.descripcion, fila.cantidad) == (3, "Cable", 2.0)
+    assert fila.unidad_medida == "" and fila.tipo_item == "ambiguo"
+
+
+def test_desde_conserva_claves_desconocidas():
+    fila = FilaItem.desde({"item": 1, "descripcion": "Cable", "foo": 1})
+    assert fila.extras == {"foo": 1}
+    assert fila["foo"] == 1 and dict(fila) == dict(fila.a_dict(), foo=1)
+    assert "foo" not in fila.a_dict()
+    copia = fila.copia()
+    copia["foo"] = 2
+    assert fila["foo"] == 1
+
+
+def test_desde_filaitem_sin_copia_y_con_copia():
+    fila = FilaItem(item=1, descripcion="Cable")
+    assert FilaItem.desde(fila) is fila
+    copia = FilaItem.desde(fila, copiar=True)
+    assert copia is not fila and copia == fila
+
+
+def test_desde_otro_valor_es_la_descripcion():
+    assert FilaItem.desde("Cable").descripcion == "Cable"
+
+
+def test_mapping_compatible_con_dict():
+    fila = FilaItem(item=1, descripcion="Cable", cantidad=2.0)
+    assert list(fila) == list(CAMPOS) and len(fila) == len(CAMPOS)
+    assert fila["descripcion"] == "Cable" and fila.get("cantidad") == 2.0
+    assert dict(fila) == fila.a_dict()
+    assert "item" in fila and "otro" not in fila
+    fila["tipo_item"] = "bien"
+    assert fila.tipo_item == "bien"
+    with pytest.raises(KeyError):
+        fila["otro"]
+    fila["otro"] = 1    # como en un dict: queda en extras
+    assert fila["otro"] == 1 and list(fila)[-1] == "otro" and len(fila) == len(CAMPOS) + 1
+
+
+def test_sin_dict_por_instancia():
+    fila = FilaItem()
+    assert not hasattr(fila, "__dict__")
+    with pytest.raises(AttributeError):
+        fila.otro = 1
@@ -0,0 +1,59 @@
+import random
+
+import fitz
+import pytest
+
+from pdf_utils import maquetar_caja
+
+CAJA = fitz.Rect(0, 0, 120, 30)
+
+
+def _insertar(rect, texto, size):
+    doc = fitz.open()
+    try:
+        page = doc.new_page()
+        return page.insert_textbox(rect, texto, fontsize=size, fontname="helv")
+    finally:
+        doc.close()
+
+
+@pytest.mark.parametrize("texto", ["", "\n", "  "])
+def test_texto_vacio_usa_el_tamano_maximo(texto):
+    assert maquetar_caja(CAJA, texto, 7.0, 4.5, 3) == (7.0, CAJA)
+
+
+def test_texto_corto_entra_con_el_maximo():
+    assert maquetar_caja(CAJA, "Cable", 7.0, 4.5, 3) == (7.0, CAJA)
+
+
+def test_texto_largo_baja_hasta_entrar():
+    texto = "Mantenimiento preventivo de equipos de aire acondicionado tipo split " * 2
+    size, rect = maquetar_caja(CAJA, texto, 7.0, 4.5, 3)
+    assert 4.5 <= size < 7.0
+    assert rect == CAJA
+    assert _insertar(rect, texto, size) >= 0
+    # El tamaño siguiente (0.1 más) ya no entra.
+    assert maquetar_caja(CAJA, texto, round(size + 0.1, 1), round(size + 0.1, 1), 3)[1] != CAJA
+
+
+def test_sin_lugar_estira_la_caja_con_el_minimo():
+    texto = "palabra " * 200
+    size, rect = maquetar_caja(CAJA, texto, 7.0, 4.5, 3)
+    assert size == 4.5
+    assert rect.y1 > CAJA.y1 and (rect.x0, rect.y0, rect.x1) == (CAJA.x0, CAJA.y0, CAJA.x1)
+    assert _insertar(rect, texto, size) >= 0
+
+
+def test_caracteres_fuera_de_latin1():
+    size, rect = maquetar_caja(CAJA, "Cable Ω 2×4 mm² — “cobre”", 7.0, 4.5, 3)
+    assert _insertar(rect, "Cable Ω 2×4 mm² — “cobre”", size) >= 0
+
+
+def test_coincide_con_insert_textbox():
+    azar = random.Random(0)
+    palabras = ["a", "cable", "mantenimiento", "de", "EQUIPOS", "1.234", "x" * 25, "tipo\tsplit"]
+    for _ in range(200):
+        texto = " ".join(azar.choice(palabras) for _ in range(azar.randint(1, 40)))
+        rect = fitz.Rect(0, 0, azar.uniform(30, 200), azar.uniform(8, 40))
+        size, usado = maquetar_caja(rect, texto, 7.0, 3.0, 4)
+        assert _insertar(usado, texto, size) >= 0, (texto, rect, size)
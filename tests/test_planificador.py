@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+import planificador
+from planificador import Planificador, Saturado, costo_estimado, paginas_estimadas
+
+
+def _esperar_cola(plan, n, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while plan.estado()["en_cola"] < n:
+        assert time.monotonic() < limite, "los trabajos no llegaron a la cola"
+        time.sleep(0.005)
+
+
+def _encolar(plan, costos, orden):
+    """Un hilo por costo, en ese orden de llegada; cada uno anota su costo al entrar."""
+    hilos = []
+    for i, costo in enumerate(costos, start=1):
+        def trabajo(costo=costo):
+            with plan.turno(costo):
+                orden.append(costo)
+        hilo = threading.Thread(target=trabajo)
+        hilo.start()
+        hilos.append(hilo)
+        _esperar_cola(plan, i)
+    return hilos
+
+
+def test_paginas_estimadas_por_lote():
+    # Cada lote empieza hoja nueva: 3 ítems = 2 hojas, 4 = 2, 1 = 1.
+    assert paginas_estimadas([3, 4, 1]) == 5
+    assert paginas_estimadas([]) == 0
+
+
+def test_costo_estimado():
+    assert costo_estimado([4], seg_por_pagina=0.5) == pytest.approx(planificador.SEGUNDOS_FIJOS + 1.0)
+
+
+def test_segundos_por_pagina_desde_entorno(monkeypatch):
+    monkeypatch.setenv("DESGLOSE_SEG_POR_PAGINA", "0.3")
+    assert planificador.segundos_por_pagina() == 0.3
+
+
+def test_segundos_por_pagina_default(monkeypatch, tmp_path):
+    monkeypatch.delenv("DESGLOSE_SEG_POR_PAGINA", raising=False)
+    monkeypatch.setattr(planificador, "ARCHIVO_COSTO", tmp_path / "no_existe.json")
+    assert planificador.segundos_por_pagina() == planificador.SEGUNDOS_POR_PAGINA_DEFAULT
+
+
+def test_primero_el_mas_corto():
+    plan = Planificador(capacidad=1, max_espera_seg=1000, envejecimiento=0)
+    orden = []
+    plan.entrar(1)
+    hilos = _encolar(plan, [50, 5, 20], orden)
+    plan.salir(1)
+    for hilo in hilos:
+        hilo.join(5)
+    assert orden == [5, 20, 50]
+    assert plan.estado() == {"en_curso": 0, "en_cola": 0, "espera_estimada_seg": 0.0, "capacidad": 1}
+
+
+def test_envejecimiento_adelanta_al_que_espera(monkeypatch):
+    reloj = iter([0.0, 100.0])
+    monkeypatch.setattr(planificador.time, "monotonic", lambda: next(reloj, 100.0))
+    plan = Planificador(capacidad=1, max_espera_seg=1000, envejecimiento=1.0)
+    orden = []
+    plan.entrar(1)
+    # El de 50 s llegó 100 s antes que el de 5 s: compite como si costara 50 - 100.
+    hilos = _encolar(plan, [50, 5], orden)
+    plan.salir(1)
+    for hilo in hilos:
+        hilo.join(5)
+    assert orden == [50, 5]
+
+
+def test_admite_siempre_sin_trabajos_en_curso():
+    plan = Planificador(capacidad=1, max_espera_seg=10)
+    with plan.turno(500):
+        assert plan.estado()["en_curso"] == 1
+    assert plan.estado()["en_curso"] == 0
+
+
+def test_rechaza_con_reintentar_si_la_cola_es_larga():
+    plan = Planificador(capacidad=2, max_espera_seg=10)
+    plan.entrar(16)
+    with pytest.raises(Saturado) as exc:
+        plan.entrar(8)       # (16 + 8) / 2 = 12 s de espera > 10
+    assert exc.value.espera_seg == pytest.approx(12)
+    assert exc.value.reintentar_en == 2
+    assert plan.estado()["en_curso"] == 1
+    plan.entrar(2)           # (16 + 2) / 2 = 9 s: entra
+    assert plan.estado()["en_curso"] == 2
+
+
+def test_rechazo_no_deja_rastro_en_la_cola():
+    plan = Planificador(capacidad=1, max_espera_seg=5)
+    plan.entrar(4)
+    with pytest.raises(Saturado):
+        plan.entrar(3)
+    plan.salir(4)
+    assert plan.estado() == {"en_curso": 0, "en_cola": 0, "espera_estimada_seg": 0.0, "capacidad": 1}
@@ -0,0 +1,191 @@
+import io
+import os
+import time
+
+import pytest
+
+from upload_utils import AlmacenUploads, ReceptorUpload, UploadDemasiadoGrande, recibir_upload
+
+
+class _Archivo:
+    def __init__(self, datos, filename):
+        self.stream = io.BytesIO(datos)
+        self.filename = filename
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    return AlmacenUploads(tmp_path / "uploads", ttl_segundos=100, max_bytes=1000, intervalo_barrido=3600)
+
+
+def _archivo(ruta, tamano, edad):
+    ruta.write_bytes(b"x" * tamano)
+    t = time.time() - edad
+    os.utime(ruta, (t, t))
+    return ruta
+
+
+def _logo(almacen, datos=b"logo"):
+    return recibir_upload(_Archivo(datos, "logo.PNG"), almacen.dir_logos, 1000, prefijo=".logo_")
+
+
+# ----------------------------------------------------------
+# recibir_upload
+# ----------------------------------------------------------
+
+def test_upload_chico_queda_en_memoria(tmp_path):
+    up = recibir_upload(_Archivo(b"abc", "a.xlsx"), tmp_path, 100, umbral_memoria=10)
+    assert up.ruta is None and up.datos == b"abc" and up.tamano == 3
+    assert up.fuente().read() == b"abc"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_upload_grande_va_a_disco_con_el_mismo_hash(tmp_path):
+    datos = os.urandom(200 * 1024)
+    en_disco = recibir_upload(_Archivo(datos, "a.xlsx"), tmp_path, len(datos), umbral_memoria=1024)
+    en_memoria = recibir_upload(_Archivo(datos, "a.xlsx"), tmp_path, len(datos), umbral_memoria=len(datos))
+    assert en_disco.ruta.suffix == ".xlsx" and en_disco.ruta.read_bytes() == datos
+    assert en_disco.hash == en_memoria.hash
+    en_disco.descartar()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_upload_demasiado_grande_no_deja_archivos(tmp_path):
+    with pytest.raises(UploadDemasiadoGrande):
+        recibir_upload(_Archivo(b"x" * 300 * 1024, "a.xlsx"), tmp_path, 200 * 1024)
+    assert list(tmp_path.iterdir()) == []
+
+
+# ----------------------------------------------------------
+# ReceptorUpload (stream_factory del multipart)
+# ----------------------------------------------------------
+
+def _recibir(receptor, datos, bloque=1000):
+    for i in range(0, len(datos), bloque):
+        receptor.write(datos[i:i + bloque])
+    receptor.seek(0)
+    return receptor
+
+
+def test_receptor_pasa_a_disco_al_recibir_y_conserva_el_hash(almacen):
+    datos = os.urandom(5000)
+    receptor = _recibir(ReceptorUpload(almacen.dir_excel, "a.xlsx", umbral_memoria=2048, almacen=almacen), datos)
+    (ruta,) = almacen.retenidos()
+    assert ruta.suffix == ".xlsx" and ruta.read_bytes() == datos
+    assert receptor.read(4) == datos[:4]    # FileStorage.read sigue funcionando
+
+    up = recibir_upload(receptor, almacen.dir_logos, 10000)
+    assert (up.ruta, up.tamano) == (ruta, 5000)
+    assert up.hash == recibir_upload(_Archivo(datos, "a.xlsx"), almacen.dir_excel, 10000, umbral_memoria=10000).hash
+    receptor.close()    # tomado: cerrar el request no lo borra
+    assert ruta.exists()
+    up.descartar()
+    assert not ruta.exists() and almacen.retenidos() == []
+
+
+def test_receptor_chico_queda_en_memoria(almacen):
+    receptor = _recibir(ReceptorUpload(almacen.dir_excel, "a.csv", umbral_memoria=100), b"a;b\n")
+    up = recibir_upload(receptor, almacen.dir_excel, 100)
+    assert up.ruta is None and up.datos == b"a;b\n"
+    assert list(almacen.dir_excel.iterdir()) == []
+
+
+def test_receptor_no_tomado_se_borra_al_cerrar(almacen):
+    receptor = _recibir(ReceptorUpload(almacen.dir_excel, "a.xlsx", almacen=almacen), b"x" * 50)
+    receptor.close()
+    assert list(almacen.dir_excel.iterdir()) == [] and almacen.retenidos() == []
+
+
+@pytest.mark.parametrize("max_receptor,max_campo", [(100, 1000), (1000, 100)])
+def test_receptor_demasiado_grande(almacen, max_receptor, max_campo):
+    receptor = _recibir(ReceptorUpload(almacen.dir_excel, "a.xlsx", max_bytes=max_receptor, almacen=almacen), b"x" * 500)
+    with pytest.raises(UploadDemasiadoGrande):
+        recibir_upload(receptor, almacen.dir_excel, max_campo)
+    assert list(almacen.dir_excel.iterdir()) == [] and almacen.retenidos() == []
+
+
+# ----------------------------------------------------------
+# Barrido: TTL y cuota
+# ----------------------------------------------------------
+
+def test_barrido_ttl(almacen):
+    viejo = _archivo(almacen.dir_excel / "viejo.xlsx", 10, edad=500)
+    nuevo = _archivo(almacen.dir_logos / "nuevo.png", 10, edad=5)
+    assert almacen.barrer() == (1, 10)
+    assert not viejo.exists() and nuevo.exists()
+
+
+def test_barrido_cuota_lru(almacen):
+    a = _archivo(almacen.dir_logos / "a.png", 400, edad=30)
+    b = _archivo(almacen.dir_logos / "b.png", 400, edad=20)
+    c = _archivo(almacen.dir_excel / "c.xlsx", 400, edad=10)
+    assert almacen.barrer() == (1, 400)
+    assert not a.exists() and b.exists() and c.exists()
+
+
+def test_tocar_renueva_el_ttl(almacen):
+    logo = _archivo(almacen.dir_logos / "logo.png", 10, edad=500)
+    almacen.tocar(logo)
+    assert almacen.barrer() == (0, 0)
+
+
+# ----------------------------------------------------------
+# Retención
+# ----------------------------------------------------------
+
+def test_retenidos_no_se_barren(almacen):
+    vencido = _archivo(almacen.dir_logos / "vencido.png", 10, edad=500)
+    grande = _archivo(almacen.dir_logos / "grande.png", 900, edad=50)
+    otro = _archivo(almacen.dir_logos / "otro.png", 400, edad=10)
+    with almacen.en_uso(vencido, grande):
+        assert almacen.barrer() == (0, 0)      # los retenidos no cuentan para la cuota
+    assert almacen.retenidos() == []
+    # Al soltarlos se tocan: el TTL vuelve a empezar, la cuota elige el LRU.
+    assert almacen.barrer() == (1, 400)
+    assert vencido.exists() and grande.exists() and not otro.exists()
+
+
+def test_retenciones_anidadas(almacen):
+    logo = _archivo(almacen.dir_logos / "logo.png", 10, edad=500)
+    almacen.retener(logo)
+    almacen.retener(logo)
+    almacen.soltar(logo)
+    almacen.barrer(ahora=time.time() + 1000)
+    assert logo.exists()
+    almacen.soltar(logo)
+    almacen.barrer(ahora=time.time() + 1000)
+    assert not logo.exists()
+
+
+def test_soltar_una_ruta_no_retenida_no_la_toca(almacen, tmp_path):
+    externo = _archivo(tmp_path / "logo_default.png", 10, edad=500)
+    mtime = externo.stat().st_mtime
+    almacen.soltar(externo, None)
+    assert externo.stat().st_mtime == mtime
+
+
+def test_guardar_logo_deduplica_y_retiene(almacen):
+    subido = _logo(almacen)
+    primero = almacen.guardar_logo(subido)
+    assert primero == almacen.dir_logos / f"{subido.hash}.png"
+    t = time.time() - 500
+    os.utime(primero, (t, t))
+
+    repetido = _logo(almacen)
+    ruta = almacen.guardar_logo(repetido, retener=True)
+    assert ruta == primero and repetido.ruta is None
+    assert [p.name for p in almacen.dir_logos.iterdir()] == [primero.name]
+    assert almacen.barrer(ahora=time.time() + 1000) == (0, 0)
+    almacen.soltar(ruta)
+    assert almacen.barrer(ahora=time.time() + 1000) == (1, 4)
+
+
+def test_retener_upload_hasta_descartar(almacen):
+    up = almacen.retener_upload(
+        recibir_upload(_Archivo(b"x" * 50, "a.xlsx"), almacen.dir_excel, 100, prefijo="excel_")
+    )
+    ruta = up.ruta
+    assert almacen.retenidos() == [ruta]
+    assert almacen.barrer(ahora=time.time() + 1000) == (0, 0)
+    up.descartar()
+    assert not ruta.exists() and almacen.retenidos() == []
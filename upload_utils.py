@@ -0,0 +1,517 @@
+"""
+upload_utils.py
+
+Recepción de archivos subidos (Excel y logo).
+
+Se encarga de:
+- Recibir el upload en bloques a medida que llega (ReceptorUpload, instalado
+  como stream_factory del parser multipart de werkzeug en app.py): Flask no lo
+  bufferea entero antes ni lo vuelca a un temporal propio.
+- Calcular el hash del contenido EN LA MISMA PASADA (para el cache de resultados).
+- Cortar con error si el archivo supera el tamaño máximo configurado.
+- Guardar en un archivo temporal con nombre ÚNICO (dos usuarios que suben
+  "planilla.xlsx" al mismo tiempo ya no se pisan).
+- Para archivos chicos, quedarse con los bytes en memoria y no tocar el disco:
+  openpyxl puede leer directamente desde un buffer (BytesIO).
+- Administrar el ciclo de vida de lo que queda en disco (AlmacenUploads):
+  vencimiento por archivo (TTL), cuota total con expulsión LRU, barrido en
+  segundo plano y logos deduplicados por hash de contenido.
+
+Configuración (variables de entorno, en MB):
+- DESGLOSE_MAX_EXCEL_MB   (default 20)
+- DESGLOSE_MAX_LOGO_MB    (default 5)
+- DESGLOSE_UMBRAL_MEMORIA_MB (default 2): hasta este tamaño un upload queda en memoria.
+- DESGLOSE_UPLOADS_TTL_HORAS (default 24): vida máxima de un archivo sin usarse.
+- DESGLOSE_UPLOADS_MAX_MB (default 500): tamaño total máximo del almacén.
+- DESGLOSE_UPLOADS_BARRIDO_SEG (default 600): cada cuánto corre el barrido.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+_MB = 1024 * 1024
+
+MAX_EXCEL_BYTES = int(float(os.environ.get("DESGLOSE_MAX_EXCEL_MB", "20")) * _MB)
+MAX_LOGO_BYTES = int(float(os.environ.get("DESGLOSE_MAX_LOGO_MB", "5")) * _MB)
+UMBRAL_MEMORIA_BYTES = int(float(os.environ.get("DESGLOSE_UMBRAL_MEMORIA_MB", "2")) * _MB)
+
+CHUNK_BYTES = 64 * 1024
+
+UPLOADS_TTL_SEGUNDOS = int(float(os.environ.get("DESGLOSE_UPLOADS_TTL_HORAS", "24")) * 3600)
+UPLOADS_MAX_BYTES = int(float(os.environ.get("DESGLOSE_UPLOADS_MAX_MB", "500")) * _MB)
+UPLOADS_BARRIDO_SEGUNDOS = int(float(os.environ.get("DESGLOSE_UPLOADS_BARRIDO_SEG", "600")))
+
+
+class UploadDemasiadoGrande(ValueError):
+    """El archivo subido supera el tamaño máximo permitido."""
+
+    def __init__(self, nombre: str, max_bytes: int):
+        super().__init__(f"'{nombre}' supera el tamaño máximo permitido ({max_bytes / _MB:g} MB)")
+        self.nombre = nombre
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class Upload:
+    """
+    Archivo recibido.
+
+    - hash: BLAKE2b hex (mismo algoritmo que cache_utils.hash_bytes).
+    - ruta: archivo temporal en disco (None si quedó en memoria).
+    - datos: bytes en memoria (None si se escribió a disco).
+    """
+    nombre: str
+    hash: str
+    tamano: int
+    ruta: Optional[Path] = None
+    datos: Optional[bytes] = None
+    # Se llama después de borrar el temporal (AlmacenUploads.retener_upload lo usa
+    # para soltar la retención).
+    al_descartar: Optional[Callable[[], None]] = None
+
+    def fuente(self):
+        """Algo que openpyxl (load_workbook) puede abrir: ruta o buffer en memoria."""
+        if self.ruta is not None:
+            return self.ruta
+        return io.BytesIO(self.datos or b"")
+
+    def descartar(self):
+        """Borra el archivo temporal (si lo hay)."""
+        if self.ruta is not None:
+            try:
+                self.ruta.unlink()
+            except OSError:
+                pass
+            self.ruta = None
+        if self.al_descartar is not None:
+            self.al_descartar, al_descartar = None, self.al_descartar
+            al_descartar()
+
+
+class ReceptorUpload:
+    """
+    Destino de UN archivo mientras werkzeug parsea el multipart (stream_factory).
+
+    El parser le pasa cada bloque apenas llega del socket (write): el hash se
+    calcula en la misma pasada, los bytes quedan en memoria hasta *umbral_memoria*
+    y después siguen en un temporal único dentro de *destino_dir* (retenido en
+    *almacen*, si se pasa, para que el barrido no lo borre). Pasado *max_bytes*
+    deja de guardar (el error lo da recibir_upload, no el parser).
+
+    recibir_upload lo convierte en Upload sin volver a copiar nada. Si nadie lo
+    toma (un campo que la vista no lee, un error antes), close() borra el temporal.
+    """
+
+    def __init__(self, destino_dir, nombre: str = "", umbral_memoria: int = 0,
+                 max_bytes: Optional[int] = None, almacen: Optional["AlmacenUploads"] = None,
+                 prefijo: str = "upload_"):
+        self.destino_dir = Path(destino_dir)
+        self.nombre = nombre or ""
+        self.umbral_memoria = umbral_memoria
+        self.max_bytes = max_bytes
+        self.almacen = almacen
+        self.prefijo = prefijo
+        self.tamano = 0
+        self.excedido = False
+        self._hash = hashlib.blake2b(digest_size=32)
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._archivo = None
+        self._ruta: Optional[Path] = None
+        self._tomado = False
+
+    # --- interfaz de archivo que usa werkzeug (write / seek) y FileStorage.read ---
+
+    def _actual(self):
+        return self._archivo if self._archivo is not None else self._buffer
+
+    def write(self, bloque: bytes) -> int:
+        n = len(bloque)
+        self.tamano += n
+        if self.excedido:
+            return n
+        if self.max_bytes is not None and self.tamano > self.max_bytes:
+            self.excedido = True
+            self._borrar()
+            return n
+
+        self._hash.update(bloque)
+        if self._archivo is None and self.tamano > self.umbral_memoria:
+            # Pasamos a disco: volcamos lo que había en memoria y seguimos escribiendo.
+            self.destino_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=self.prefijo, suffix=Path(self.nombre).suffix.lower(),
+                                       dir=self.destino_dir)
+            self._ruta = Path(tmp)
+            if self.almacen is not None:
+                self.almacen.retener(self._ruta)
+            self._archivo = os.fdopen(fd, "w+b")
+            self._archivo.write(self._buffer.getvalue())
+            self._buffer = None
+        self._actual().write(bloque)
+        return n
+
+    def seek(self, pos: int, whence: int = 0) -> int:
+        actual = self._actual()
+        return actual.seek(pos, whence) if actual is not None else 0
+
+    def tell(self) -> int:
+        actual = self._actual()
+        return actual.tell() if actual is not None else 0
+
+    def read(self, n: int = -1) -> bytes:
+        actual = self._actual()
+        return actual.read(n) if actual is not None else b""
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self):
+        """Si nadie tomó el archivo (upload), borra lo recibido."""
+        if not self._tomado:
+            self._borrar()
+
+    # --- conversión ---
+
+    def _borrar(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+        if self._ruta is not None:
+            try:
+                self._ruta.unlink()
+            except OSError:
+                pass
+            if self.almacen is not None:
+                self.almacen.soltar(self._ruta)
+            self._ruta = None
+        self._buffer = None
+
+    def upload(self, max_bytes: int) -> Upload:
+        """El Upload recibido (descartarlo queda a cargo del llamador). UploadDemasiadoGrande si supera *max_bytes*."""
+        if self.excedido or self.tamano > max_bytes:
+            self._borrar()
+            raise UploadDemasiadoGrande(self.nombre, max_bytes)
+
+        self._tomado = True
+        digest = self._hash.hexdigest()
+        if self._ruta is None:
+            datos = self._buffer.getvalue() if self._buffer is not None else b""
+            self._buffer = None
+            return Upload(nombre=self.nombre, hash=digest, tamano=self.tamano, datos=datos)
+
+        self._archivo.close()
+        self._archivo = None
+        ruta, almacen = self._ruta, self.almacen
+        al_descartar = (lambda: almacen.soltar(ruta)) if almacen is not None else None
+        return Upload(nombre=self.nombre, hash=digest, tamano=self.tamano, ruta=ruta, al_descartar=al_descartar)
+
+
+def recibir_upload(archivo, destino_dir, max_bytes: int, umbral_memoria: int = 0,
+                   prefijo: str = "upload_") -> Upload:
+    """
+    Lee un upload (werkzeug FileStorage o cualquier objeto con .read / .stream)
+    en bloques de CHUNK_BYTES, calculando el hash en la misma pasada.
+
+    - Si el total es <= umbral_memoria, devuelve los bytes en memoria (sin disco).
+    - Si no, lo escribe a un archivo temporal único dentro de *destino_dir*
+      (conservando la extensión original).
+    - Si supera *max_bytes*, borra lo escrito y lanza UploadDemasiadoGrande.
+
+    Si el stream es un ReceptorUpload (ya se recibió mientras llegaba), se usa
+    tal cual quedó: *destino_dir*, *umbral_memoria* y *prefijo* son los del receptor.
+    """
+    nombre = getattr(archivo, "filename", None) or ""
+    stream = getattr(archivo, "stream", archivo)
+    if isinstance(stream, ReceptorUpload):
+        return stream.upload(max_bytes)
+    ext = Path(nombre).suffix.lower()
+
+    h = hashlib.blake2b(digest_size=32)
+    buffer = io.BytesIO()
+    f = None
+    ruta = None
+    total = 0
+
+    try:
+        while True:
+            bloque = stream.read(CHUNK_BYTES)
+            if not bloque:
+                break
+
+            total += len(bloque)
+            if total > max_bytes:
+                raise UploadDemasiadoGrande(nombre, max_bytes)
+
+            h.update(bloque)
+
+            if f is None and total > umbral_memoria:
+                # Pasamos a disco: volcamos lo que había en memoria y seguimos escribiendo.
+                Path(destino_dir).mkdir(parents=True, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(prefix=prefijo, suffix=ext, dir=destino_dir)
+                f = os.fdopen(fd, "wb")
+                ruta = Path(tmp)
+                f.write(buffer.getvalue())
+                buffer = None
+
+            if f is not None:
+                f.write(bloque)
+            else:
+                buffer.write(bloque)
+    except BaseException:
+        if f is not None:
+            f.close()
+        if ruta is not None:
+            try:
+                ruta.unlink()
+            except OSError:
+                pass
+        raise
+
+    if f is not None:
+        f.close()
+        return Upload(nombre=nombre, hash=h.hexdigest(), tamano=total, ruta=ruta)
+
+    return Upload(nombre=nombre, hash=h.hexdigest(), tamano=total, datos=buffer.getvalue())
+
+
+# ==========================================================
+# Almacén de uploads (ciclo de vida)
+# ==========================================================
+
+class AlmacenUploads:
+    """
+    Directorio de uploads con ciclo de vida.
+
+    Estructura (dentro de *raiz*):
+      - excel/ : temporales de los Excel recibidos (se borran al terminar el request;
+                 el barrido limpia los que hayan quedado, por ejemplo tras un error).
+      - logos/ : logos deduplicados por contenido: logos/<hash><ext>.
+                 El mismo logo subido N veces se guarda UNA vez, y como la ruta es
+                 estable, el cache de logos de pdf_utils (por ruta) se comparte
+                 entre requests.
+
+    Reglas del barrido:
+      1) TTL: se borra todo archivo que no se usó en *ttl_segundos* (mtime; cada uso lo renueva).
+      2) Cuota: si el total supera *max_bytes*, se borran los menos usados (LRU).
+      Nunca se borra un archivo retenido (retener / en_uso): un request que reutiliza
+      un logo o está leyendo su Excel lo retiene hasta terminar. guardar_logo(...,
+      retener=True) decide reutilizar y retiene bajo el mismo lock que el barrido.
+
+    El barrido corre en un hilo daemon (asegurar_barrido). Con gunicorn cada worker
+    arranca el suyo en el primer request (los hilos no sobreviven al fork); que dos
+    procesos barran a la vez es inofensivo. Las retenciones son del proceso: entre
+    workers protege que cada uso renueva el mtime (TTL) y lo pone último en el LRU.
+    """
+
+    def __init__(self, raiz, ttl_segundos: int = UPLOADS_TTL_SEGUNDOS,
+                 max_bytes: int = UPLOADS_MAX_BYTES,
+                 intervalo_barrido: int = UPLOADS_BARRIDO_SEGUNDOS):
+        self.raiz = Path(raiz)
+        self.dir_excel = self.raiz / "excel"
+        self.dir_logos = self.raiz / "logos"
+        self.dir_excel.mkdir(parents=True, exist_ok=True)
+        self.dir_logos.mkdir(parents=True, exist_ok=True)
+
+        self.ttl_segundos = int(ttl_segundos)
+        self.max_bytes = int(max_bytes)
+        self.intervalo_barrido = int(intervalo_barrido)
+
+        self._lock = threading.Lock()
+        self._retenidos: Dict[Path, int] = {}
+        self._hilo: Optional[threading.Thread] = None
+        self._pid_hilo: Optional[int] = None
+        self._detener = threading.Event()
+
+    # ------------------------------------------------------
+    # Logos (deduplicados)
+    # ------------------------------------------------------
+
+    def guardar_logo(self, upload: Upload, retener: bool = False) -> Path:
+        """
+        Mueve el logo recibido a logos/<hash><ext> y devuelve esa ruta.
+        Si ya existía (mismo contenido), descarta el temporal y reutiliza el guardado.
+
+        Con retener=True la ruta queda retenida (el barrido no la borra) hasta
+        soltar(ruta): usarlo cuando el logo se va a leer después, en el render.
+        """
+        ext = Path(upload.nombre).suffix.lower()
+        destino = self.dir_logos / f"{upload.hash}{ext}"
+
+        # Bajo el lock del barrido: entre ver que existe y retenerlo no se puede borrar.
+        with self._lock:
+            if destino.exists():
+                self.tocar(destino)
+                if retener:
+                    self._retener(destino)
+                reutilizado = True
+            else:
+                if upload.ruta is not None:
+                    os.replace(upload.ruta, destino)
+                    upload.ruta = None
+                else:
+                    destino.write_bytes(upload.datos or b"")
+                if retener:
+                    self._retener(destino)
+                reutilizado = False
+        # Borra el temporal si se reutilizó y, en los dos casos, suelta su retención.
+        upload.descartar()
+        return destino
+
+    def tocar(self, ruta):
+        """Marca el archivo como usado ahora (renueva su TTL y su posición LRU)."""
+        try:
+            os.utime(ruta, None)
+        except OSError:
+            pass
+
+    # ------------------------------------------------------
+    # Retención (archivos en uso)
+    # ------------------------------------------------------
+
+    def _retener(self, ruta: Path):
+        self._retenidos[ruta] = self._retenidos.get(ruta, 0) + 1
+
+    def retener(self, *rutas):
+        """Protege *rutas* del barrido hasta soltar (una vez por cada retener). Ignora None."""
+        with self._lock:
+            for ruta in rutas:
+                if ruta is not None:
+                    self._retener(Path(ruta))
+
+    def soltar(self, *rutas):
+        """Libera una retención de cada ruta y la marca como usada ahora. Ignora las no retenidas."""
+        with self._lock:
+            for ruta in rutas:
+                if ruta is None:
+                    continue
+                ruta = Path(ruta)
+                n = self._retenidos.get(ruta)
+                if n is None:
+                    continue
+                if n > 1:
+                    self._retenidos[ruta] = n - 1
+                else:
+                    del self._retenidos[ruta]
+                self.tocar(ruta)
+
+    @contextmanager
+    def en_uso(self, *rutas):
+        """with almacen.en_uso(ruta): ... -> retener(ruta) ... soltar(ruta)."""
+        self.retener(*rutas)
+        try:
+            yield
+        finally:
+            self.soltar(*rutas)
+
+    def retener_upload(self, upload: Upload) -> Upload:
+        """
+        Retiene el temporal de *upload* (si está en disco) hasta upload.descartar().
+        Si ya tiene al_descartar, ya está retenido (ReceptorUpload con almacén).
+        """
+        if upload.ruta is not None and upload.al_descartar is None:
+            ruta = upload.ruta
+            self.retener(ruta)
+            upload.al_descartar = lambda: self.soltar(ruta)
+        return upload
+
+    def retenidos(self) -> List[Path]:
+        with self._lock:
+            return list(self._retenidos)
+
+    # ------------------------------------------------------
+    # Barrido
+    # ------------------------------------------------------
+
+    def _archivos(self) -> List[Tuple[float, int, Path]]:
+        out = []
+        for d in (self.dir_excel, self.dir_logos):
+            for p in d.iterdir():
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                if p.is_file():
+                    out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def barrer(self, ahora: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Aplica TTL y cuota una vez (salteando los retenidos, que no cuentan para
+        la cuota). Devuelve (archivos_borrados, bytes_liberados).
+        """
+        ahora = time.time() if ahora is None else ahora
+        borrados = 0
+        liberados = 0
+
+        with self._lock:
+            entradas = [e for e in self._archivos() if e[2] not in self._retenidos]
+            vivos = []
+
+            # 1) TTL
+            for mtime, size, p in entradas:
+                if ahora - mtime > self.ttl_segundos:
+                    try:
+                        p.unlink()
+                        borrados += 1
+                        liberados += size
+                    except OSError:
+                        pass
+                else:
+                    vivos.append((mtime, size, p))
+
+            # 2) Cuota (LRU: menos usado primero)
+            total = sum(size for _, size, _ in vivos)
+            if total > self.max_bytes:
+                vivos.sort()
+                for _, size, p in vivos:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        p.unlink()
+                        borrados += 1
+                        liberados += size
+                        total -= size
+                    except OSError:
+                        pass
+
+        return borrados, liberados
+
+    def _loop(self):
+        while not self._detener.wait(self.intervalo_barrido):
+            try:
+                self.barrer()
+            except Exception:
+                # El barrido nunca debe tirar abajo el proceso.
+                continue
+
+    def asegurar_barrido(self):
+        """Arranca el hilo de barrido si no está corriendo en ESTE proceso (idempotente)."""
+        pid = os.getpid()
+        if self._hilo is not None and self._hilo.is_alive() and self._pid_hilo == pid:
+            return
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive() and self._pid_hilo == pid:
+                return
+            self._detener = threading.Event()
+            self._hilo = threading.Thread(target=self._loop, name="barrido-uploads", daemon=True)
+            self._pid_hilo = pid
+            self._hilo.start()
+
+    def detener_barrido(self):
+        self._detener.set()
@@ -0,0 +1,15 @@
+"""
+wsgi.py
+
+Punto de entrada de producción (gunicorn).
+
+    gunicorn -c gunicorn.conf.py
+
+La configuración (modelo de workers, reciclado, timeouts, precarga) está en
+gunicorn.conf.py. Para desarrollo sigue sirviendo `python app.py`.
+"""
+
+from app import app
+
+# Nombre que buscan por defecto los servidores WSGI.
+application = app